@@ -1,6 +1,16 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 # Importamos los modelos solicitados
-from .models import Producto, Categoria, Proveedor, Ventas, DetalleVenta, Inventario, Cliente, Empleado
+from .models import (
+    Producto, Categoria, Proveedor, Ventas, DetalleVenta, Inventario, Cliente, Empleado,
+    RecepcionMercancia, LineaRecepcion, Tienda, Promocion, SesionConteo
+)
+from .anulaciones import anular_ventas
+from .efectos_venta import fotos_ventas, registrar_efectos
+from .paginacion import ConteoAcotadoPaginator
+
+def _es_changelist(request):
+    match = getattr(request, 'resolver_match', None)
+    return bool(match and match.url_name and match.url_name.endswith('_changelist'))
 
 # --- REGISTROS PARA CLIENTES ---
 @admin.register(Cliente)
@@ -33,6 +43,23 @@ class CategoriaAdmin(admin.ModelAdmin):
 
 admin.site.register(Proveedor)
 
+# --- REGISTROS PARA PROMOCIONES ---
+@admin.register(Promocion)
+class PromocionAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'tipo', 'porcentaje', 'lleva', 'paga', 'producto', 'categoria', 'proveedor',
+                    'vigente_desde', 'vigente_hasta', 'activa')
+    list_select_related = ('producto', 'categoria', 'proveedor')
+    list_filter = ('activa', 'tipo')
+    search_fields = ('nombre',)
+    autocomplete_fields = ('producto',)
+
+# --- REGISTROS PARA SUCURSALES ---
+@admin.register(Tienda)
+class TiendaAdmin(admin.ModelAdmin):
+    list_display = ('codigo', 'nombre', 'activa')
+    search_fields = ('codigo', 'nombre')
+    list_filter = ('activa',)
+
 
 # --- REGISTROS PARA VENTAS ---
 
@@ -41,22 +68,132 @@ class DetalleVentaInline(admin.TabularInline):
     model = DetalleVenta
     extra = 1 
     readonly_fields = ('subtotal',)
+    # Autocompletado en lugar de un <select> con todo el catálogo por cada renglón
+    autocomplete_fields = ('producto',)
 
 @admin.register(Ventas)
 class VentasAdmin(admin.ModelAdmin):
-    list_display = ('id', 'nombre_cliente', 'fecha_venta', 'monto_total', 'metodo_pago', 'vendedor', 'esta_pagada')
-    list_filter = ('fecha_venta', 'metodo_pago', 'esta_pagada')
+    list_display = ('id', 'cliente_display', 'fecha_venta', 'monto_total', 'metodo_pago', 'vendedor_display', 'esta_pagada', 'anulada')
+    list_filter = ('metodo_pago', 'esta_pagada', 'anulada', 'tienda')
     search_fields = ('nombre_cliente', 'vendedor')
-    readonly_fields = ('monto_total',)
+    readonly_fields = ('monto_total', 'anulada', 'fecha_anulacion', 'motivo_anulacion')
+    actions = ['anular_seleccionadas']
     inlines = [DetalleVentaInline]
+    autocomplete_fields = ('cliente', 'empleado_vendedor')
+
+    # Tablas grandes: jerarquía de fechas sobre ventas_fecha_idx y sin COUNT(*) exacto
+    date_hierarchy = 'fecha_venta'
+    ordering = ('-fecha_venta',)
+    list_select_related = ('cliente', 'empleado_vendedor')
+    paginator = ConteoAcotadoPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if not _es_changelist(request):
+            return queryset
+        # Solo las columnas del listado
+        return queryset.only(
+            'id', 'fecha_venta', 'monto_total', 'metodo_pago', 'esta_pagada', 'anulada', 'nombre_cliente', 'vendedor',
+            'cliente__nombre_completo', 'empleado_vendedor__nombre_completo',
+        )
+
+    @admin.display(description='Cliente')
+    def cliente_display(self, obj):
+        return obj.get_nombre_cliente_display()
+
+    @admin.display(description='Vendedor')
+    def vendedor_display(self, obj):
+        return obj.get_nombre_vendedor_display()
+
+    # Mantener los resúmenes incrementales (KPIs) también desde el admin
+    def save_model(self, request, obj, form, change):
+        request._fotos_antes = fotos_ventas([obj.pk]) if change else []
+        super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        registrar_efectos(getattr(request, '_fotos_antes', []), fotos_ventas([form.instance.pk]))
+
+    def delete_model(self, request, obj):
+        antes = fotos_ventas([obj.pk])
+        super().delete_model(request, obj)
+        registrar_efectos(antes=antes)
+
+    def delete_queryset(self, request, queryset):
+        antes = fotos_ventas(queryset.values_list('pk', flat=True))
+        super().delete_queryset(request, queryset)
+        registrar_efectos(antes=antes)
+
+    @admin.action(description='Anular las ventas seleccionadas (devuelve su mercancía al stock)')
+    def anular_seleccionadas(self, request, queryset):
+        try:
+            resultado = anular_ventas(
+                queryset, f'Anulada desde el admin por {request.user.get_username()}',
+                responsable=request.user.get_username(),
+            )
+        except ValueError as e:
+            self.message_user(request, str(e), messages.ERROR)
+            return
+        self.message_user(request, (
+            f'{resultado.ventas} ventas anuladas; {resultado.unidades} piezas de '
+            f'{resultado.productos} productos regresaron al stock.'
+        ), messages.SUCCESS)
 
 # --- REGISTROS PARA INVENTARIO ---
 
 @admin.register(Inventario)
 class InventarioAdmin(admin.ModelAdmin):
     list_display = ('producto', 'tipo_movimiento', 'cantidad', 'fecha_movimiento', 'responsable', 'razon')
-    list_filter = ('tipo_movimiento', 'producto__categoria', 'fecha_movimiento')
+    list_filter = ('tipo_movimiento', 'producto__categoria', 'tienda')
     search_fields = ('producto__nombre', 'razon', 'responsable')
+    autocomplete_fields = ('producto',)
+
+    date_hierarchy = 'fecha_movimiento'
+    ordering = ('-fecha_movimiento',)
+    list_select_related = ('producto',)
+    paginator = ConteoAcotadoPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if not _es_changelist(request):
+            return queryset
+        # Solo las columnas del listado
+        return queryset.only(
+            'id', 'tipo_movimiento', 'cantidad', 'fecha_movimiento', 'responsable', 'razon', 'producto__nombre',
+        )
+
+# --- REGISTROS PARA RECEPCIONES DE MERCANCÍA ---
+
+class LineaRecepcionInline(admin.TabularInline):
+    model = LineaRecepcion
+    extra = 0
+    raw_id_fields = ('producto',)
+    readonly_fields = ('producto', 'cantidad', 'costo_unitario')
+    can_delete = False
+
+@admin.register(RecepcionMercancia)
+class RecepcionMercanciaAdmin(admin.ModelAdmin):
+    # Solo consulta: el stock se aplica al registrar el documento desde la vista de recepción
+    list_display = ('id', 'proveedor', 'fecha_recepcion', 'referencia', 'responsable')
+    list_select_related = ('proveedor',)
+    search_fields = ('referencia', 'proveedor__nombre_empresa')
+    inlines = [LineaRecepcionInline]
+
+    def has_add_permission(self, request):
+        return False
+
+@admin.register(SesionConteo)
+class SesionConteoAdmin(admin.ModelAdmin):
+    # Solo consulta: las capturas llegan de los escáneres y el ajuste se aplica desde la vista del conteo
+    list_display = ('id', 'nombre', 'completo', 'estado', 'responsable', 'fecha_creacion', 'fecha_aplicacion')
+    list_filter = ('estado', 'completo')
+    search_fields = ('nombre',)
+    readonly_fields = ('estado', 'fecha_aplicacion')
+
+    def has_add_permission(self, request):
+        return False
 
 # Opcional: Registrar DetalleVenta si quieres verlo en la interfaz de admin
 # admin.site.register(DetalleVenta)
\ No newline at end of file
@@ -0,0 +1,236 @@
+"""
+Instantánea columnar de las líneas de venta para análisis (canastas, horarios, elasticidad de precio).
+
+`exportar` escribe cada columna de DetalleVenta + Ventas (activas y archivadas) como un arreglo
+NumPy `.npy` dentro de un directorio, por lotes: la memoria usada no depende del número de líneas.
+Las ventas anuladas no se exportan.
+Producto, categoría y método de pago se guardan como códigos enteros de un diccionario (meta.json);
+los importes, en centavos. `cargar` abre los arreglos con memoria mapeada, así que un script o un
+reporte puede agregar decenas de millones de líneas con operaciones vectorizadas sin leer SQLite:
+
+    inst = analitica.cargar()
+    inst.sumar_por('categoria', 'subtotal_centavos')            # {'Lácteos': 123456.0, ...}
+    np.bincount(inst['fecha'].astype('int64') // 3600 % 24)   # líneas por hora del día (UTC)
+
+NumPy solo lo necesitan este módulo y el comando `exportar_analitica`.
+"""
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import BigIntegerField, CharField, F, IntegerField
+from django.db.models.functions import Cast, Round
+from django.utils import timezone
+
+from .models import DetalleVenta, DetalleVentaArchivada, Producto, Ventas
+from .reportes_db import lectura_de_reportes
+
+VERSION = 1
+TAMANO_LOTE = 50000
+SIN_CATEGORIA = 'Sin categoría'
+PRODUCTO_BORRADO = '(producto borrado)'
+
+# Columna -> dtype. Los ids nulos (venta sin cliente, sin vendedor o sin sucursal) se guardan como 0.
+COLUMNAS = {
+    'detalle_id': 'i8',
+    'venta_id': 'i8',
+    'fecha': 'M8[s]',
+    'producto_id': 'i8',
+    'producto': 'i4',
+    'categoria': 'i4',
+    'cantidad': 'i4',
+    'precio_centavos': 'i8',
+    'descuento_centesimas': 'i4',
+    'subtotal_centavos': 'i8',
+    'metodo_pago': 'i1',
+    'cliente_id': 'i8',
+    'empleado_id': 'i8',
+    'tienda_id': 'i8',
+    'archivada': '?',
+}
+# Orden de los campos en `_lineas`
+CAMPOS = (
+    'id', 'venta_id', 'fecha_texto', 'producto_id', 'cantidad_vendida', 'precio_c', 'descuento_c',
+    'subtotal_c', 'venta__metodo_pago', 'venta__cliente_id', 'venta__empleado_vendedor_id', 'venta__tienda_id',
+)
+
+
+def ruta_por_defecto():
+    return Path(settings.BASE_DIR) / 'analitica'
+
+
+def _diccionarios():
+    """
+    Nombres de productos y categorías, y dos arreglos de búsqueda indexados por producto_id con
+    sus códigos, para codificar cada lote con un solo `take`. La posición 0 (ningún producto tiene
+    id 0) y los ids desconocidos apuntan a PRODUCTO_BORRADO / SIN_CATEGORIA. La categoría es la
+    actual del producto.
+    """
+    productos = list(Producto.objects.order_by('id').values_list('id', 'nombre', 'categoria__nombre'))
+    nombres_producto = [nombre for _, nombre, _ in productos] + [PRODUCTO_BORRADO]
+    nombres_categoria = sorted({categoria or SIN_CATEGORIA for _, _, categoria in productos} | {SIN_CATEGORIA})
+    codigo_categoria = {nombre: i for i, nombre in enumerate(nombres_categoria)}
+
+    tope = (productos[-1][0] if productos else 0) + 1
+    por_producto = np.full(tope, len(productos), dtype='i4')
+    categoria_de = np.full(tope, codigo_categoria[SIN_CATEGORIA], dtype='i4')
+    for codigo, (producto_id, _, categoria) in enumerate(productos):
+        por_producto[producto_id] = codigo
+        categoria_de[producto_id] = codigo_categoria[categoria or SIN_CATEGORIA]
+    return nombres_producto, nombres_categoria, por_producto, categoria_de
+
+
+def _lineas(modelo, ultimo_id, tamano_lote):
+    return list(
+        modelo.objects.filter(id__gt=ultimo_id, venta__anulada=False).order_by('id').annotate(
+            # Enteros calculados en SQL y la fecha como texto UTC (la convierte NumPy por lote):
+            # sin un Decimal ni un datetime por valor
+            fecha_texto=Cast('venta__fecha_venta', CharField()),
+            precio_c=Cast(Round(F('precio_unitario') * 100), BigIntegerField()),
+            descuento_c=Cast(Round(F('descuento_porcentaje') * 100), IntegerField()),
+            subtotal_c=Cast(Round(F('subtotal') * 100), BigIntegerField()),
+        ).values_list(*CAMPOS)[:tamano_lote]
+    )
+
+
+def _escribir_lote(arreglos, inicio, filas, archivada, por_producto, categoria_de, codigo_metodo):
+    fin = inicio + len(filas)
+    (detalle_id, venta_id, fecha, producto_id, cantidad, precio, descuento, subtotal,
+     metodo, cliente_id, empleado_id, tienda_id) = zip(*filas)
+    producto_id = np.asarray(producto_id, dtype='i8')
+    indice = np.where(producto_id < len(por_producto), producto_id, 0)
+
+    arreglos['detalle_id'][inicio:fin] = detalle_id
+    arreglos['venta_id'][inicio:fin] = venta_id
+    arreglos['fecha'][inicio:fin] = np.array(fecha).astype('M8[us]').astype('M8[s]')
+    arreglos['producto_id'][inicio:fin] = producto_id
+    arreglos['producto'][inicio:fin] = por_producto[indice]
+    arreglos['categoria'][inicio:fin] = categoria_de[indice]
+    arreglos['cantidad'][inicio:fin] = cantidad
+    arreglos['precio_centavos'][inicio:fin] = precio
+    arreglos['descuento_centesimas'][inicio:fin] = descuento
+    arreglos['subtotal_centavos'][inicio:fin] = subtotal
+    arreglos['metodo_pago'][inicio:fin] = [codigo_metodo[m] for m in metodo]
+    arreglos['cliente_id'][inicio:fin] = [valor or 0 for valor in cliente_id]
+    arreglos['empleado_id'][inicio:fin] = [valor or 0 for valor in empleado_id]
+    arreglos['tienda_id'][inicio:fin] = [valor or 0 for valor in tienda_id]
+    arreglos['archivada'][inicio:fin] = archivada
+    return fin
+
+
+def _reemplazar(temporal, ruta):
+    """Cambia el directorio completo: un lector nunca ve una instantánea a medias."""
+    anterior = ruta.with_name(ruta.name + '.anterior')
+    shutil.rmtree(anterior, ignore_errors=True)
+    if ruta.exists():
+        os.replace(ruta, anterior)
+    os.replace(temporal, ruta)
+    # Los procesos que tengan la anterior mapeada la siguen leyendo hasta cerrarla
+    shutil.rmtree(anterior, ignore_errors=True)
+
+
+def exportar(ruta=None, tamano_lote=TAMANO_LOTE, incluir_archivo=True, progreso=None):
+    """
+    Escribe la instantánea en `ruta` (un directorio) y devuelve el número de líneas.
+    Lee del snapshot de reportes si existe (no compite con la caja) y todo en una sola
+    transacción, así que las columnas corresponden a un mismo momento.
+    """
+    ruta = Path(ruta or ruta_por_defecto())
+    temporal = ruta.with_name(ruta.name + '.tmp')
+    shutil.rmtree(temporal, ignore_errors=True)
+    temporal.mkdir(parents=True)
+
+    modelos = [(DetalleVenta, False)] + ([(DetalleVentaArchivada, True)] if incluir_archivo else [])
+    metodos = [clave for clave, _ in Ventas.METODOS_PAGO]
+    codigo_metodo = {clave: i for i, clave in enumerate(metodos)}
+    with lectura_de_reportes() as fecha_snapshot, transaction.atomic(using=router.db_for_read(DetalleVenta)):
+        nombres_producto, nombres_categoria, por_producto, categoria_de = _diccionarios()
+        total = sum(modelo.objects.filter(venta__anulada=False).count() for modelo, _ in modelos)
+        # Arreglos del tamaño final escritos directo a disco: en memoria solo queda un lote
+        arreglos = {
+            nombre: np.lib.format.open_memmap(temporal / f'{nombre}.npy', mode='w+', dtype=dtype, shape=(total,))
+            for nombre, dtype in COLUMNAS.items()
+        } if total else {nombre: np.empty(0, dtype=dtype) for nombre, dtype in COLUMNAS.items()}
+        escritas = 0
+        for modelo, archivada in modelos:
+            ultimo_id = 0
+            while filas := _lineas(modelo, ultimo_id, tamano_lote):
+                escritas = _escribir_lote(
+                    arreglos, escritas, filas, archivada, por_producto, categoria_de, codigo_metodo,
+                )
+                ultimo_id = filas[-1][0]
+                if progreso:
+                    progreso(escritas, total)
+
+    for nombre, arreglo in arreglos.items():
+        if total:
+            arreglo.flush()
+        else:
+            np.save(temporal / f'{nombre}.npy', arreglo)
+    meta = {
+        'version': VERSION,
+        'creada': timezone.now().isoformat(),
+        # Momento de los datos: el del snapshot de reportes, o la creación si se leyó la base activa
+        'datos_al': (fecha_snapshot or timezone.now()).isoformat(),
+        'filas': escritas,
+        'columnas': COLUMNAS,
+        'diccionarios': {
+            'producto': nombres_producto,
+            'categoria': nombres_categoria,
+            'metodo_pago': [dict(Ventas.METODOS_PAGO)[clave] for clave in metodos],
+        },
+    }
+    (temporal / 'meta.json').write_text(json.dumps(meta, ensure_ascii=False))
+    del arreglos
+    _reemplazar(temporal, ruta)
+    return escritas
+
+
+class Instantanea:
+    """Columnas de una instantánea abiertas con memoria mapeada (solo lectura)."""
+
+    def __init__(self, ruta):
+        self.ruta = Path(ruta)
+        meta = json.loads((self.ruta / 'meta.json').read_text())
+        if meta['version'] != VERSION:
+            raise ValueError(f'Instantánea versión {meta["version"]}; se esperaba {VERSION}. Volver a exportar.')
+        self.creada = meta['creada']
+        self.datos_al = meta['datos_al']
+        self.filas = meta['filas']
+        self.diccionarios = meta['diccionarios']
+        modo = 'r' if self.filas else None  # un arreglo vacío no se puede mapear
+        self.columnas = {
+            nombre: np.load(self.ruta / f'{nombre}.npy', mmap_mode=modo)[:self.filas]
+            for nombre in meta['columnas']
+        }
+
+    def __getitem__(self, nombre):
+        return self.columnas[nombre]
+
+    def __len__(self):
+        return self.filas
+
+    def etiquetas(self, columna, codigos):
+        """Decodifica códigos de una columna con diccionario (producto, categoria, metodo_pago)."""
+        return np.asarray(self.diccionarios[columna], dtype=object)[codigos]
+
+    def sumar_por(self, columna, valores=None, mascara=None):
+        """
+        {etiqueta: total} de `valores` (nombre de columna; None = contar líneas) agrupado por una
+        columna con diccionario, opcionalmente solo donde `mascara` es verdadera.
+        """
+        codigos = self[columna]
+        pesos = None if valores is None else self[valores]
+        if mascara is not None:
+            codigos = codigos[mascara]
+            pesos = None if pesos is None else pesos[mascara]
+        totales = np.bincount(codigos, weights=pesos, minlength=len(self.diccionarios[columna]))
+        return dict(zip(self.diccionarios[columna], totales.tolist()))
+
+
+def cargar(ruta=None):
+    return Instantanea(ruta or ruta_por_defecto())
@@ -0,0 +1,76 @@
+"""
+Anulación de ventas por lote (un turno equivocado, una importación duplicada).
+
+Una venta anulada no se borra: queda marcada (`anulada`, fecha y motivo) y deja de contar en los
+KPIs, el ranking, las estadísticas de clientes y los reportes. Su mercancía vuelve al stock con
+movimientos 'ENT'. Todo el lote se aplica en una transacción con un número fijo de consultas:
+
+1. las ventas del lote que no estaban anuladas (ids),
+2. la foto de esas ventas para los resúmenes incrementales (ver efectos_venta.py),
+3. las piezas a devolver por producto, en una sola consulta agregada,
+4. la marca de anulación, protegida: si otra anulación ganó alguna venta, se revierte todo,
+5. un solo UPDATE del stock (CASE por producto) y un bulk_create de los movimientos 'ENT'.
+"""
+from collections import namedtuple
+
+from django.db import transaction
+from django.db.models import Case, F, QuerySet, Sum, When
+from django.utils import timezone
+
+from .efectos_venta import fotos_ventas, registrar_efectos
+from .models import CambioProducto, DetalleVenta, Inventario, Producto, Ventas
+
+# Cada venta y cada producto son parámetros de la consulta; SQLite admite 32766 por sentencia
+MAX_VENTAS_POR_ANULACION = 5000
+
+Anulacion = namedtuple('Anulacion', 'ventas productos unidades')
+
+
+def anular_ventas(ventas, motivo, responsable=None):
+    """
+    Anula las ventas de `ventas` (QuerySet de Ventas o lista de ids) que no estén ya anuladas.
+    Devuelve Anulacion(ventas, productos, unidades). ValueError si el lote es demasiado grande
+    o si otra operación anuló alguna de las ventas al mismo tiempo.
+    """
+    motivo = (motivo or '').strip()
+    if not motivo:
+        raise ValueError('Indique el motivo de la anulación.')
+    if not isinstance(ventas, QuerySet):
+        ventas = Ventas.objects.filter(id__in=list(ventas))
+
+    with transaction.atomic():
+        ids = list(ventas.filter(anulada=False).order_by().values_list('id', flat=True)[:MAX_VENTAS_POR_ANULACION + 1])
+        if len(ids) > MAX_VENTAS_POR_ANULACION:
+            raise ValueError(f'Se pueden anular hasta {MAX_VENTAS_POR_ANULACION} ventas por lote.')
+        if not ids:
+            return Anulacion(0, 0, 0)
+
+        antes = fotos_ventas(ids)
+        cantidades = dict(
+            DetalleVenta.objects.filter(venta_id__in=ids).values('producto_id')
+            .annotate(unidades=Sum('cantidad_vendida')).order_by().values_list('producto_id', 'unidades')
+        )
+
+        ahora = timezone.now()
+        marcadas = Ventas.objects.filter(id__in=ids, anulada=False).update(
+            anulada=True, fecha_anulacion=ahora, motivo_anulacion=motivo[:255],
+        )
+        if marcadas != len(ids):
+            raise ValueError('Otra operación anuló algunas de estas ventas; intente de nuevo.')
+
+        if cantidades:
+            Producto.objects.filter(id__in=list(cantidades)).update(
+                stock=Case(*[When(id=pid, then=F('stock') + unidades) for pid, unidades in cantidades.items()])
+            )
+            razon = f'Anulación de venta #{ids[0]}' if len(ids) == 1 else f'Anulación de {len(ids)} ventas'
+            razon = f'{razon}: {motivo}'
+            Inventario.objects.bulk_create([
+                Inventario(producto_id=pid, tipo_movimiento='ENT', cantidad=unidades, razon=razon[:255],
+                           responsable=responsable or None)
+                for pid, unidades in cantidades.items()
+            ])
+            CambioProducto.registrar(cantidades)
+
+        # Los resúmenes restan las ventas anuladas; fotos_ventas ya no las vuelve a tomar
+        registrar_efectos(antes=antes)
+    return Anulacion(len(ids), len(cantidades), sum(cantidades.values()))
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AppProductosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app_productos'
+
+    def ready(self):
+        # Registra las funciones de la cola de tareas (ver tareas.py)
+        from . import efectos_venta  # noqa: F401
@@ -0,0 +1,294 @@
+"""
+Archivo histórico de ventas y movimientos de inventario.
+
+Las filas anteriores a una fecha de corte se mueven por lotes a las tablas *Archivada/*Archivado.
+Cada lote es una transacción: una fila está siempre en la tabla caliente o en la fría, nunca
+en ambas ni en ninguna, así que el proceso se puede interrumpir y reanudar en cualquier momento.
+Las lecturas por rango de fechas consultan el archivo solo si el rango empieza antes del corte.
+
+Los movimientos de inventario más antiguos que el horizonte de compactación (activos o archivados)
+se resumen en un renglón por producto, día, tipo y sucursal (`compactar_movimientos`), con la suma
+exacta de sus cantidades: la bitácora deja de crecer con la historia y los totales no cambian.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q, Sum
+from django.utils import timezone
+
+from .models import (
+    DetalleVenta, DetalleVentaArchivada, EstadoArchivo, Inventario, InventarioArchivado,
+    ResumenInventarioDiario, VentaArchivada, Ventas,
+)
+from .paginacion import LIMITE_CONTEO
+
+TABLA_VENTAS = 'ventas'
+TABLA_INVENTARIO = 'inventario'
+TABLA_RESUMEN_INVENTARIO = 'inventario_resumen'
+TAMANO_LOTE = 1000
+# Renglones a partir de los cuales un producto se busca recorriendo las ventas por fecha (ver buscar_ventas)
+UMBRAL_PRODUCTO_FRECUENTE = 5000
+
+CAMPOS_VENTA = (
+    'id', 'fecha_venta', 'cliente_id', 'nombre_cliente', 'metodo_pago', 'monto_total',
+    'empleado_vendedor_id', 'vendedor', 'esta_pagada', 'notas', 'tienda_id',
+    'anulada', 'fecha_anulacion', 'motivo_anulacion',
+)
+CAMPOS_DETALLE = (
+    'id', 'venta_id', 'producto_id', 'cantidad_vendida', 'precio_unitario', 'descuento_porcentaje', 'subtotal',
+)
+DETALLES = {Ventas: DetalleVenta, VentaArchivada: DetalleVentaArchivada}
+CAMPOS_MOVIMIENTO = (
+    'id', 'producto_id', 'tipo_movimiento', 'cantidad', 'fecha_movimiento', 'razon', 'responsable', 'tienda_id',
+)
+
+
+def _iniciar(tabla, corte):
+    """Registra el nuevo corte ANTES de mover filas, para que las lecturas ya consulten el archivo."""
+    estado, creado = EstadoArchivo.objects.get_or_create(tabla=tabla, defaults={'corte': corte})
+    if not creado and corte > estado.corte:
+        estado.corte = corte
+    estado.en_progreso = True
+    estado.save()
+    return estado
+
+
+def _terminar(estado, movidas):
+    EstadoArchivo.objects.filter(pk=estado.pk).update(en_progreso=False)
+    return movidas
+
+
+def archivar_ventas(corte, tamano_lote=TAMANO_LOTE, progreso=None):
+    """Mueve al archivo las ventas (con sus detalles) anteriores a `corte`. Devuelve cuántas movió."""
+    estado = _iniciar(TABLA_VENTAS, corte)
+    movidas = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                Ventas.objects.filter(fecha_venta__lt=corte).order_by('id').values_list('id', flat=True)[:tamano_lote]
+            )
+            if not ids:
+                break
+            VentaArchivada.objects.bulk_create(
+                [VentaArchivada(**v) for v in Ventas.objects.filter(id__in=ids).values(*CAMPOS_VENTA)],
+                ignore_conflicts=True,
+            )
+            DetalleVentaArchivada.objects.bulk_create(
+                [DetalleVentaArchivada(**d) for d in DetalleVenta.objects.filter(venta_id__in=ids).values(*CAMPOS_DETALLE)],
+                ignore_conflicts=True,
+            )
+            DetalleVenta.objects.filter(venta_id__in=ids).delete()
+            Ventas.objects.filter(id__in=ids).delete()
+            EstadoArchivo.objects.filter(pk=estado.pk).update(filas_archivadas=F('filas_archivadas') + len(ids))
+        movidas += len(ids)
+        if progreso:
+            progreso(movidas)
+    return _terminar(estado, movidas)
+
+
+def archivar_movimientos(corte, tamano_lote=TAMANO_LOTE, progreso=None):
+    """Mueve al archivo los movimientos de inventario anteriores a `corte`. Devuelve cuántos movió."""
+    estado = _iniciar(TABLA_INVENTARIO, corte)
+    movidas = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                Inventario.objects.filter(fecha_movimiento__lt=corte).order_by('id').values_list('id', flat=True)[:tamano_lote]
+            )
+            if not ids:
+                break
+            InventarioArchivado.objects.bulk_create(
+                [InventarioArchivado(**m) for m in Inventario.objects.filter(id__in=ids).values(*CAMPOS_MOVIMIENTO)],
+                ignore_conflicts=True,
+            )
+            Inventario.objects.filter(id__in=ids).delete()
+            EstadoArchivo.objects.filter(pk=estado.pk).update(filas_archivadas=F('filas_archivadas') + len(ids))
+        movidas += len(ids)
+        if progreso:
+            progreso(movidas)
+    return _terminar(estado, movidas)
+
+
+def _acumular_resumenes(movimientos):
+    """Suma los movimientos a sus resúmenes diarios: un bulk_update de los existentes y un bulk_create."""
+    deltas = defaultdict(lambda: [0, 0])
+    for m in movimientos:
+        clave = (m['producto_id'], timezone.localdate(m['fecha_movimiento']), m['tipo_movimiento'], m['tienda_id'])
+        deltas[clave][0] += m['cantidad']
+        deltas[clave][1] += 1
+    existentes = {
+        (r.producto_id, r.fecha, r.tipo_movimiento, r.tienda_id): r
+        for r in ResumenInventarioDiario.objects.filter(
+            producto_id__in={c[0] for c in deltas}, fecha__in={c[1] for c in deltas}
+        )
+    }
+    modificados, nuevos = [], []
+    for clave, (cantidad, num) in deltas.items():
+        resumen = existentes.get(clave)
+        if resumen is None:
+            nuevos.append(ResumenInventarioDiario(
+                producto_id=clave[0], fecha=clave[1], tipo_movimiento=clave[2], tienda_id=clave[3],
+                cantidad=cantidad, num_movimientos=num,
+            ))
+        else:
+            resumen.cantidad += cantidad
+            resumen.num_movimientos += num
+            modificados.append(resumen)
+    ResumenInventarioDiario.objects.bulk_update(modificados, ['cantidad', 'num_movimientos'])
+    ResumenInventarioDiario.objects.bulk_create(nuevos)
+
+
+def compactar_movimientos(corte, tamano_lote=TAMANO_LOTE, progreso=None):
+    """
+    Sustituye los movimientos (activos y archivados) anteriores a `corte` por resúmenes diarios.
+    Cada lote suma y borra en la misma transacción. Devuelve cuántos movimientos compactó.
+    """
+    estado = _iniciar(TABLA_RESUMEN_INVENTARIO, corte)
+    compactados = 0
+    for modelo in (InventarioArchivado, Inventario):
+        while True:
+            with transaction.atomic():
+                filas = list(
+                    modelo.objects.filter(fecha_movimiento__lt=corte).order_by('id')
+                    .values('id', 'producto_id', 'tipo_movimiento', 'cantidad', 'fecha_movimiento', 'tienda_id')
+                    [:tamano_lote]
+                )
+                if not filas:
+                    break
+                _acumular_resumenes(filas)
+                modelo.objects.filter(id__in=[f['id'] for f in filas]).delete()
+                EstadoArchivo.objects.filter(pk=estado.pk).update(filas_archivadas=F('filas_archivadas') + len(filas))
+            compactados += len(filas)
+            if progreso:
+                progreso(compactados)
+    return _terminar(estado, compactados)
+
+
+def totales_movimientos():
+    """{(producto_id, tipo): cantidad} de toda la bitácora (activa, archivada y resumida), para conciliar."""
+    totales = defaultdict(int)
+    for modelo in (Inventario, InventarioArchivado, ResumenInventarioDiario):
+        for fila in modelo.objects.values('producto_id', 'tipo_movimiento').annotate(total=Sum('cantidad')).order_by():
+            totales[(fila['producto_id'], fila['tipo_movimiento'])] += fila['total'] or 0
+    return dict(totales)
+
+
+def _corte(tabla):
+    return EstadoArchivo.objects.filter(tabla=tabla).values_list('corte', flat=True).first()
+
+
+def _en_rango(queryset, campo, desde, hasta):
+    if desde:
+        queryset = queryset.filter(**{f'{campo}__gte': desde})
+    if hasta:
+        queryset = queryset.filter(**{f'{campo}__lt': hasta})
+    return queryset
+
+
+def necesita_archivo(tabla, desde):
+    """True si un rango que empieza en `desde` (None = sin límite) alcanza datos archivados."""
+    corte = _corte(tabla)
+    return corte is not None and (desde is None or desde < corte)
+
+
+def _tablas_ventas(desde, incluir_archivo):
+    if incluir_archivo is None:
+        incluir_archivo = desde is not None and necesita_archivo(TABLA_VENTAS, desde)
+    return (Ventas, VentaArchivada) if incluir_archivo else (Ventas,)
+
+
+def _ventas_filtradas(modelo, desde, hasta, filtros):
+    return _en_rango(modelo.objects.filter(**filtros), 'fecha_venta', desde, hasta)
+
+
+def buscar_ventas(desde=None, hasta=None, filtros=None, producto_id=None, despues=None, limite=50,
+                  incluir_archivo=None, limite_conteo=LIMITE_CONTEO):
+    """
+    Una página de ventas del rango [desde, hasta), más recientes primero, paginada por llave:
+    `despues` es el (fecha, id) de la última venta de la página anterior. `filtros`
+    (p. ej. {'cliente_id': 3}) se aplica a ambas tablas; `producto_id` deja solo las ventas que lo
+    contienen. Las ventas archivadas siguen a las activas (siempre son más antiguas que el corte).
+
+    Devuelve (ventas, hay_mas, total, total_acotado). El total nunca lee más de `limite_conteo`
+    filas (ver paginacion.py); si `total_acotado`, es una cota inferior.
+    """
+    filtros = filtros or {}
+    ventas, total, acotado = [], 0, False
+    for modelo in _tablas_ventas(desde, incluir_archivo):
+        consulta = _ventas_filtradas(modelo, desde, hasta, filtros)
+        pagina = consulta
+        restante = limite_conteo - total
+        if producto_id:
+            detalles = DETALLES[modelo].objects.filter(producto_id=producto_id)
+            renglones = detalles[:max(restante, UMBRAL_PRODUCTO_FRECUENTE)].count()
+            if renglones >= UMBRAL_PRODUCTO_FRECUENTE:
+                # Producto frecuente: recorrer las ventas en el orden de la página y probar cada una
+                # contra el índice (venta, producto) llena la página pronto
+                pagina = consulta.filter(Exists(detalles.filter(venta=OuterRef('pk'))))
+            else:
+                # Poco vendido: partir de sus renglones (índice por producto) y ordenar pocos
+                pagina = consulta.filter(detalleventa__producto_id=producto_id)
+            # Un renglón por venta (único por venta y producto): contar entre los `restante` más
+            # recientes, los mismos que alimentan las primeras páginas (el índice por producto
+            # lleva el id del renglón, así que el orden sale del índice)
+            consulta = consulta.filter(id__in=detalles.order_by('-id').values('venta_id')[:restante])
+            acotado = acotado or renglones >= restante
+        if restante > 0:
+            total += consulta[:restante].count()
+            acotado = acotado or total >= limite_conteo
+
+        if len(ventas) <= limite:
+            pagina = pagina.select_related('cliente', 'empleado_vendedor')
+            if despues:
+                fecha, venta_id = despues
+                pagina = pagina.filter(Q(fecha_venta__lt=fecha) | Q(fecha_venta=fecha, id__lt=venta_id))
+            ventas += pagina.order_by('-fecha_venta', '-id')[:limite + 1 - len(ventas)]
+    if acotado:
+        total = max(total, len(ventas))
+    return ventas[:limite], len(ventas) > limite, total, acotado
+
+
+# Fuentes de movimientos en el orden en que se recorren (de la más reciente a la más antigua)
+FUENTE_ACTIVOS, FUENTE_ARCHIVO, FUENTE_RESUMEN = 'a', 'h', 'r'
+ORDEN_FUENTES = {FUENTE_ACTIVOS: 0, FUENTE_ARCHIVO: 1, FUENTE_RESUMEN: 2}
+
+
+def fuente_de(movimiento):
+    """Fuente de un renglón devuelto por `movimientos_en_rango`."""
+    if getattr(movimiento, 'resumen', False):
+        return FUENTE_RESUMEN
+    return FUENTE_ARCHIVO if getattr(movimiento, 'archivada', False) else FUENTE_ACTIVOS
+
+
+def movimientos_en_rango(movimientos, desde=None, hasta=None, incluir_archivo=None, despues=None, limite=100):
+    """
+    Una página de movimientos del rango [desde, hasta), más recientes primero, paginada por llave:
+    `despues` es el (fuente, fecha, id) del último renglón de la página anterior. El archivo sigue a
+    los activos si el rango lo alcanza, y los días anteriores al horizonte de compactación aparecen
+    al final como resúmenes diarios (`ResumenInventarioDiario`). Devuelve (movimientos, hay_mas).
+    """
+    fuentes = [(FUENTE_ACTIVOS, _en_rango(movimientos, 'fecha_movimiento', desde, hasta), 'fecha_movimiento')]
+    if incluir_archivo is None:
+        incluir_archivo = desde is not None and necesita_archivo(TABLA_INVENTARIO, desde)
+    if incluir_archivo:
+        fuentes.append((FUENTE_ARCHIVO, _en_rango(
+            InventarioArchivado.objects.select_related('producto'), 'fecha_movimiento', desde, hasta
+        ), 'fecha_movimiento'))
+    if desde is not None and necesita_archivo(TABLA_RESUMEN_INVENTARIO, desde):
+        resumenes = ResumenInventarioDiario.objects.select_related('producto').filter(fecha__gte=timezone.localdate(desde))
+        if hasta:
+            resumenes = resumenes.filter(fecha__lt=timezone.localdate(hasta))
+        fuentes.append((FUENTE_RESUMEN, resumenes, 'fecha'))
+
+    pagina = []
+    for fuente, consulta, campo in fuentes:
+        if despues:
+            fuente_anterior, fecha, ultimo_id = despues
+            if ORDEN_FUENTES[fuente] < ORDEN_FUENTES[fuente_anterior]:
+                continue
+            if fuente == fuente_anterior:
+                consulta = consulta.filter(Q(**{f'{campo}__lt': fecha}) | Q(**{campo: fecha, 'id__lt': ultimo_id}))
+        pagina += consulta.order_by(f'-{campo}', '-id')[:limite + 1 - len(pagina)]
+        if len(pagina) > limite:
+            break
+    return pagina[:limite], len(pagina) > limite
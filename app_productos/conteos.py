@@ -0,0 +1,165 @@
+"""
+Conteos físicos de inventario por sesión.
+
+1. Se abre una `SesionConteo` (parcial: solo lo escaneado; completa: lo no escaneado cuenta como 0).
+2. Cada escáner sube lotes de (código de barras, cantidad) con `registrar_lote`. Un lote lleva un
+   identificador propio, así que reenviarlo tras un corte de red no vuelve a sumar sus líneas. Un
+   mismo código en varios lotes (el producto está en dos pasillos) se suma.
+3. `diferencias` compara lo contado contra Producto.stock con una sola consulta: LEFT JOIN de
+   productos con las líneas de la sesión, agrupado por producto.
+4. `aplicar` reemplaza el stock de los productos con diferencia por lo contado con un solo UPDATE
+   (subconsulta correlacionada, sin un parámetro por producto) y registra un movimiento 'AJU' con
+   la diferencia de cada uno. Un conteo de 20 mil productos se aplica en segundos.
+"""
+from collections import namedtuple
+
+from django.db import transaction
+from django.db.models import Count, F, FilteredRelation, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Abs, Coalesce
+from django.utils import timezone
+
+from .models import CambioProducto, ConteoCapturado, Inventario, Producto, SesionConteo
+
+MAX_LINEAS_POR_LOTE = 5000
+# Productos por consulta al registrar la bitácora de cambios (límite de parámetros de SQLite)
+LOTE_BITACORA = 10000
+
+Aplicacion = namedtuple('Aplicacion', 'productos piezas_sobrantes piezas_faltantes')
+
+
+def parsear_lineas(texto):
+    """Convierte 'codigo, cantidad' (una por renglón) en [{'codigo_barras', 'cantidad'}]."""
+    lineas = []
+    for numero, renglon in enumerate(texto.splitlines(), start=1):
+        renglon = renglon.strip()
+        if not renglon:
+            continue
+        partes = [p.strip() for p in renglon.replace('\t', ',').split(',')]
+        try:
+            # Un código solo, como lo entrega un escáner de mano, es una pieza
+            cantidad = int(partes[1]) if len(partes) > 1 and partes[1] else 1
+        except ValueError:
+            raise ValueError(f'Línea {numero} inválida: "{renglon}"')
+        lineas.append({'codigo_barras': partes[0], 'cantidad': cantidad})
+    return lineas
+
+
+def registrar_lote(sesion, lote, lineas):
+    """
+    Guarda un lote de líneas contadas en la sesión (abierta). Devuelve (líneas guardadas, códigos
+    desconocidos); un lote que ya se había recibido guarda 0 líneas.
+    """
+    lote = str(lote or '').strip()
+    if not lote or len(lote) > 64:
+        raise ValueError('Cada lote necesita un identificador de 1 a 64 caracteres.')
+    if not lineas:
+        raise ValueError('El lote no tiene líneas.')
+    if len(lineas) > MAX_LINEAS_POR_LOTE:
+        raise ValueError(f'Máximo {MAX_LINEAS_POR_LOTE} líneas por lote.')
+
+    # Un código repetido dentro del lote (se escaneó pieza por pieza) se acumula
+    cantidades = {}
+    for linea in lineas:
+        codigo = str(linea.get('codigo_barras') or '').strip()
+        cantidad = int(linea['cantidad'])
+        if not codigo or len(codigo) > 100:
+            raise ValueError(f'Código de barras inválido: "{codigo}"')
+        if cantidad < 0:
+            raise ValueError('Las cantidades contadas no pueden ser negativas.')
+        cantidades[codigo] = cantidades.get(codigo, 0) + cantidad
+
+    productos = dict(Producto.objects.filter(codigo_barras__in=list(cantidades)).values_list('codigo_barras', 'id'))
+    desconocidos_lote = sorted(set(cantidades) - set(productos))
+    with transaction.atomic():
+        if not SesionConteo.objects.filter(pk=sesion.pk, estado='ABI').exists():
+            raise ValueError('La sesión de conteo ya se aplicó.')
+        if ConteoCapturado.objects.filter(sesion=sesion, lote=lote).exists():
+            return 0, desconocidos_lote
+        # ignore_conflicts: si el mismo lote llega dos veces al mismo tiempo, el segundo no duplica
+        ConteoCapturado.objects.bulk_create([
+            ConteoCapturado(sesion=sesion, lote=lote, codigo_barras=codigo, producto_id=productos.get(codigo),
+                            cantidad=cantidad)
+            for codigo, cantidad in cantidades.items()
+        ], ignore_conflicts=True)
+    return len(cantidades), desconocidos_lote
+
+
+def diferencias(sesion):
+    """
+    Productos contados (o todos, si la sesión es completa) con `stock`, `contado` y `diferencia`
+    (contado - stock). Una sola consulta; filtrar con .exclude(diferencia=0) para ver solo ajustes.
+    """
+    productos = Producto.objects.annotate(
+        captura=FilteredRelation('conteos', condition=Q(conteos__sesion=sesion)),
+    ).values('id', 'nombre', 'codigo_barras', 'stock')
+    if sesion.completo:
+        productos = productos.annotate(contado=Coalesce(Sum('captura__cantidad'), Value(0)))
+    else:
+        productos = productos.annotate(contado=Sum('captura__cantidad')).filter(contado__isnull=False)
+    return productos.annotate(diferencia=F('contado') - F('stock')).order_by()
+
+
+def resumen(sesion, limite):
+    """
+    Las `limite` diferencias mayores (en valor absoluto) y los totales de todas: (filas, número de
+    productos con diferencia, piezas sobrantes, piezas faltantes). Dos consultas; nada se ordena ni
+    se suma en Python, aunque la sesión completa tenga diferencias en todo el catálogo.
+    """
+    ajustes = diferencias(sesion).exclude(diferencia=0)
+    totales = ajustes.aggregate(
+        num=Count('id'),
+        sobrantes=Sum('diferencia', filter=Q(diferencia__gt=0)),
+        faltantes=Sum('diferencia', filter=Q(diferencia__lt=0)),
+    )
+    filas = list(ajustes.order_by(Abs('diferencia').desc(), 'id')[:limite])
+    return filas, totales['num'], totales['sobrantes'] or 0, -(totales['faltantes'] or 0)
+
+
+def desconocidos(sesion):
+    """[(código, cantidad)] escaneados que no están en el catálogo."""
+    return list(
+        ConteoCapturado.objects.filter(sesion=sesion, producto__isnull=True).values('codigo_barras')
+        .annotate(cantidad=Sum('cantidad')).order_by('codigo_barras').values_list('codigo_barras', 'cantidad')
+    )
+
+
+def aplicar(sesion, excluir=(), responsable=None):
+    """
+    Aplica las diferencias de la sesión, salvo las de los productos en `excluir` (ids), y la cierra.
+    Devuelve Aplicacion(productos, piezas_sobrantes, piezas_faltantes).
+    """
+    excluir = [int(producto_id) for producto_id in excluir]
+    with transaction.atomic():
+        # La marca va primero: toma el candado de escritura de la base, así ninguna venta cambia el
+        # stock entre la lectura de las diferencias y el UPDATE (los movimientos cuadran con el stock)
+        if not SesionConteo.objects.filter(pk=sesion.pk, estado='ABI').update(
+            estado='APL', fecha_aplicacion=timezone.now(),
+        ):
+            raise ValueError('La sesión de conteo ya se aplicó.')
+
+        ajustes = diferencias(sesion).exclude(diferencia=0).exclude(id__in=excluir)
+        filas = list(ajustes.values_list('id', 'nombre', 'stock', 'contado'))
+        if not filas:
+            return Aplicacion(0, 0, 0)
+
+        contado = ConteoCapturado.objects.filter(sesion=sesion, producto_id=OuterRef('pk')).values(
+            'producto_id'
+        ).annotate(total=Sum('cantidad')).values('total')
+        Producto.objects.filter(id__in=ajustes.values('id')).update(stock=Coalesce(Subquery(contado), Value(0)))
+
+        razon = f'Conteo #{sesion.id} ({sesion.nombre})'
+        Inventario.objects.bulk_create([
+            Inventario(
+                producto_id=producto_id, tipo_movimiento='AJU', cantidad=cantidad - stock,
+                razon=f'{razon}: sistema {stock}, contado {cantidad}'[:255], responsable=responsable or None,
+            )
+            for producto_id, _, stock, cantidad in filas
+        ], batch_size=1000)
+        ids = [fila[0] for fila in filas]
+        for inicio in range(0, len(ids), LOTE_BITACORA):
+            CambioProducto.registrar(ids[inicio:inicio + LOTE_BITACORA])
+    return Aplicacion(
+        len(filas),
+        sum(cantidad - stock for _, _, stock, cantidad in filas if cantidad > stock),
+        sum(stock - cantidad for _, _, stock, cantidad in filas if cantidad < stock),
+    )
@@ -0,0 +1,95 @@
+"""
+Efectos secundarios de crear, editar o borrar ventas.
+
+Cada ruta que modifica ventas (vistas, API por lote, admin) toma una "foto" de las ventas
+antes y después del cambio y llama a `registrar_efectos`, que encola la tarea para después
+del commit. Los resúmenes incrementales (KPIs, etc.) restan la foto anterior y suman la
+nueva, sin re-agregar el histórico.
+"""
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import estadisticas_clientes, kpis, ranking, reporte_empleados, tareas
+from .models import DetalleVenta, Ventas
+
+
+def fotos_ventas(venta_ids):
+    """Estado actual de las ventas indicadas (dos consultas, sin importar cuántas sean)."""
+    venta_ids = list(venta_ids)
+    if not venta_ids:
+        return []
+
+    lineas = defaultdict(list)
+    for venta_id, producto_id, cantidad, subtotal in DetalleVenta.objects.filter(
+        venta_id__in=venta_ids
+    ).values_list('venta_id', 'producto_id', 'cantidad_vendida', 'subtotal'):
+        lineas[venta_id].append((producto_id, cantidad, subtotal))
+
+    fotos = []
+    # Una venta anulada ya se restó de los resúmenes: no tiene foto
+    for venta in Ventas.objects.filter(id__in=venta_ids, anulada=False).values(
+        'id', 'fecha_venta', 'metodo_pago', 'monto_total', 'cliente_id', 'empleado_vendedor_id'
+    ):
+        fecha = venta['fecha_venta']
+        venta['fecha'] = timezone.localdate(fecha) if timezone.is_aware(fecha) else fecha.date()
+        venta['lineas'] = lineas.get(venta['id'], [])
+        fotos.append(venta)
+    return fotos
+
+
+def aplicar_efectos(antes=(), despues=()):
+    """Resta las fotos `antes` y suma las fotos `despues` en todos los resúmenes incrementales."""
+    # El ranking va antes que los KPIs: al alinear sus ventanas lee las cubetas diarias de KPIs
+    ranking.aplicar_fotos(antes, despues)
+    kpis.aplicar_fotos(antes, despues)
+    estadisticas_clientes.aplicar_fotos(antes, despues)
+
+
+def registrar_efectos(antes=(), despues=()):
+    """
+    Encola la actualización de los resúmenes para después del commit de la venta.
+    Las fotos se toman ya (dentro de la transacción), así que el resultado no depende
+    de cuándo corra la tarea: los deltas se pueden aplicar en cualquier orden.
+    """
+    if antes or despues:
+        tareas.encolar('efectos_venta', antes=_serializar(antes), despues=_serializar(despues))
+    # Los reportes cacheados de periodos cerrados solo cambian si se tocan ventas de días anteriores
+    hoy = timezone.localdate()
+    if any(foto['fecha'] < hoy for foto in (*antes, *despues)):
+        transaction.on_commit(reporte_empleados.invalidar)
+
+
+@tareas.tarea('efectos_venta')
+def _aplicar_efectos_encolados(antes, despues):
+    aplicar_efectos(_deserializar(antes), _deserializar(despues))
+
+
+def _serializar(fotos):
+    return [
+        {
+            'id': f['id'],
+            'fecha': f['fecha'].isoformat(),
+            'metodo_pago': f['metodo_pago'],
+            'monto_total': str(f['monto_total']),
+            'cliente_id': f['cliente_id'],
+            'empleado_vendedor_id': f['empleado_vendedor_id'],
+            'lineas': [[pid, cantidad, str(subtotal)] for pid, cantidad, subtotal in f['lineas']],
+        }
+        for f in fotos
+    ]
+
+
+def _deserializar(fotos):
+    return [
+        dict(
+            f,
+            fecha=date.fromisoformat(f['fecha']),
+            monto_total=Decimal(f['monto_total']),
+            lineas=[(pid, cantidad, Decimal(subtotal)) for pid, cantidad, subtotal in f['lineas']],
+        )
+        for f in fotos
+    ]
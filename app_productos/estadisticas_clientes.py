@@ -0,0 +1,156 @@
+"""
+Estadísticas de compra por cliente mantenidas de forma incremental.
+
+`aplicar_fotos` se llama en cada alta, edición o baja de ventas (ver efectos_venta.py), así que
+la ficha del cliente lee sus totales sin re-agregar su historial. `recalcular` las reconstruye
+desde las ventas activas y archivadas (comando `recalcular_estadisticas_clientes`).
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum
+from django.utils import timezone
+
+from .models import (
+    ClienteProducto, DetalleVenta, DetalleVentaArchivada, EstadisticaCliente, VentaArchivada, Ventas,
+)
+
+NUM_FAVORITOS = 5
+
+
+def _aplicar_productos(deltas):
+    """Suma los deltas {(cliente_id, producto_id): [unidades, gasto]} con un bulk_update y un bulk_create."""
+    if not deltas:
+        return
+    existentes = {
+        (f.cliente_id, f.producto_id): f
+        for f in ClienteProducto.objects.filter(
+            cliente_id__in={c for c, _ in deltas}, producto_id__in={p for _, p in deltas}
+        )
+    }
+    modificados, nuevos = [], []
+    for clave, (unidades, gasto) in deltas.items():
+        fila = existentes.get(clave)
+        if fila is None:
+            nuevos.append(ClienteProducto(cliente_id=clave[0], producto_id=clave[1], unidades=unidades, gasto=gasto))
+        else:
+            fila.unidades += unidades
+            fila.gasto += gasto
+            modificados.append(fila)
+    ClienteProducto.objects.bulk_update(modificados, ['unidades', 'gasto'])
+    ClienteProducto.objects.bulk_create(nuevos)
+
+
+def _fechas_reales(cliente_ids):
+    """{cliente_id: (primera, ultima)} leídas de las ventas (índice cliente + fecha)."""
+    fechas = {}
+    for modelo in (Ventas, VentaArchivada):
+        for fila in modelo.objects.filter(cliente_id__in=cliente_ids, anulada=False).values('cliente_id').annotate(
+            primera=Min('fecha_venta'), ultima=Max('fecha_venta')
+        ).order_by():
+            primera, ultima = timezone.localdate(fila['primera']), timezone.localdate(fila['ultima'])
+            actual = fechas.get(fila['cliente_id'])
+            fechas[fila['cliente_id']] = (min(actual[0], primera), max(actual[1], ultima)) if actual else (primera, ultima)
+    return fechas
+
+
+def aplicar_fotos(antes=(), despues=()):
+    """Resta las ventas de `antes` y suma las de `despues` en las estadísticas de sus clientes."""
+    clientes = defaultdict(lambda: [0, Decimal('0.00'), None, None])
+    productos = defaultdict(lambda: [0, Decimal('0.00')])
+    # Clientes que perdieron una venta: su primera/última compra puede haber cambiado
+    revisar_fechas = set()
+    for signo, fotos in ((-1, antes), (1, despues)):
+        for foto in fotos:
+            cliente_id = foto['cliente_id']
+            if cliente_id is None:
+                continue
+            delta = clientes[cliente_id]
+            delta[0] += signo
+            delta[1] += signo * foto['monto_total']
+            if signo > 0:
+                delta[2] = min(delta[2] or foto['fecha'], foto['fecha'])
+                delta[3] = max(delta[3] or foto['fecha'], foto['fecha'])
+            else:
+                revisar_fechas.add(cliente_id)
+            for producto_id, cantidad, subtotal in foto['lineas']:
+                contador = productos[(cliente_id, producto_id)]
+                contador[0] += signo * cantidad
+                contador[1] += signo * subtotal
+
+    if not clientes:
+        return
+
+    _aplicar_productos({k: v for k, v in productos.items() if v[0] or v[1]})
+    existentes = EstadisticaCliente.objects.in_bulk(list(clientes))
+    fechas = _fechas_reales(list(revisar_fechas)) if revisar_fechas else {}
+
+    modificados, nuevos = [], []
+    for cliente_id, (num, gasto, primera, ultima) in clientes.items():
+        stats = existentes.get(cliente_id)
+        if stats is None:
+            stats = EstadisticaCliente(cliente_id=cliente_id)
+            nuevos.append(stats)
+        else:
+            modificados.append(stats)
+        stats.num_compras += num
+        stats.gasto_total += gasto
+        if cliente_id in revisar_fechas:
+            stats.primera_compra, stats.ultima_compra = fechas.get(cliente_id, (None, None))
+        else:
+            stats.primera_compra = min(filter(None, (stats.primera_compra, primera)), default=None)
+            stats.ultima_compra = max(filter(None, (stats.ultima_compra, ultima)), default=None)
+        stats.actualizado = timezone.now()
+    EstadisticaCliente.objects.bulk_update(
+        modificados, ['num_compras', 'gasto_total', 'primera_compra', 'ultima_compra', 'actualizado']
+    )
+    EstadisticaCliente.objects.bulk_create(nuevos)
+
+
+@transaction.atomic
+def recalcular(cliente_ids=None):
+    """Reconstruye desde cero las estadísticas (de `cliente_ids` o de todos los clientes)."""
+    def filtrar(queryset, campo):
+        return queryset.filter(**{f'{campo}__in': cliente_ids}) if cliente_ids is not None else queryset
+
+    totales = defaultdict(lambda: [0, Decimal('0.00')])
+    for modelo in (Ventas, VentaArchivada):
+        for fila in filtrar(modelo.objects.exclude(cliente_id=None).filter(anulada=False), 'cliente_id').values('cliente_id').annotate(
+            num=Count('id'), gasto=Sum('monto_total')
+        ).order_by():
+            totales[fila['cliente_id']][0] += fila['num']
+            totales[fila['cliente_id']][1] += (fila['gasto'] or Decimal('0')).quantize(Decimal('0.01'))
+
+    productos = defaultdict(lambda: [0, Decimal('0.00')])
+    for modelo in (DetalleVenta, DetalleVentaArchivada):
+        for fila in filtrar(modelo.objects.exclude(venta__cliente_id=None).filter(venta__anulada=False), 'venta__cliente_id').values(
+            'venta__cliente_id', 'producto_id'
+        ).annotate(unidades=Sum('cantidad_vendida'), gasto=Sum('subtotal')).order_by():
+            contador = productos[(fila['venta__cliente_id'], fila['producto_id'])]
+            contador[0] += fila['unidades'] or 0
+            contador[1] += fila['gasto'] or Decimal('0.00')
+
+    fechas = _fechas_reales(list(totales))
+    filtrar(EstadisticaCliente.objects.all(), 'cliente_id').delete()
+    filtrar(ClienteProducto.objects.all(), 'cliente_id').delete()
+    EstadisticaCliente.objects.bulk_create([
+        EstadisticaCliente(
+            cliente_id=cliente_id, num_compras=num, gasto_total=gasto,
+            primera_compra=fechas[cliente_id][0], ultima_compra=fechas[cliente_id][1],
+        )
+        for cliente_id, (num, gasto) in totales.items()
+    ], batch_size=1000)
+    ClienteProducto.objects.bulk_create([
+        ClienteProducto(cliente_id=cliente_id, producto_id=producto_id, unidades=unidades, gasto=gasto)
+        for (cliente_id, producto_id), (unidades, gasto) in productos.items()
+    ], batch_size=1000)
+    return len(totales)
+
+
+def favoritos(cliente_id, limite=NUM_FAVORITOS):
+    """Productos más comprados por el cliente (una consulta sobre el índice cliente + unidades)."""
+    return list(
+        ClienteProducto.objects.filter(cliente_id=cliente_id, unidades__gt=0)
+        .select_related('producto').order_by('-unidades')[:limite]
+    )
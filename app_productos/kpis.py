@@ -0,0 +1,179 @@
+"""
+KPIs del tablero de inicio mantenidos de forma incremental.
+
+`aplicar_fotos` se llama en cada alta, edición o baja de ventas (ver efectos_venta.py);
+el comando `recalcular_kpis` reconstruye los días indicados desde cero como red de seguridad.
+Los productos con stock bajo del día en curso se cuentan al leer el tablero: el stock también
+cambia por recepciones, conteos, anulaciones y el admin, que no pasan por las ventas.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from . import archivo
+from .models import DetalleVenta, DetalleVentaArchivada, KpiDiario, KpiProductoDia, Producto, VentaArchivada, Ventas
+
+UMBRAL_STOCK_BAJO = 5
+TOP_N = 10
+
+
+def _nuevo_dia():
+    return {'num': 0, 'ingresos': Decimal('0.00'), 'metodos': defaultdict(lambda: [0, Decimal('0.00')])}
+
+
+def _top_productos(fecha):
+    top = (
+        KpiProductoDia.objects.filter(fecha=fecha, unidades__gt=0)
+        .order_by('-unidades')
+        .values('producto_id', 'producto__nombre', 'unidades', 'ingresos')[:TOP_N]
+    )
+    return [
+        {'producto_id': t['producto_id'], 'nombre': t['producto__nombre'],
+         'unidades': t['unidades'], 'ingresos': str(t['ingresos'])}
+        for t in top
+    ]
+
+
+def _aplicar_productos(deltas):
+    """Suma los deltas {(fecha, producto_id): [unidades, ingresos]} con un bulk_update y un bulk_create."""
+    if not deltas:
+        return
+    fechas = {fecha for fecha, _ in deltas}
+    producto_ids = {pid for _, pid in deltas}
+    existentes = {
+        (k.fecha, k.producto_id): k
+        for k in KpiProductoDia.objects.filter(fecha__in=fechas, producto_id__in=producto_ids)
+    }
+    modificados, nuevos = [], []
+    for clave, (unidades, ingresos) in deltas.items():
+        fila = existentes.get(clave)
+        if fila is None:
+            nuevos.append(KpiProductoDia(fecha=clave[0], producto_id=clave[1], unidades=unidades, ingresos=ingresos))
+        else:
+            fila.unidades += unidades
+            fila.ingresos += ingresos
+            modificados.append(fila)
+    KpiProductoDia.objects.bulk_update(modificados, ['unidades', 'ingresos'])
+    KpiProductoDia.objects.bulk_create(nuevos)
+
+
+def aplicar_fotos(antes=(), despues=()):
+    """Resta las ventas de `antes` y suma las de `despues` en los KPIs de sus días."""
+    dias = {}
+    productos = defaultdict(lambda: [0, Decimal('0.00')])
+    for signo, fotos in ((-1, antes), (1, despues)):
+        for foto in fotos:
+            dia = dias.setdefault(foto['fecha'], _nuevo_dia())
+            dia['num'] += signo
+            dia['ingresos'] += signo * foto['monto_total']
+            metodo = dia['metodos'][foto['metodo_pago']]
+            metodo[0] += signo
+            metodo[1] += signo * foto['monto_total']
+            for producto_id, cantidad, subtotal in foto['lineas']:
+                contador = productos[(foto['fecha'], producto_id)]
+                contador[0] += signo * cantidad
+                contador[1] += signo * subtotal
+
+    if not dias:
+        return
+
+    _aplicar_productos({k: v for k, v in productos.items() if v[0] or v[1]})
+    bajo_stock = Producto.objects.filter(stock__lte=UMBRAL_STOCK_BAJO).count()
+    existentes = {k.fecha: k for k in KpiDiario.objects.filter(fecha__in=list(dias))}
+
+    for fecha, dia in dias.items():
+        kpi = existentes.get(fecha) or KpiDiario(fecha=fecha)
+        kpi.num_ventas += dia['num']
+        kpi.ingresos += dia['ingresos']
+        por_metodo = dict(kpi.ventas_por_metodo)
+        for codigo, (num, monto) in dia['metodos'].items():
+            actual = por_metodo.get(codigo, {'num': 0, 'monto': '0.00'})
+            por_metodo[codigo] = {'num': actual['num'] + num, 'monto': str(Decimal(actual['monto']) + monto)}
+        kpi.ventas_por_metodo = por_metodo
+        kpi.top_productos = _top_productos(fecha)
+        kpi.productos_bajo_stock = bajo_stock
+        kpi.save()
+
+
+def _inicio_dia(fecha):
+    inicio = datetime.combine(fecha, time.min)
+    return timezone.make_aware(inicio) if settings.USE_TZ else inicio
+
+
+@transaction.atomic
+def recalcular(fecha_inicio, fecha_fin):
+    """
+    Reconstruye desde cero los KPIs de los días [fecha_inicio, fecha_fin]. Si el rango alcanza el
+    archivo histórico, las ventas archivadas cuentan igual que las activas.
+    """
+    desde = _inicio_dia(fecha_inicio)
+    hasta = _inicio_dia(fecha_fin + timedelta(days=1))
+    tablas = [(Ventas, DetalleVenta)]
+    if archivo.necesita_archivo(archivo.TABLA_VENTAS, desde):
+        tablas.append((VentaArchivada, DetalleVentaArchivada))
+
+    dias = defaultdict(_nuevo_dia)
+    productos = defaultdict(lambda: [0, Decimal('0.00')])
+    for modelo_venta, modelo_detalle in tablas:
+        ventas = modelo_venta.objects.filter(fecha_venta__gte=desde, fecha_venta__lt=hasta, anulada=False)
+        for fila in ventas.annotate(dia=TruncDate('fecha_venta')).values('dia', 'metodo_pago').annotate(
+            num=Count('id'), monto=Sum('monto_total')
+        ):
+            monto = (fila['monto'] or Decimal('0')).quantize(Decimal('0.01'))
+            dia = dias[fila['dia']]
+            dia['num'] += fila['num']
+            dia['ingresos'] += monto
+            metodo = dia['metodos'][fila['metodo_pago']]
+            metodo[0] += fila['num']
+            metodo[1] += monto
+
+        # Un día partido por el corte del archivo suma sus dos mitades. Las líneas archivadas de un
+        # producto ya borrado no tienen a qué KpiProductoDia sumarse
+        for fila in (
+            modelo_detalle.objects.filter(venta__in=ventas, producto_id__in=Producto.objects.values('id'))
+            .annotate(dia=TruncDate('venta__fecha_venta')).values('dia', 'producto_id')
+            .annotate(unidades=Sum('cantidad_vendida'), ingresos=Sum('subtotal'))
+        ):
+            contador = productos[(fila['dia'], fila['producto_id'])]
+            contador[0] += fila['unidades'] or 0
+            contador[1] += fila['ingresos'] or Decimal('0.00')
+
+    KpiProductoDia.objects.filter(fecha__gte=fecha_inicio, fecha__lte=fecha_fin).delete()
+    KpiProductoDia.objects.bulk_create([
+        KpiProductoDia(fecha=fecha, producto_id=producto_id, unidades=unidades, ingresos=ingresos)
+        for (fecha, producto_id), (unidades, ingresos) in productos.items()
+    ], batch_size=1000)
+
+    bajo_stock = Producto.objects.filter(stock__lte=UMBRAL_STOCK_BAJO).count()
+    fecha = fecha_inicio
+    while fecha <= fecha_fin:
+        dia = dias.get(fecha, _nuevo_dia())
+        KpiDiario.objects.update_or_create(fecha=fecha, defaults={
+            'num_ventas': dia['num'],
+            'ingresos': dia['ingresos'],
+            'ventas_por_metodo': {c: {'num': n, 'monto': str(m)} for c, (n, m) in dia['metodos'].items()},
+            'top_productos': _top_productos(fecha),
+            'productos_bajo_stock': bajo_stock,
+        })
+        fecha += timedelta(days=1)
+
+
+def leer_tablero(fecha=None):
+    """Contexto del tablero de inicio: una sola consulta sobre KpiDiario."""
+    fecha = fecha or timezone.localdate()
+    kpi = KpiDiario.objects.filter(fecha=fecha).first() or KpiDiario(fecha=fecha)
+    if fecha == timezone.localdate():
+        kpi.productos_bajo_stock = Producto.objects.filter(stock__lte=UMBRAL_STOCK_BAJO).count()
+    etiquetas = dict(Ventas.METODOS_PAGO)
+    metodos = [
+        {'codigo': codigo, 'nombre': etiquetas.get(codigo, codigo), 'num': datos['num'], 'monto': datos['monto']}
+        for codigo, datos in sorted(kpi.ventas_por_metodo.items())
+        if datos['num']
+    ]
+    return {'kpi': kpi, 'metodos_pago_kpi': metodos, 'umbral_stock_bajo': UMBRAL_STOCK_BAJO}
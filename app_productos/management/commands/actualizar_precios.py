@@ -0,0 +1,39 @@
+"""
+Cambio masivo de precios por categoría y/o proveedor.
+
+Sin --aplicar solo muestra la vista previa:
+    python manage.py actualizar_precios --proveedor 3 --porcentaje 7
+    python manage.py actualizar_precios --categoria 5 --redondeo 0.50 --aplicar
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from app_productos import precios
+
+
+class Command(BaseCommand):
+    help = 'Aplica un porcentaje y/o redondeo a los precios de una categoría o proveedor con un solo UPDATE.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categoria', type=int)
+        parser.add_argument('--proveedor', type=int)
+        parser.add_argument('--porcentaje', default='0', help='Cambio porcentual, p. ej. 7 o -5.')
+        parser.add_argument('--redondeo', default=None, help='Múltiplo al que se redondea, p. ej. 0.50.')
+        parser.add_argument('--responsable', default='Comando actualizar_precios')
+        parser.add_argument('--aplicar', action='store_true', help='Aplicar el cambio (por defecto solo vista previa).')
+
+    def handle(self, *args, **options):
+        try:
+            porcentaje, redondeo = precios.validar_regla(options['porcentaje'], options['redondeo'])
+            productos = precios.productos_afectados(options['categoria'], options['proveedor'])
+        except (ValueError, ArithmeticError) as e:
+            raise CommandError(str(e) or 'Regla inválida.')
+
+        if not options['aplicar']:
+            muestra, total = precios.previsualizar(productos, porcentaje, redondeo, limite=50)
+            for producto, nuevo in muestra:
+                self.stdout.write(f'{producto.nombre}: {producto.precio_venta} -> {nuevo}')
+            self.stdout.write(f'{total} productos afectados. Usa --aplicar para confirmar.')
+            return
+
+        lote = precios.aplicar(options['categoria'], options['proveedor'], porcentaje, redondeo, options['responsable'])
+        self.stdout.write(self.style.SUCCESS(f'{lote.num_productos} precios actualizados (lote #{lote.id}).'))
@@ -0,0 +1,73 @@
+"""
+Anula por lote las ventas elegidas por id o por filtro y devuelve su mercancía al stock
+(ver app_productos/anulaciones.py):
+    python manage.py anular_ventas --ids 1024,1025 --motivo "Importación duplicada"
+    python manage.py anular_ventas --desde 2025-03-01 --hasta 2025-03-01 --empleado 7 --motivo "Turno de prueba" --simular
+"""
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from app_productos import anulaciones
+from app_productos.models import Ventas
+
+
+def _inicio(fecha):
+    inicio = datetime.combine(fecha, time.min)
+    return timezone.make_aware(inicio) if settings.USE_TZ else inicio
+
+
+def _fecha(texto, opcion):
+    fecha = parse_date(texto)
+    if fecha is None:
+        raise CommandError(f'{opcion} debe tener el formato AAAA-MM-DD.')
+    return fecha
+
+
+class Command(BaseCommand):
+    help = 'Anula ventas por id o por filtro: devuelve su mercancía al stock y las saca de los reportes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ids', default='', help='IDs de venta separados por coma.')
+        parser.add_argument('--desde', help='Primer día (AAAA-MM-DD, inclusive).')
+        parser.add_argument('--hasta', help='Último día (AAAA-MM-DD, inclusive).')
+        parser.add_argument('--empleado', type=int, help='ID del empleado vendedor.')
+        parser.add_argument('--metodo-pago', choices=[clave for clave, _ in Ventas.METODOS_PAGO])
+        parser.add_argument('--motivo', required=True)
+        parser.add_argument('--responsable', default=None)
+        parser.add_argument('--simular', action='store_true', help='Solo contar las ventas que se anularían.')
+
+    def handle(self, *args, **options):
+        ventas = Ventas.objects.filter(anulada=False)
+        ids = [valor.strip() for valor in options['ids'].split(',') if valor.strip()]
+        if ids:
+            if not all(valor.isdigit() for valor in ids):
+                raise CommandError('--ids debe ser una lista de enteros separados por coma.')
+            ventas = ventas.filter(id__in=[int(valor) for valor in ids])
+        if options['desde']:
+            ventas = ventas.filter(fecha_venta__gte=_inicio(_fecha(options['desde'], '--desde')))
+        if options['hasta']:
+            ventas = ventas.filter(fecha_venta__lt=_inicio(_fecha(options['hasta'], '--hasta') + timedelta(days=1)))
+        if options['empleado'] is not None:
+            ventas = ventas.filter(empleado_vendedor_id=options['empleado'])
+        if options['metodo_pago']:
+            ventas = ventas.filter(metodo_pago=options['metodo_pago'])
+        if not (ids or options['desde'] or options['hasta'] or options['empleado'] is not None):
+            raise CommandError('Indique --ids o un filtro (--desde, --hasta, --empleado): nunca se anula todo.')
+
+        if options['simular']:
+            num = ventas[:anulaciones.MAX_VENTAS_POR_ANULACION + 1].count()
+            self.stdout.write(f'Se anularían {num} ventas.' if num <= anulaciones.MAX_VENTAS_POR_ANULACION
+                              else f'Más de {anulaciones.MAX_VENTAS_POR_ANULACION} ventas: acote los filtros.')
+            return
+        try:
+            resultado = anulaciones.anular_ventas(ventas, options['motivo'], responsable=options['responsable'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f'{resultado.ventas} ventas anuladas; {resultado.unidades} piezas de '
+            f'{resultado.productos} productos regresaron al stock.'
+        ))
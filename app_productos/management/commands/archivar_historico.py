@@ -0,0 +1,50 @@
+"""
+Mueve ventas y movimientos de inventario de periodos cerrados al archivo histórico.
+
+Se puede interrumpir y volver a ejecutar; continúa donde se quedó:
+    python manage.py archivar_historico --meses 6 --lote 1000
+"""
+from datetime import datetime, time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from app_productos import archivo
+
+
+def _inicio_de_mes(hoy, meses_atras):
+    mes = hoy.month - meses_atras
+    anio = hoy.year + (mes - 1) // 12
+    mes = (mes - 1) % 12 + 1
+    inicio = datetime.combine(hoy.replace(year=anio, month=mes, day=1), time.min)
+    return timezone.make_aware(inicio) if settings.USE_TZ else inicio
+
+
+class Command(BaseCommand):
+    help = 'Archiva ventas y movimientos de inventario anteriores a los últimos N meses, por lotes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meses', type=int, default=6,
+                            help='Meses completos a conservar en las tablas activas (además del mes en curso).')
+        parser.add_argument('--lote', type=int, default=archivo.TAMANO_LOTE,
+                            help='Filas por transacción.')
+        parser.add_argument('--tabla', choices=['ventas', 'inventario', 'todas'], default='todas')
+
+    def handle(self, *args, **options):
+        if options['meses'] < 1 or options['lote'] < 1:
+            raise CommandError('--meses y --lote deben ser enteros positivos.')
+        corte = _inicio_de_mes(timezone.localdate(), options['meses'])
+        self.stdout.write(f'Archivando datos anteriores a {corte:%Y-%m-%d}...')
+
+        if options['tabla'] in ('ventas', 'todas'):
+            movidas = archivo.archivar_ventas(
+                corte, options['lote'], progreso=lambda n: self.stdout.write(f'  ventas: {n}')
+            )
+            self.stdout.write(self.style.SUCCESS(f'{movidas} ventas archivadas.'))
+
+        if options['tabla'] in ('inventario', 'todas'):
+            movidas = archivo.archivar_movimientos(
+                corte, options['lote'], progreso=lambda n: self.stdout.write(f'  movimientos: {n}')
+            )
+            self.stdout.write(self.style.SUCCESS(f'{movidas} movimientos archivados.'))
@@ -0,0 +1,172 @@
+"""
+Compara el arranque en frío y la memoria de los perfiles de settings (ENTORNO=desarrollo|produccion).
+
+Por cada perfil lanza varios procesos nuevos. Cada uno importa la aplicación WSGI y avisa que está
+listo: ese tiempo, medido desde que se lanzó el proceso, es el arranque en frío. Luego el proceso
+pide una vez cada vista principal (la primera petición paga la carga de middleware, URLs y
+plantillas), las vuelve a pedir --peticiones veces (régimen estable) y reporta su RSS final.
+Las peticiones se hacen directo contra la aplicación WSGI, sin servidor ni red:
+    python manage.py benchmark_arranque --repeticiones 5 --peticiones 50
+
+Solo hace peticiones GET, pero sobre la base de datos configurada: el perfil de producción deja
+la base en modo WAL (ver settings_produccion.py).
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from backend_abarrotes import PERFILES
+
+VISTAS = (
+    'inicio', 'ver_productos', 'ver_ventas', 'ver_movimientos_inventario', 'ver_clientes',
+    'ver_empleados', 'agregar_venta', 'ver_ranking',
+)
+
+# Código del proceso medido: solo lo necesario para servir, más la medición
+PROCESO = r'''
+import json, sys, time
+from backend_abarrotes.wsgi import application
+print('listo', flush=True)
+
+from wsgiref.util import setup_testing_defaults
+from django.db import connections
+from django.urls import reverse
+
+
+def rss_mb():
+    try:
+        with open('/proc/self/status') as estado:
+            for linea in estado:
+                if linea.startswith('VmRSS:'):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        import resource
+        maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maximo / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def pedir(ruta):
+    entorno = {'PATH_INFO': ruta, 'REQUEST_METHOD': 'GET'}
+    setup_testing_defaults(entorno)
+    estados = []
+    inicio = time.perf_counter()
+    respuesta = application(entorno, lambda estado, cabeceras, exc_info=None: estados.append(estado))
+    try:
+        for _ in respuesta:
+            pass
+    finally:
+        respuesta.close()
+    return time.perf_counter() - inicio, int(estados[0].split()[0])
+
+
+vistas, peticiones = json.loads(sys.argv[1])
+rutas = {nombre: reverse(nombre) for nombre in vistas}
+resultado = {'rss_listo': rss_mb(), 'primera': {}, 'estable': {}, 'estados': {}}
+for nombre, ruta in rutas.items():
+    resultado['primera'][nombre], resultado['estados'][nombre] = pedir(ruta)
+latencias = {nombre: [] for nombre in rutas}
+for _ in range(peticiones):
+    for nombre, ruta in rutas.items():
+        latencias[nombre].append(pedir(ruta)[0])
+resultado['estable'] = {nombre: sorted(valores)[len(valores) // 2] for nombre, valores in latencias.items()}
+resultado['rss_estable'] = rss_mb()
+resultado['consultas_retenidas'] = sum(len(c.queries_log) for c in connections.all())
+print(json.dumps(resultado), flush=True)
+'''
+
+
+class Command(BaseCommand):
+    help = 'Mide arranque en frío, primera petición por vista y RSS estable de cada perfil de settings.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--perfiles', default=','.join(PERFILES),
+                            help=f'Perfiles a comparar (de: {", ".join(PERFILES)}).')
+        parser.add_argument('--repeticiones', type=int, default=5, help='Procesos nuevos por perfil.')
+        parser.add_argument('--peticiones', type=int, default=50,
+                            help='Peticiones por vista en régimen estable, en cada proceso.')
+        parser.add_argument('--vistas', default=','.join(VISTAS), help='Nombres de URL a medir.')
+        parser.add_argument('--timeout', type=float, default=300)
+
+    def handle(self, *args, **options):
+        perfiles = [p.strip() for p in options['perfiles'].split(',') if p.strip()]
+        vistas = [v.strip() for v in options['vistas'].split(',') if v.strip()]
+        if not perfiles or set(perfiles) - set(PERFILES):
+            raise CommandError(f'--perfiles admite: {", ".join(PERFILES)}.')
+        if options['repeticiones'] < 1 or options['peticiones'] < 1 or not vistas:
+            raise CommandError('--repeticiones, --peticiones y --vistas deben ser positivos / no vacíos.')
+
+        resultados = {}
+        for perfil in perfiles:
+            corridas = [
+                self._correr(perfil, vistas, options['peticiones'], options['timeout'])
+                for _ in range(options['repeticiones'])
+            ]
+            resultados[perfil] = corridas
+            self.stdout.write(f'{perfil}: {len(corridas)} procesos medidos.')
+        self._reportar(resultados, vistas)
+
+    def _entorno(self, perfil):
+        entorno = dict(os.environ, ENTORNO=perfil)
+        # El perfil lo decide ENTORNO; un DJANGO_SETTINGS_MODULE heredado lo anularía
+        entorno.pop('DJANGO_SETTINGS_MODULE', None)
+        if perfil == 'produccion':
+            entorno.setdefault('SECRET_KEY', 'benchmark-arranque-no-usar-en-produccion')
+            entorno.setdefault('ALLOWED_HOSTS', '127.0.0.1')
+        return entorno
+
+    def _correr(self, perfil, vistas, peticiones, timeout):
+        inicio = time.perf_counter()
+        proceso = subprocess.Popen(
+            [sys.executable, '-c', PROCESO, json.dumps([vistas, peticiones])],
+            cwd=settings.BASE_DIR, env=self._entorno(perfil),
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+        )
+        try:
+            listo = proceso.stdout.readline()
+            arranque = time.perf_counter() - inicio
+            linea = proceso.stdout.readline()
+            proceso.wait(timeout)
+        except subprocess.TimeoutExpired:
+            proceso.kill()
+            raise CommandError(f'El proceso de {perfil} no terminó en {timeout:.0f} s.')
+        if listo.strip() != 'listo' or not linea:
+            raise CommandError(f'El proceso de {perfil} falló:\n{proceso.stderr.read()[-2000:]}')
+        resultado = json.loads(linea)
+        resultado['arranque'] = arranque
+        fallidas = {nombre: estado for nombre, estado in resultado['estados'].items() if estado >= 400}
+        if fallidas:
+            self.stderr.write(f'{perfil}: respuestas con error {fallidas}')
+        return resultado
+
+    def _reportar(self, resultados, vistas):
+        perfiles = list(resultados)
+        mediana = statistics.median
+
+        def fila(etiqueta, valores, formato='{:>14.1f}'):
+            self.stdout.write(f'{etiqueta:<34}' + ''.join(formato.format(v) for v in valores))
+
+        self.stdout.write('\n' + f"{'(medianas entre procesos)':<34}" + ''.join(f'{p:>14}' for p in perfiles))
+        fila('arranque en frío (ms)', [mediana(c['arranque'] for c in resultados[p]) * 1000 for p in perfiles])
+        fila('RSS al arrancar (MB)', [mediana(c['rss_listo'] for c in resultados[p]) for p in perfiles])
+        fila('RSS estable (MB)', [mediana(c['rss_estable'] for c in resultados[p]) for p in perfiles])
+        fila('consultas retenidas en memoria', [mediana(c['consultas_retenidas'] for c in resultados[p]) for p in perfiles],
+             '{:>14.0f}')
+        self.stdout.write('\nprimera petición / estable (ms)')
+        for vista in vistas:
+            self.stdout.write(f'  {vista:<32}' + ''.join(
+                f"{mediana(c['primera'][vista] for c in resultados[p]) * 1000:>8.1f} /"
+                f"{mediana(c['estable'][vista] for c in resultados[p]) * 1000:>5.1f}"
+                for p in perfiles
+            ))
+        total_primera = {
+            p: mediana(sum(c['primera'].values()) for c in resultados[p]) * 1000 for p in perfiles
+        }
+        fila('primeras peticiones, total (ms)', [total_primera[p] for p in perfiles])
+        fila('arranque + primeras (ms)',
+             [mediana(c['arranque'] for c in resultados[p]) * 1000 + total_primera[p] for p in perfiles])
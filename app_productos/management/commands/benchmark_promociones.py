@@ -0,0 +1,128 @@
+"""
+Mide el motor de promociones con muchas reglas activas.
+
+Crea reglas sintéticas (por producto, N x M, por categoría, por proveedor y con franja horaria)
+sobre el catálogo actual, compila el índice y aplica canastas aleatorias midiendo la latencia y
+las consultas por canasta. Todo se hace dentro de una transacción que se revierte al final:
+    python manage.py benchmark_promociones --reglas 10000 --canastas 2000 --lineas 10
+"""
+import random
+import time
+from datetime import time as hora
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from app_productos import promociones
+from app_productos.models import Categoria, Producto, Promocion, Proveedor
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark del motor de promociones (los datos de prueba se revierten).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reglas', type=int, default=10000)
+        parser.add_argument('--canastas', type=int, default=2000)
+        parser.add_argument('--lineas', type=int, default=10, help='Renglones por canasta.')
+        parser.add_argument('--productos', type=int, default=2000,
+                            help='Tamaño mínimo del catálogo; se crean productos temporales si faltan.')
+        parser.add_argument('--semilla', type=int, default=7)
+
+    def handle(self, *args, **options):
+        if min(options['reglas'], options['canastas'], options['lineas'], options['productos']) < 1:
+            raise CommandError('Todas las cantidades deben ser enteros positivos.')
+        self.azar = random.Random(options['semilla'])
+        with transaction.atomic():
+            productos = self._catalogo(options['productos'])
+            self._crear_reglas(options['reglas'], productos)
+            self._medir(productos, options['canastas'], options['lineas'])
+            transaction.set_rollback(True)
+
+    def _catalogo(self, minimo):
+        faltan = minimo - Producto.objects.count()
+        if faltan > 0:
+            categorias = Categoria.objects.bulk_create([Categoria(nombre=f'Bench {i}') for i in range(20)])
+            proveedores = Proveedor.objects.bulk_create([Proveedor(nombre_empresa=f'Bench {i}') for i in range(20)])
+            nuevos = Producto.objects.bulk_create([
+                Producto(nombre=f'Bench {i}', precio_venta=Decimal('10.00') + i % 90, stock=10 ** 6,
+                         categoria=categorias[i % 20])
+                for i in range(faltan)
+            ])
+            Producto.proveedores.through.objects.bulk_create([
+                Producto.proveedores.through(producto_id=p.id, proveedor_id=proveedores[i % 20].id)
+                for i, p in enumerate(nuevos)
+            ])
+        return list(Producto.objects.only('id', 'categoria_id'))
+
+    def _crear_reglas(self, num, productos):
+        azar = self.azar
+        categorias = list(Categoria.objects.values_list('id', flat=True))
+        proveedores = list(Proveedor.objects.values_list('id', flat=True))
+        ahora = timezone.now()
+        reglas = []
+        for i in range(num):
+            alcance = azar.random()
+            regla = Promocion(nombre=f'Bench {i}')
+            if alcance < 0.2 and categorias:
+                regla.categoria_id = azar.choice(categorias)
+            elif alcance < 0.3 and proveedores:
+                regla.proveedor_id = azar.choice(proveedores)
+            else:
+                regla.producto_id = azar.choice(productos).id
+            if azar.random() < 0.25:
+                regla.tipo, regla.lleva, regla.paga = 'NXM', 3, 2
+            else:
+                regla.porcentaje = Decimal(azar.randint(1, 30))
+            if azar.random() < 0.3:
+                regla.vigente_desde, regla.vigente_hasta = ahora - timedelta(days=1), ahora + timedelta(days=7)
+            if azar.random() < 0.1:
+                regla.hora_inicio, regla.hora_fin = hora(18), hora(20)
+            reglas.append(regla)
+        Promocion.objects.bulk_create(reglas, batch_size=1000)
+
+    def _medir(self, productos, num_canastas, num_lineas):
+        inicio = time.perf_counter()
+        indice = promociones.compilar(promociones.version_reglas())
+        compilacion = time.perf_counter() - inicio
+        self.stdout.write(
+            f'Compilación: {indice.num_reglas} reglas en {compilacion * 1000:.0f} ms '
+            f'({len(indice.por_producto)} productos, {len(indice.por_categoria)} categorías, '
+            f'{len(indice.por_proveedor)} proveedores con reglas)'
+        )
+
+        canastas = [
+            [(p, self.azar.randint(1, 6), Decimal('0.00')) for p in self.azar.sample(productos, min(num_lineas, len(productos)))]
+            for _ in range(num_canastas)
+        ]
+        promociones.indice_actual()  # calentar: la primera canasta no paga la compilación
+        latencias, consultas, con_promocion = [], [], 0
+        for canasta in canastas:
+            with CaptureQueriesContext(connection) as capturadas:
+                inicio = time.perf_counter()
+                resultado = promociones.aplicar(canasta)
+                latencias.append(time.perf_counter() - inicio)
+            consultas.append(len(capturadas))
+            con_promocion += sum(1 for _, regla in resultado if regla)
+
+        total_lineas = num_canastas * len(canastas[0])
+        self.stdout.write(
+            f'{num_canastas} canastas x {len(canastas[0])} renglones: '
+            + ', '.join(f'p{p} {_percentil(latencias, p) * 1000:.2f} ms' for p in (50, 95, 99))
+            + f'; {total_lineas / sum(latencias):,.0f} renglones/s'
+        )
+        self.stdout.write(
+            f'Consultas por canasta: {min(consultas)}-{max(consultas)} '
+            f'(independiente del número de renglones); {con_promocion} renglones con promoción.'
+        )
+        if max(consultas) > 3:
+            raise CommandError('El motor hizo consultas por renglón.')
+        self.stdout.write(self.style.SUCCESS('Datos de prueba revertidos.'))
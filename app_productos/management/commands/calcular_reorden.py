@@ -0,0 +1,118 @@
+"""
+Calcula las sugerencias de reorden a partir de la velocidad de venta de cada producto.
+
+Pensado para ejecutarse cada noche (cron):
+    python manage.py calcular_reorden --ventanas 7,30,90 --dias-objetivo 14 --dias-entrega 3
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from app_productos.models import DetalleVenta, Producto, SugerenciaReorden
+from app_productos.reportes_db import lectura_de_reportes
+
+
+class Command(BaseCommand):
+    help = 'Calcula velocidad de venta, días de cobertura y cantidades de reorden por producto.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ventanas', default='7,30,90',
+                            help='Ventanas en días separadas por coma; se usa la velocidad más alta.')
+        parser.add_argument('--dias-objetivo', type=int, default=14,
+                            help='Días de venta que debe cubrir el stock después de reordenar.')
+        parser.add_argument('--dias-entrega', type=int, default=3,
+                            help='Tiempo de entrega del proveedor en días.')
+
+    def handle(self, *args, **options):
+        try:
+            import numpy as np
+        except ImportError:
+            raise CommandError('Este comando requiere NumPy (pip install numpy).')
+
+        try:
+            ventanas = sorted({int(v) for v in options['ventanas'].split(',') if v.strip()})
+        except ValueError:
+            raise CommandError('--ventanas debe ser una lista de enteros, p. ej. 7,30,90')
+        if not ventanas or ventanas[0] <= 0:
+            raise CommandError('Las ventanas deben ser enteros positivos.')
+        horizonte = options['dias_objetivo'] + options['dias_entrega']
+
+        ahora = timezone.now()
+        desde = ahora - timedelta(days=ventanas[-1])
+
+        # 1. Una sola consulta de las líneas vendidas en la ventana más larga, volcada a arreglos.
+        #    La lectura pesada va al snapshot de reportes para no frenar la caja.
+        filas = DetalleVenta.objects.filter(venta__fecha_venta__gte=desde, venta__anulada=False).values_list(
+            'producto_id', 'cantidad_vendida', 'venta__fecha_venta'
+        )
+        producto_ids, cantidades, edades = [], [], []
+        with lectura_de_reportes():
+            for producto_id, cantidad, fecha in filas.iterator(chunk_size=5000):
+                producto_ids.append(producto_id)
+                cantidades.append(cantidad)
+                edades.append((ahora - fecha).total_seconds())
+        producto_ids = np.asarray(producto_ids, dtype=np.int64)
+        cantidades = np.asarray(cantidades, dtype=np.float64)
+        edades_dias = np.asarray(edades, dtype=np.float64) / 86400.0
+
+        # 2. Stock actual en arreglos alineados por índice denso de producto
+        catalogo = list(Producto.objects.values_list('id', 'stock').order_by('id'))
+        if not catalogo:
+            self.stdout.write('No hay productos.')
+            return
+        ids = np.fromiter((p[0] for p in catalogo), dtype=np.int64, count=len(catalogo))
+        stock = np.fromiter((p[1] for p in catalogo), dtype=np.float64, count=len(catalogo))
+
+        # Productos borrados tras la venta no aparecen en el catálogo: se descartan
+        indice = np.searchsorted(ids, producto_ids)
+        indice = np.clip(indice, 0, len(ids) - 1)
+        validos = ids[indice] == producto_ids
+        indice, cantidades, edades_dias = indice[validos], cantidades[validos], edades_dias[validos]
+
+        # 3. Velocidad por ventana con bincount; nos quedamos con la más alta (la más conservadora)
+        velocidad = np.zeros(len(ids), dtype=np.float64)
+        for dias in ventanas:
+            en_ventana = edades_dias < dias
+            vendidas = np.bincount(indice[en_ventana], weights=cantidades[en_ventana], minlength=len(ids))
+            velocidad = np.maximum(velocidad, vendidas / dias)
+
+        con_venta = velocidad > 0
+        cobertura = np.full(len(ids), np.inf)
+        cobertura[con_venta] = np.maximum(stock[con_venta], 0) / velocidad[con_venta]
+        sugerida = np.ceil(velocidad * horizonte - np.maximum(stock, 0))
+        reordenar = np.flatnonzero(con_venta & (cobertura < horizonte) & (sugerida > 0))
+
+        # 4. Proveedor principal (el de menor id) de cada producto a reordenar
+        ids_reorden = ids[reordenar].tolist()
+        proveedor_de = {}
+        relaciones = Producto.proveedores.through.objects.filter(
+            producto_id__in=ids_reorden
+        ).order_by('producto_id', 'proveedor_id').values_list('producto_id', 'proveedor_id')
+        for producto_id, proveedor_id in relaciones:
+            proveedor_de.setdefault(producto_id, proveedor_id)
+
+        sugerencias = [
+            SugerenciaReorden(
+                producto_id=int(ids[i]),
+                proveedor_id=proveedor_de.get(int(ids[i])),
+                stock_actual=int(stock[i]),
+                velocidad_diaria=Decimal(f'{velocidad[i]:.3f}'),
+                dias_cobertura=Decimal(f'{cobertura[i]:.1f}'),
+                cantidad_sugerida=int(sugerida[i]),
+                fecha_calculo=ahora,
+            )
+            for i in reordenar
+        ]
+
+        with transaction.atomic():
+            SugerenciaReorden.objects.all().delete()
+            SugerenciaReorden.objects.bulk_create(sugerencias, batch_size=1000)
+
+        proveedores = len({s.proveedor_id for s in sugerencias})
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(sugerencias)} sugerencias de reorden para {proveedores} proveedor(es) '
+            f'({int(validos.sum())} líneas analizadas).'
+        ))
@@ -0,0 +1,47 @@
+"""
+Compacta la bitácora de inventario: los movimientos anteriores al horizonte se sustituyen por
+resúmenes diarios por producto, tipo y sucursal con la suma exacta de sus cantidades.
+
+Se puede interrumpir y volver a ejecutar; cada lote es una transacción:
+    python manage.py compactar_inventario --dias 90 --lote 1000
+    python manage.py compactar_inventario --dias 90 --verificar
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from app_productos import archivo
+from app_productos.kpis import _inicio_dia
+
+
+class Command(BaseCommand):
+    help = 'Resume por día los movimientos de inventario anteriores a los últimos N días, por lotes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=90,
+                            help='Días completos a conservar con detalle (además del día en curso).')
+        parser.add_argument('--lote', type=int, default=archivo.TAMANO_LOTE,
+                            help='Movimientos por transacción.')
+        parser.add_argument('--verificar', action='store_true',
+                            help='Comparar los totales por producto y tipo antes y después de compactar.')
+
+    def handle(self, *args, **options):
+        if options['dias'] < 1 or options['lote'] < 1:
+            raise CommandError('--dias y --lote deben ser enteros positivos.')
+        # El corte cae a medianoche: un día nunca queda repartido entre detalle y resumen
+        corte = _inicio_dia(timezone.localdate() - timedelta(days=options['dias']))
+        self.stdout.write(f'Compactando movimientos anteriores a {corte:%Y-%m-%d}...')
+
+        antes = archivo.totales_movimientos() if options['verificar'] else None
+        compactados = archivo.compactar_movimientos(
+            corte, options['lote'], progreso=lambda n: self.stdout.write(f'  movimientos: {n}')
+        )
+        self.stdout.write(self.style.SUCCESS(f'{compactados} movimientos compactados.'))
+
+        if antes is not None:
+            despues = archivo.totales_movimientos()
+            diferencias = {clave for clave in antes.keys() | despues.keys() if antes.get(clave, 0) != despues.get(clave, 0)}
+            if diferencias:
+                raise CommandError(f'Los totales cambiaron para {len(diferencias)} combinaciones producto/tipo.')
+            self.stdout.write(self.style.SUCCESS(f'Totales conciliados: {len(despues)} combinaciones producto/tipo.'))
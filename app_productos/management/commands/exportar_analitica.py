@@ -0,0 +1,43 @@
+"""
+Exporta las líneas de venta a la instantánea columnar de análisis (ver app_productos/analitica.py).
+
+    python manage.py refrescar_reportes        # opcional: exportar desde el snapshot, no la base activa
+    python manage.py exportar_analitica --salida analitica --lote 50000
+
+Requiere NumPy. La instantánea anterior se reemplaza completa al terminar.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Exporta DetalleVenta + Ventas + Producto + Categoría a arreglos NumPy columnares.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--salida', default=None, help='Directorio de la instantánea (BASE_DIR/analitica).')
+        parser.add_argument('--lote', type=int, default=None, help='Líneas leídas por consulta.')
+        parser.add_argument('--sin-archivo', action='store_true', help='Omitir las ventas archivadas.')
+
+    def handle(self, *args, **options):
+        try:
+            from app_productos import analitica
+        except ImportError as e:
+            raise CommandError(f'La instantánea de análisis requiere NumPy ({e}).')
+        lote = analitica.TAMANO_LOTE if options['lote'] is None else options['lote']
+        if lote < 1:
+            raise CommandError('--lote debe ser un entero positivo.')
+
+        inicio = time.perf_counter()
+        filas = analitica.exportar(
+            options['salida'], tamano_lote=lote, incluir_archivo=not options['sin_archivo'],
+            progreso=lambda n, total: self.stdout.write(f'  líneas: {n} / {total}'),
+        )
+        transcurrido = time.perf_counter() - inicio
+        instantanea = analitica.cargar(options['salida'])
+        tamano = sum(f.stat().st_size for f in instantanea.ruta.iterdir())
+        self.stdout.write(self.style.SUCCESS(
+            f'{filas:,} líneas exportadas a {instantanea.ruta} en {transcurrido:.1f} s '
+            f'({filas / max(transcurrido, 1e-9):,.0f} líneas/s, {tamano / 2 ** 20:,.1f} MB, '
+            f'{len(instantanea.diccionarios["producto"]) - 1:,} productos).'
+        ))
@@ -0,0 +1,131 @@
+"""
+Convierte los textos obsoletos `nombre_cliente` / `vendedor` de las ventas en llaves foráneas.
+
+Los nombres se normalizan (sin acentos, mayúsculas ni espacios repetidos) y se buscan en un índice
+en memoria de Cliente/Empleado; los que no existen se crean inactivos (para no llenar los
+selectores de la caja) y las ventas se actualizan con un UPDATE por lote. Solo se procesan ventas
+sin llave foránea, así que el comando se puede interrumpir y volver a ejecutar:
+    python manage.py migrar_nombres_legados --lote 500
+    python manage.py migrar_nombres_legados --simular
+"""
+import unicodedata
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Case, Q, Value, When
+from django.utils import timezone
+
+from app_productos import estadisticas_clientes
+from app_productos.models import Cliente, Empleado, VentaArchivada, Ventas
+
+# Textos que no identifican a nadie: la venta se queda sin llave foránea
+NOMBRES_GENERICOS = {'', '-', 'n/a', 'na', 'anonimo', 'cliente general', 'publico general', 'sistema'}
+
+
+def normalizar(nombre):
+    """Clave de comparación de un nombre: sin acentos, sin mayúsculas y con espacios simples."""
+    sin_acentos = unicodedata.normalize('NFKD', nombre).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(sin_acentos.split()).casefold()
+
+
+def _indice(modelo):
+    """{nombre normalizado: id}; ante duplicados gana el registro más antiguo."""
+    indice = {}
+    for pk, nombre in modelo.objects.order_by('id').values_list('id', 'nombre_completo').iterator():
+        indice.setdefault(normalizar(nombre or ''), pk)
+    return indice
+
+
+def _nuevo_cliente(nombre, fecha):
+    return Cliente(nombre_completo=nombre, activo=False, notas='Creado desde ventas históricas')
+
+
+def _nuevo_empleado(nombre, fecha):
+    return Empleado(nombre_completo=nombre, activo=False, fecha_contratacion=fecha)
+
+
+class Command(BaseCommand):
+    help = 'Asigna Cliente y Empleado a las ventas que solo tienen los nombres de texto obsoletos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500, help='Ventas por transacción.')
+        parser.add_argument('--sin-crear', action='store_true',
+                            help='Solo enlazar con registros existentes; no crear clientes ni empleados.')
+        parser.add_argument('--limpiar', action='store_true',
+                            help='Vaciar el texto obsoleto de las ventas que queden enlazadas.')
+        parser.add_argument('--simular', action='store_true',
+                            help='Mostrar lo que se haría y revertir todos los cambios.')
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1:
+            raise CommandError('--lote debe ser un entero positivo.')
+        self.opciones = options
+        self.clientes_enlazados = set()
+
+        pasos = (
+            ('cliente', 'nombre_cliente', Cliente, _nuevo_cliente),
+            ('empleado_vendedor', 'vendedor', Empleado, _nuevo_empleado),
+        )
+        # Cada lote se confirma por separado; la simulación envuelve todo para poder revertirlo
+        with transaction.atomic() if options['simular'] else nullcontext():
+            for campo_fk, campo_texto, destino, nuevo in pasos:
+                indice = _indice(destino)
+                for modelo in (Ventas, VentaArchivada):
+                    enlazadas, creados = self._migrar(modelo, campo_fk, campo_texto, destino, nuevo, indice)
+                    self.stdout.write(self.style.SUCCESS(
+                        f'{modelo.__name__}.{campo_fk}: {enlazadas} ventas enlazadas, '
+                        f'{creados} registros de {destino.__name__} creados.'
+                    ))
+            # Las ventas enlazadas cambian de cliente: sus estadísticas se reconstruyen
+            if self.clientes_enlazados:
+                estadisticas_clientes.recalcular(sorted(self.clientes_enlazados))
+            if options['simular']:
+                transaction.set_rollback(True)
+                self.stdout.write(self.style.WARNING('Simulación: no se guardó ningún cambio.'))
+
+    def _migrar(self, modelo, campo_fk, campo_texto, destino, nuevo, indice):
+        pendientes = modelo.objects.filter(**{f'{campo_fk}__isnull': True}).exclude(
+            Q(**{f'{campo_texto}__isnull': True}) | Q(**{campo_texto: ''})
+        )
+        ultimo_id, enlazadas, creados = 0, 0, 0
+        while True:
+            # Paginación por llave: las ventas genéricas no enlazadas no se vuelven a leer
+            filas = list(
+                pendientes.filter(id__gt=ultimo_id).order_by('id')
+                .values_list('id', campo_texto, 'fecha_venta')[:self.opciones['lote']]
+            )
+            if not filas:
+                break
+            ultimo_id = filas[-1][0]
+
+            with transaction.atomic():
+                # 1. Crear de una vez los nombres que no están en el índice
+                faltantes = {}
+                for _, texto, fecha in filas:
+                    clave = normalizar(texto)
+                    if clave not in NOMBRES_GENERICOS and clave not in indice:
+                        faltantes.setdefault(clave, nuevo(' '.join(texto.split()), timezone.localdate(fecha)))
+                if faltantes and not self.opciones['sin_crear']:
+                    destino.objects.bulk_create(faltantes.values())
+                    indice.update({clave: obj.pk for clave, obj in faltantes.items()})
+                    creados += len(faltantes)
+
+                # 2. Un UPDATE para todo el lote, agrupando las ventas por registro destino
+                por_destino = {}
+                for venta_id, texto, _ in filas:
+                    clave = normalizar(texto)
+                    destino_id = None if clave in NOMBRES_GENERICOS else indice.get(clave)
+                    if destino_id is not None:
+                        por_destino.setdefault(destino_id, []).append(venta_id)
+                if por_destino:
+                    cambios = {f'{campo_fk}_id': Case(
+                        *[When(id__in=ids, then=Value(destino_id)) for destino_id, ids in por_destino.items()]
+                    )}
+                    if self.opciones['limpiar']:
+                        cambios[campo_texto] = None
+                    venta_ids = [venta_id for grupo in por_destino.values() for venta_id in grupo]
+                    enlazadas += modelo.objects.filter(id__in=venta_ids).update(**cambios)
+                    if destino is Cliente:
+                        self.clientes_enlazados.update(por_destino)
+        return enlazadas, creados
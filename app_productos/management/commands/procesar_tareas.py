@@ -0,0 +1,55 @@
+"""
+Worker de la cola de tareas (ver app_productos/tareas.py).
+
+    python manage.py procesar_tareas --hilos 4
+    python manage.py procesar_tareas --una-vez      # procesa lo pendiente y termina
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from app_productos import tareas
+
+
+def _ejecutar(tarea_id):
+    close_old_connections()
+    try:
+        return tareas.ejecutar(tarea_id)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta las tareas pendientes de la cola con un pool de hilos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=2)
+        parser.add_argument('--intervalo', type=float, default=1.0,
+                            help='Segundos de espera cuando no hay tareas pendientes.')
+        parser.add_argument('--una-vez', action='store_true', help='Procesar lo pendiente y salir.')
+        parser.add_argument('--purgar-dias', type=int, default=7,
+                            help='Borrar tareas completadas con más de N días al iniciar.')
+
+    def handle(self, *args, **options):
+        purgadas = tareas.purgar_completadas(options['purgar_dias'])
+        if purgadas:
+            self.stdout.write(f'{purgadas} tareas completadas purgadas.')
+
+        completadas = fallidas = 0
+        with ThreadPoolExecutor(max_workers=options['hilos'], thread_name_prefix='worker') as pool:
+            while True:
+                ids = tareas.pendientes(options['hilos'] * 4)
+                if not ids:
+                    if options['una_vez']:
+                        break
+                    time.sleep(options['intervalo'])
+                    continue
+                for ok in pool.map(_ejecutar, ids):
+                    if ok:
+                        completadas += 1
+                    else:
+                        fallidas += 1
+
+        self.stdout.write(self.style.SUCCESS(f'{completadas} tareas completadas, {fallidas} con error.'))
@@ -0,0 +1,326 @@
+"""
+Prueba de carga: simula cajeros concurrentes contra un servidor local.
+
+Cada cajero es un hilo con su propia sesión (cookie CSRF) que registra ventas con canastas
+realistas, movimientos de inventario y consultas de listas. Los productos se eligen con una
+distribución de Zipf para concentrar la contención en los SKU más vendidos. Al final reporta
+rendimiento, percentiles de latencia, errores, reintentos por bloqueo de SQLite y verifica que
+el stock final cuadre con los movimientos registrados durante la prueba.
+
+El comando lee la misma base de datos que el servidor (catálogo inicial y verificación):
+    python manage.py runserver --noreload &
+    python manage.py prueba_carga --cajeros 8 --duracion 30
+    python manage.py prueba_carga --iniciar-servidor --puerto 8765
+"""
+import http.cookiejar
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Sum
+from django.urls import reverse
+
+from app_productos.models import Cliente, DetalleVenta, Empleado, Inventario, Producto, Ventas
+
+# Número de líneas por ticket y su peso (la mayoría de las compras son chicas)
+TAMANOS_CANASTA = (1, 2, 3, 4, 5, 8)
+PESOS_CANASTA = (30, 25, 18, 12, 10, 5)
+
+LISTAS = ('inicio', 'ver_ventas', 'ver_productos', 'ver_movimientos_inventario')
+RE_CSRF = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+
+class _SinRedireccion(urllib.request.HTTPRedirectHandler):
+    """Un POST exitoso responde 302; se mide solo la petición, sin seguir la redirección."""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def _percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+class Cajero(threading.Thread):
+    def __init__(self, numero, prueba):
+        super().__init__(name=f'cajero-{numero}', daemon=True)
+        self.prueba = prueba
+        self.azar = random.Random(prueba.semilla + numero)
+        self.jar = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.jar), _SinRedireccion()
+        )
+        self.csrf = None
+
+    def _solicitar(self, ruta, datos=None):
+        cuerpo = urllib.parse.urlencode(datos, doseq=True).encode() if datos is not None else None
+        peticion = urllib.request.Request(self.prueba.url + ruta, data=cuerpo)
+        if cuerpo is not None:
+            peticion.add_header('Referer', self.prueba.url + ruta)
+        try:
+            with self.opener.open(peticion, timeout=self.prueba.timeout) as respuesta:
+                return respuesta.status, respuesta.read().decode('utf-8', 'replace')
+        except urllib.error.HTTPError as e:
+            return e.code, e.read().decode('utf-8', 'replace')
+
+    def _obtener_csrf(self):
+        estado, html = self._solicitar(reverse('agregar_venta'))
+        encontrado = RE_CSRF.search(html)
+        if estado != 200 or not encontrado:
+            raise RuntimeError(f'No se pudo obtener el token CSRF (HTTP {estado}).')
+        self.csrf = encontrado.group(1)
+
+    def _canasta(self):
+        prueba = self.prueba
+        tamano = self.azar.choices(TAMANOS_CANASTA, PESOS_CANASTA)[0]
+        elegidos = set()
+        while len(elegidos) < min(tamano, len(prueba.productos)):
+            elegidos.add(self.azar.choices(prueba.productos, prueba.pesos)[0])
+        datos = {
+            'csrfmiddlewaretoken': self.csrf,
+            'cliente_id': self.azar.choice(prueba.clientes) if prueba.clientes else 'anonimo',
+            'empleado_id': self.azar.choice(prueba.empleados) if prueba.empleados else '',
+            'metodo_pago': self.azar.choice(('EFE', 'EFE', 'TAR', 'TRA')),
+            'esta_pagada': 'on',
+            'detalleventa-TOTAL_FORMS': str(len(elegidos)),
+            'detalleventa-INITIAL_FORMS': '0',
+        }
+        for i, producto_id in enumerate(elegidos):
+            datos.update({
+                f'detalleventa-{i}-producto': producto_id,
+                f'detalleventa-{i}-cantidad_vendida': self.azar.choices((1, 2, 3, 6), (70, 18, 8, 4))[0],
+                f'detalleventa-{i}-precio_unitario': prueba.precios[producto_id],
+                f'detalleventa-{i}-descuento_porcentaje': '0',
+            })
+        return reverse('agregar_venta'), datos
+
+    def _movimiento(self):
+        prueba = self.prueba
+        return reverse('agregar_movimiento_inventario'), {
+            'csrfmiddlewaretoken': self.csrf,
+            'producto': self.azar.choices(prueba.productos, prueba.pesos)[0],
+            'tipo_movimiento': 'ENT',
+            'cantidad': self.azar.randint(5, 24),
+            'razon': 'Prueba de carga',
+            'responsable': self.name,
+        }
+
+    def run(self):
+        prueba = self.prueba
+        try:
+            self._obtener_csrf()
+        except (OSError, RuntimeError) as e:
+            prueba.registrar_fallo_inicial(self.name, e)
+            return
+
+        while not prueba.detener.is_set() and prueba.tomar_operacion():
+            tipo = self.azar.choices(prueba.tipos, prueba.pesos_tipos)[0]
+            if tipo == 'venta':
+                ruta, datos = self._canasta()
+            elif tipo == 'movimiento':
+                ruta, datos = self._movimiento()
+            else:
+                ruta, datos = reverse(self.azar.choice(LISTAS)), None
+
+            for intento in range(prueba.reintentos + 1):
+                inicio = time.perf_counter()
+                try:
+                    estado, html = self._solicitar(ruta, datos)
+                except OSError as e:
+                    estado, html = None, str(e)
+                latencia = time.perf_counter() - inicio
+                bloqueo = estado == 500 and 'database is locked' in html
+                if bloqueo and intento < prueba.reintentos:
+                    prueba.registrar(tipo, latencia, 'reintento')
+                    time.sleep(0.05 * 2 ** intento * (1 + self.azar.random()))
+                    continue
+                if bloqueo:
+                    resultado = 'bloqueo'
+                elif estado is None or estado >= 400:
+                    resultado = 'error'
+                elif datos is not None and estado != 302:
+                    # El formulario se volvió a mostrar: la venta fue rechazada (p. ej. sin stock)
+                    resultado = 'rechazada'
+                else:
+                    resultado = 'ok'
+                prueba.registrar(tipo, latencia, resultado)
+                break
+
+
+class Command(BaseCommand):
+    help = 'Simula cajeros concurrentes contra un servidor local y reporta rendimiento y consistencia de stock.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default=None,
+                            help='URL base del servidor (por defecto http://127.0.0.1:<puerto>).')
+        parser.add_argument('--puerto', type=int, default=8000)
+        parser.add_argument('--iniciar-servidor', action='store_true',
+                            help='Levanta "manage.py runserver --noreload" en --puerto durante la prueba.')
+        parser.add_argument('--cajeros', type=int, default=8, help='Hilos concurrentes.')
+        parser.add_argument('--duracion', type=float, default=30, help='Segundos de prueba.')
+        parser.add_argument('--operaciones', type=int, default=0,
+                            help='Detener tras N operaciones en total (0 = solo por duración).')
+        parser.add_argument('--mezcla', default='venta=70,movimiento=10,lista=20',
+                            help='Peso relativo de cada tipo de operación.')
+        parser.add_argument('--populares', type=int, default=50,
+                            help='Número de SKU sobre los que se concentra la carga.')
+        parser.add_argument('--sesgo', type=float, default=1.1,
+                            help='Exponente de Zipf: más alto = más contención en los primeros SKU.')
+        parser.add_argument('--reintentos', type=int, default=3,
+                            help='Reintentos ante "database is locked" (requiere DEBUG=True en el servidor).')
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument('--semilla', type=int, default=1)
+
+    def handle(self, *args, **options):
+        self._validar(options)
+        self.url = (options['url'] or f"http://127.0.0.1:{options['puerto']}").rstrip('/')
+        self.timeout = options['timeout']
+        self.reintentos = options['reintentos']
+        self.semilla = options['semilla']
+        self._cargar_catalogo(options['populares'], options['sesgo'])
+
+        # Línea base para la verificación de consistencia
+        self.stock_inicial = dict(Producto.objects.values_list('id', 'stock'))
+        self.ultima_venta = Ventas.objects.aggregate(m=Max('id'))['m'] or 0
+        self.ultimo_movimiento = Inventario.objects.aggregate(m=Max('id'))['m'] or 0
+
+        self.latencias = defaultdict(list)
+        self.conteos = defaultdict(lambda: defaultdict(int))
+        self.fallos_iniciales = []
+        self.candado = threading.Lock()
+        self.detener = threading.Event()
+        self.restantes = options['operaciones'] or None
+
+        servidor = self._iniciar_servidor(options['puerto']) if options['iniciar_servidor'] else None
+        try:
+            cajeros = [Cajero(i, self) for i in range(options['cajeros'])]
+            inicio = time.perf_counter()
+            for cajero in cajeros:
+                cajero.start()
+            self.detener.wait(options['duracion'])
+            self.detener.set()
+            for cajero in cajeros:
+                cajero.join(self.timeout + 5)
+            transcurrido = time.perf_counter() - inicio
+        finally:
+            if servidor:
+                servidor.terminate()
+                servidor.wait(10)
+
+        self._reportar(transcurrido)
+        self._verificar_stock()
+
+    def _validar(self, options):
+        if options['cajeros'] < 1 or options['duracion'] <= 0 or options['populares'] < 1:
+            raise CommandError('--cajeros, --duracion y --populares deben ser positivos.')
+        mezcla = {}
+        try:
+            for parte in options['mezcla'].split(','):
+                clave, peso = parte.split('=')
+                mezcla[clave.strip()] = int(peso)
+        except ValueError:
+            raise CommandError('--mezcla debe tener la forma venta=70,movimiento=10,lista=20')
+        if not set(mezcla) <= {'venta', 'movimiento', 'lista'} or sum(mezcla.values()) <= 0:
+            raise CommandError('--mezcla admite solo venta, movimiento y lista con pesos positivos.')
+        self.tipos, self.pesos_tipos = list(mezcla), list(mezcla.values())
+
+    def _cargar_catalogo(self, populares, sesgo):
+        productos = list(
+            Producto.objects.filter(stock__gt=0).order_by('-stock', 'id').values_list('id', 'precio_venta')[:populares]
+        )
+        if not productos:
+            raise CommandError('No hay productos con stock para simular ventas.')
+        self.productos = [pid for pid, _ in productos]
+        self.precios = {pid: str(precio) for pid, precio in productos}
+        self.pesos = [1 / (rango ** sesgo) for rango in range(1, len(productos) + 1)]
+        self.clientes = list(Cliente.objects.filter(activo=True).values_list('id', flat=True)[:200])
+        self.empleados = list(Empleado.objects.filter(activo=True).values_list('id', flat=True)[:50])
+
+    def _iniciar_servidor(self, puerto):
+        proceso = subprocess.Popen(
+            [sys.executable, sys.argv[0], 'runserver', '--noreload', str(puerto)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        for _ in range(100):
+            try:
+                urllib.request.urlopen(self.url + reverse('inicio'), timeout=1).close()
+                return proceso
+            except OSError:
+                if proceso.poll() is not None:
+                    break
+                time.sleep(0.1)
+        proceso.terminate()
+        raise CommandError(f'El servidor no respondió en {self.url}.')
+
+    def tomar_operacion(self):
+        if self.restantes is None:
+            return True
+        with self.candado:
+            if self.restantes <= 0:
+                self.detener.set()
+                return False
+            self.restantes -= 1
+            return True
+
+    def registrar(self, tipo, latencia, resultado):
+        with self.candado:
+            self.conteos[tipo][resultado] += 1
+            if resultado != 'reintento':
+                self.latencias[tipo].append(latencia)
+
+    def registrar_fallo_inicial(self, cajero, error):
+        with self.candado:
+            self.fallos_iniciales.append(f'{cajero}: {error}')
+
+    def _reportar(self, transcurrido):
+        for fallo in self.fallos_iniciales:
+            self.stderr.write(fallo)
+        total = sum(len(v) for v in self.latencias.values())
+        self.stdout.write(f'\n{total} operaciones en {transcurrido:.1f} s = {total / transcurrido:.1f} op/s')
+        self.stdout.write(
+            f"{'tipo':<11}{'ok':>7}{'rechaz.':>8}{'error':>7}{'bloqueo':>8}{'reint.':>7}"
+            f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+        )
+        for tipo in self.tipos:
+            c, lat = self.conteos[tipo], self.latencias[tipo]
+            self.stdout.write(
+                f"{tipo:<11}{c['ok']:>7}{c['rechazada']:>8}{c['error']:>7}{c['bloqueo']:>8}{c['reintento']:>7}"
+                + ''.join(f'{_percentil(lat, p) * 1000:>9.0f}' for p in (50, 95, 99, 100))
+            )
+
+    def _verificar_stock(self):
+        """stock final = stock inicial + entradas - salidas registradas en Inventario durante la prueba."""
+        nuevos = Inventario.objects.filter(id__gt=self.ultimo_movimiento)
+        entradas = dict(nuevos.filter(tipo_movimiento='ENT').values_list('producto_id').annotate(t=Sum('cantidad')))
+        salidas = dict(nuevos.filter(tipo_movimiento='SAL').values_list('producto_id').annotate(t=Sum('cantidad')))
+        vendidas = dict(
+            DetalleVenta.objects.filter(venta_id__gt=self.ultima_venta)
+            .values_list('producto_id').annotate(t=Sum('cantidad_vendida'))
+        )
+
+        descuadres = []
+        for producto_id, stock in Producto.objects.filter(id__in=self.stock_inicial).values_list('id', 'stock'):
+            esperado = self.stock_inicial[producto_id] + entradas.get(producto_id, 0) - salidas.get(producto_id, 0)
+            if stock != esperado or stock < 0 or vendidas.get(producto_id, 0) != salidas.get(producto_id, 0):
+                descuadres.append(
+                    f'  producto {producto_id}: stock {stock}, esperado {esperado}, '
+                    f'vendidas {vendidas.get(producto_id, 0)}, salidas {salidas.get(producto_id, 0)}'
+                )
+
+        if descuadres:
+            self.stdout.write(self.style.ERROR(f'Stock inconsistente en {len(descuadres)} productos:'))
+            for linea in descuadres[:20]:
+                self.stdout.write(linea)
+        else:
+            self.stdout.write(self.style.SUCCESS('Stock consistente con los movimientos registrados.'))
@@ -0,0 +1,21 @@
+"""
+Reconstruye desde cero las estadísticas de compra de los clientes (carga inicial y red de
+seguridad de la actualización incremental):
+    python manage.py recalcular_estadisticas_clientes
+    python manage.py recalcular_estadisticas_clientes --cliente 12 --cliente 40
+"""
+from django.core.management.base import BaseCommand
+
+from app_productos import estadisticas_clientes
+
+
+class Command(BaseCommand):
+    help = 'Recalcula gasto, visitas, fechas de compra y productos favoritos de los clientes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cliente', type=int, action='append', dest='clientes',
+                            help='ID de cliente a recalcular (repetible). Por defecto, todos.')
+
+    def handle(self, *args, **options):
+        total = estadisticas_clientes.recalcular(options['clientes'])
+        self.stdout.write(self.style.SUCCESS(f'Estadísticas recalculadas para {total} clientes con compras.'))
@@ -0,0 +1,28 @@
+"""
+Reconstruye desde cero los KPIs del tablero (red de seguridad de la actualización incremental).
+
+Pensado para ejecutarse periódicamente (cron):
+    python manage.py recalcular_kpis --dias 2
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from app_productos import kpis
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los KPIs diarios del tablero de inicio a partir de las ventas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=1,
+                            help='Número de días a recalcular, terminando hoy (por defecto solo hoy).')
+
+    def handle(self, *args, **options):
+        if options['dias'] <= 0:
+            raise CommandError('--dias debe ser un entero positivo.')
+        hoy = timezone.localdate()
+        desde = hoy - timedelta(days=options['dias'] - 1)
+        kpis.recalcular(desde, hoy)
+        self.stdout.write(self.style.SUCCESS(f'KPIs recalculados del {desde} al {hoy}.'))
@@ -0,0 +1,33 @@
+"""
+Reconstruye desde cero el ranking de más vendidos (carga inicial y red de seguridad de la
+actualización incremental). Con --kpis también recalcula las cubetas diarias de los últimos
+30 días, que son las que el ranking resta al avanzar el día:
+    python manage.py reconstruir_ranking
+    python manage.py reconstruir_ranking --kpis
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from app_productos import kpis, ranking
+from app_productos.models import PosicionRanking
+
+
+class Command(BaseCommand):
+    help = 'Recalcula las ventanas de hoy, 7 y 30 días del ranking de productos más vendidos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kpis', action='store_true',
+                            help='Recalcular también los KPIs diarios de los días que cubre el ranking.')
+
+    def handle(self, *args, **options):
+        hoy = timezone.localdate()
+        with transaction.atomic():
+            if options['kpis']:
+                kpis.recalcular(hoy - timedelta(days=max(ranking.VENTANAS) - 1), hoy)
+            ranking.reconstruir(hoy)
+        for dias, nombre in PosicionRanking.VENTANAS:
+            self.stdout.write(f'  {nombre}: {PosicionRanking.objects.filter(ventana=dias).count()} productos')
+        self.stdout.write(self.style.SUCCESS(f'Ranking reconstruido al {hoy:%Y-%m-%d}.'))
@@ -0,0 +1,57 @@
+"""
+Refresca el snapshot de la base de reportes con la API de respaldo en línea de SQLite.
+
+La copia se hace por pasos en un archivo temporal y luego se reemplaza de forma atómica,
+así que ni la caja ni los reportes en curso se bloquean. Programarlo con cron, p. ej. cada 15 min:
+    python manage.py refrescar_reportes --si-mas-antiguo-que 600
+"""
+import os
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from app_productos.reportes_db import ALIAS_REPORTES, fecha_snapshot, ruta_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Copia la base principal al snapshot de reportes sin bloquear a los escritores.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--paginas', type=int, default=256,
+                            help='Páginas copiadas por paso; entre pasos se libera el candado de lectura.')
+        parser.add_argument('--si-mas-antiguo-que', type=int, default=0, metavar='SEGUNDOS',
+                            help='No hacer nada si el snapshot actual es más reciente que esto.')
+
+    def handle(self, *args, **options):
+        origen = settings.DATABASES['default']
+        destino = ruta_snapshot()
+        if origen['ENGINE'] != 'django.db.backends.sqlite3' or not destino:
+            raise CommandError(f'Se requiere una base SQLite y el alias "{ALIAS_REPORTES}" en DATABASES.')
+
+        actual = fecha_snapshot()
+        if actual and options['si_mas_antiguo_que']:
+            antiguedad = (timezone.now() - actual).total_seconds()
+            if antiguedad < options['si_mas_antiguo_que']:
+                self.stdout.write(f'Snapshot vigente (antigüedad {int(antiguedad)} s); no se refresca.')
+                return
+
+        temporal = f'{destino}.tmp'
+        inicio = time.time()
+        fuente = sqlite3.connect(str(origen['NAME']))
+        copia = sqlite3.connect(temporal)
+        try:
+            # Si otra conexión escribe durante la copia, SQLite la reinicia: el resultado es consistente
+            fuente.backup(copia, pages=options['paginas'], sleep=0.005)
+        finally:
+            copia.close()
+            fuente.close()
+
+        os.replace(temporal, destino)
+        # La fecha de modificación marca a qué momento corresponden los datos
+        os.utime(destino, (inicio, inicio))
+        self.stdout.write(self.style.SUCCESS(
+            f'Snapshot de reportes actualizado en {time.time() - inicio:.2f} s: {destino}'
+        ))
@@ -0,0 +1,53 @@
+"""
+Registra las sucursales de TIENDA/TIENDAS en todas las bases de este proceso.
+
+Cada base de sucursal necesita su propio registro `Tienda` para que las ventas y movimientos
+nuevos queden marcados con ella (ver `tiendas.tienda_actual_id`). Con --migrar, además aplica
+las migraciones a las bases de sucursal antes de registrar:
+    TIENDA=centro TIENDAS=centro,norte,sur python manage.py sincronizar_tiendas --migrar
+    python manage.py sincronizar_tiendas --nombre norte="Sucursal Norte"
+"""
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from app_productos.models import Tienda
+from app_productos.tiendas import alias_de, tiendas_visibles
+
+
+class Command(BaseCommand):
+    help = 'Crea los registros de sucursal en la base principal y en la base de cada sucursal.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--migrar', action='store_true',
+                            help='Aplicar migraciones a las bases de sucursal antes de registrar.')
+        parser.add_argument('--nombre', action='append', default=[], metavar='CODIGO=NOMBRE',
+                            help='Nombre visible de una sucursal (se puede repetir).')
+
+    def handle(self, *args, **options):
+        codigos = [codigo for codigo in tiendas_visibles() if codigo]
+        if not codigos:
+            raise CommandError('Configure TIENDA y/o TIENDAS (códigos separados por coma) en el entorno.')
+
+        nombres = {}
+        for par in options['nombre']:
+            codigo, separador, nombre = par.partition('=')
+            if not separador or codigo not in codigos:
+                raise CommandError(f'--nombre inválido o sucursal no configurada: {par}')
+            nombres[codigo] = nombre.strip()
+
+        # Todas las bases conocen todas las sucursales (el reporte muestra sus nombres)
+        aliases = ['default'] + [alias_de(codigo) for codigo in codigos if alias_de(codigo) != 'default']
+        for alias in aliases:
+            if options['migrar'] and alias != 'default':
+                call_command('migrate', database=alias, interactive=False, verbosity=0)
+            for codigo in codigos:
+                tienda, creada = Tienda.objects.using(alias).get_or_create(
+                    codigo=codigo, defaults={'nombre': nombres.get(codigo, codigo.title())}
+                )
+                if not creada and codigo in nombres and tienda.nombre != nombres[codigo]:
+                    tienda.nombre = nombres[codigo]
+                    tienda.save(using=alias, update_fields=['nombre'])
+            self.stdout.write(self.style.SUCCESS(
+                f'{alias} ({settings.DATABASES[alias]["NAME"]}): {len(codigos)} sucursales registradas.'
+            ))
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_productos', '0002_claveidempotencia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CambioProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('precio_venta', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('stock', models.IntegerField(blank=True, null=True)),
+                ('eliminado', models.BooleanField(default=False)),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+                ('producto', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='app_productos.producto')),
+            ],
+            options={
+                'verbose_name': 'Cambio de Producto',
+                'verbose_name_plural': 'Cambios de Productos',
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_productos', '0003_cambioproducto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecepcionMercancia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_recepcion', models.DateTimeField(auto_now_add=True)),
+                ('referencia', models.CharField(blank=True, help_text='Factura o remisión del proveedor', max_length=100, null=True)),
+                ('responsable', models.CharField(blank=True, max_length=100, null=True)),
+                ('notas', models.TextField(blank=True, null=True)),
+                ('proveedor', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='recepciones', to='app_productos.proveedor')),
+            ],
+            options={
+                'verbose_name': 'Recepción de Mercancía',
+                'verbose_name_plural': 'Recepciones de Mercancía',
+            },
+        ),
+        migrations.CreateModel(
+            name='LineaRecepcion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.IntegerField()),
+                ('costo_unitario', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='app_productos.producto')),
+                ('recepcion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lineas', to='app_productos.recepcionmercancia')),
+            ],
+            options={
+                'unique_together': {('recepcion', 'producto')},
+            },
+        ),
+    ]
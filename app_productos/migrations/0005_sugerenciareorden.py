@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_productos', '0004_recepcionmercancia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SugerenciaReorden',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock_actual', models.IntegerField()),
+                ('velocidad_diaria', models.DecimalField(decimal_places=3, help_text='Unidades vendidas por día', max_digits=10)),
+                ('dias_cobertura', models.DecimalField(decimal_places=1, max_digits=10)),
+                ('cantidad_sugerida', models.IntegerField()),
+                ('fecha_calculo', models.DateTimeField()),
+                ('producto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='sugerencia_reorden', to='app_productos.producto')),
+                ('proveedor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sugerencias_reorden', to='app_productos.proveedor')),
+            ],
+            options={
+                'verbose_name': 'Sugerencia de Reorden',
+                'verbose_name_plural': 'Sugerencias de Reorden',
+                'ordering': ['proveedor', 'dias_cobertura'],
+            },
+        ),
+    ]
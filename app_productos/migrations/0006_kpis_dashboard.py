@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:59
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_productos', '0005_sugerenciareorden'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KpiDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(unique=True)),
+                ('num_ventas', models.IntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('ventas_por_metodo', models.JSONField(default=dict)),
+                ('top_productos', models.JSONField(default=list)),
+                ('productos_bajo_stock', models.IntegerField(default=0)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'KPI Diario',
+                'verbose_name_plural': 'KPIs Diarios',
+            },
+        ),
+        migrations.CreateModel(
+            name='KpiProductoDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('unidades', models.IntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['stock'], name='producto_stock_idx'),
+        ),
+        migrations.AddField(
+            model_name='kpiproductodia',
+            name='producto',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app_productos.producto'),
+        ),
+        migrations.AddIndex(
+            model_name='kpiproductodia',
+            index=models.Index(fields=['fecha', '-unidades'], name='kpiproducto_top_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='kpiproductodia',
+            unique_together={('fecha', 'producto')},
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_productos', '0006_kpis_dashboard'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventario',
+            index=models.Index(fields=['fecha_movimiento'], name='inventario_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventario',
+            index=models.Index(fields=['tipo_movimiento', 'fecha_movimiento'], name='inventario_tipo_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ventas',
+            index=models.Index(fields=['fecha_venta'], name='ventas_fecha_idx'),
+        ),
+    ]
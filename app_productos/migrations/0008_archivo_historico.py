@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:01
+
+import app_productos.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_productos', '0007_indices_admin'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadoArchivo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tabla', models.CharField(max_length=30, unique=True)),
+                ('corte', models.DateTimeField()),
+                ('filas_archivadas', models.BigIntegerField(default=0)),
+                ('en_progreso', models.BooleanField(default=False)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='InventarioArchivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('tipo_movimiento', models.CharField(choices=[('ENT', 'Entrada'), ('SAL', 'Salida'), ('AJU', 'Ajuste')], max_length=3)),
+                ('cantidad', models.IntegerField()),
+                ('fecha_movimiento', models.DateTimeField(db_index=True)),
+                ('razon', models.CharField(blank=True, max_length=255, null=True)),
+                ('responsable', models.CharField(blank=True, max_length=100, null=True)),
+                ('producto', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='app_productos.producto')),
+            ],
+            options={
+                'verbose_name': 'Movimiento Archivado',
+                'verbose_name_plural': 'Movimientos Archivados',
+            },
+        ),
+        migrations.CreateModel(
+            name='VentaArchivada',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('fecha_venta', models.DateTimeField(db_index=True)),
+                ('nombre_cliente', models.CharField(blank=True, max_length=150, null=True)),
+                ('metodo_pago', models.CharField(choices=[('EFE', 'Efectivo'), ('TAR', 'Tarjeta de Crédito/Débito'), ('TRA', 'Transferencia Bancaria'), ('OTR', 'Otro')], max_length=3)),
+                ('monto_total', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('vendedor', models.CharField(blank=True, max_length=100, null=True)),
+                ('esta_pagada', models.BooleanField(default=True)),
+                ('notas', models.TextField(blank=True, null=True)),
+                ('cliente', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='app_productos.cliente')),
+                ('empleado_vendedor', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='app_productos.empleado')),
+            ],
+            options={
+                'verbose_name': 'Venta Archivada',
+                'verbose_name_plural': 'Ventas Archivadas',
+            },
+            bases=(app_productos.models.NombresVentaMixin, models.Model),
+        ),
+        migrations.CreateModel(
+            name='DetalleVentaArchivada',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('cantidad_vendida', models.IntegerField()),
+                ('precio_unitario', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('descuento_porcentaje', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('subtotal', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('producto', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='app_productos.producto')),
+                ('venta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='detalleventa', to='app_productos.ventaarchivada')),
+            ],
+        ),
+    ]
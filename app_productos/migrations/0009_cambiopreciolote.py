@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:03
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_productos', '0008_archivo_historico'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CambioPrecioLote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+                ('porcentaje', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=6)),
+                ('redondeo', models.DecimalField(blank=True, decimal_places=2, help_text='Múltiplo al que se redondea, p. ej. 0.50', max_digits=6, null=True)),
+                ('num_productos', models.IntegerField(default=0)),
+                ('responsable', models.CharField(blank=True, max_length=100, null=True)),
+                ('precios', models.JSONField(default=dict)),
+                ('categoria', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='app_productos.categoria')),
+                ('proveedor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='app_productos.proveedor')),
+            ],
+            options={
+                'verbose_name': 'Cambio Masivo de Precios',
+                'verbose_name_plural': 'Cambios Masivos de Precios',
+                'ordering': ['-fecha'],
+            },
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:11
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_productos', '0010_tarea'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClienteProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unidades', models.IntegerField(default=0)),
+                ('gasto', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='EstadisticaCliente',
+            fields=[
+                ('cliente', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='estadisticas', serialize=False, to='app_productos.cliente')),
+                ('num_compras', models.IntegerField(default=0)),
+                ('gasto_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('primera_compra', models.DateField(blank=True, null=True)),
+                ('ultima_compra', models.DateField(blank=True, null=True)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Estadística de Cliente',
+                'verbose_name_plural': 'Estadísticas de Clientes',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='ventaarchivada',
+            index=models.Index(fields=['cliente', '-fecha_venta', '-id'], name='ventaarch_cliente_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ventas',
+            index=models.Index(fields=['cliente', '-fecha_venta', '-id'], name='ventas_cliente_fecha_idx'),
+        ),
+        migrations.AddField(
+            model_name='clienteproducto',
+            name='cliente',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app_productos.cliente'),
+        ),
+        migrations.AddField(
+            model_name='clienteproducto',
+            name='producto',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app_productos.producto'),
+        ),
+        migrations.AddIndex(
+            model_name='clienteproducto',
+            index=models.Index(fields=['cliente', '-unidades'], name='clienteproducto_fav_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='clienteproducto',
+            unique_together={('cliente', 'producto')},
+        ),
+    ]
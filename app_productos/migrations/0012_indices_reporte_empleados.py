@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_productos', '0011_estadisticas_clientes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='detalleventa',
+            index=models.Index(fields=['venta', 'subtotal', 'cantidad_vendida'], name='detalleventa_importes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='detalleventaarchivada',
+            index=models.Index(fields=['venta', 'subtotal', 'cantidad_vendida'], name='detallearch_importes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ventaarchivada',
+            index=models.Index(fields=['fecha_venta', 'empleado_vendedor'], name='ventaarch_fecha_empleado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ventas',
+            index=models.Index(fields=['fecha_venta', 'empleado_vendedor'], name='ventas_fecha_empleado_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:22
+
+import app_productos.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_productos', '0012_indices_reporte_empleados'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tienda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('codigo', models.SlugField(help_text='Identificador usado en TIENDA/TIENDAS', max_length=30, unique=True)),
+                ('nombre', models.CharField(max_length=100)),
+                ('direccion', models.TextField(blank=True, null=True)),
+                ('activa', models.BooleanField(default=True)),
+            ],
+            options={
+                'verbose_name': 'Tienda',
+                'verbose_name_plural': 'Tiendas',
+            },
+        ),
+        migrations.AddField(
+            model_name='inventario',
+            name='tienda',
+            field=models.ForeignKey(blank=True, default=app_productos.models.tienda_por_defecto, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='movimientos', to='app_productos.tienda'),
+        ),
+        migrations.AddField(
+            model_name='inventarioarchivado',
+            name='tienda',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='app_productos.tienda'),
+        ),
+        migrations.AddField(
+            model_name='ventaarchivada',
+            name='tienda',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='app_productos.tienda'),
+        ),
+        migrations.AddField(
+            model_name='ventas',
+            name='tienda',
+            field=models.ForeignKey(blank=True, default=app_productos.models.tienda_por_defecto, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='ventas', to='app_productos.tienda'),
+        ),
+    ]
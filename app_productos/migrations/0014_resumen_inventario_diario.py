@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_productos', '0013_tiendas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenInventarioDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('tipo_movimiento', models.CharField(choices=[('ENT', 'Entrada'), ('SAL', 'Salida'), ('AJU', 'Ajuste')], max_length=3)),
+                ('cantidad', models.BigIntegerField(default=0)),
+                ('num_movimientos', models.IntegerField(default=0)),
+                ('producto', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='app_productos.producto')),
+                ('tienda', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='app_productos.tienda')),
+            ],
+            options={
+                'verbose_name': 'Resumen Diario de Inventario',
+                'verbose_name_plural': 'Resúmenes Diarios de Inventario',
+                'indexes': [models.Index(fields=['fecha'], name='resumeninv_fecha_idx')],
+                'unique_together': {('producto', 'fecha', 'tipo_movimiento', 'tienda')},
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:26
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_productos', '0014_resumen_inventario_diario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Promocion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100)),
+                ('tipo', models.CharField(choices=[('POR', 'Porcentaje de descuento'), ('NXM', 'Lleva N, paga M')], default='POR', max_length=3)),
+                ('porcentaje', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=5)),
+                ('lleva', models.PositiveIntegerField(blank=True, null=True)),
+                ('paga', models.PositiveIntegerField(blank=True, null=True)),
+                ('vigente_desde', models.DateTimeField(blank=True, null=True)),
+                ('vigente_hasta', models.DateTimeField(blank=True, null=True)),
+                ('hora_inicio', models.TimeField(blank=True, null=True)),
+                ('hora_fin', models.TimeField(blank=True, null=True)),
+                ('activa', models.BooleanField(default=True)),
+                ('actualizado', models.DateTimeField(auto_now=True, db_index=True)),
+                ('categoria', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='promociones', to='app_productos.categoria')),
+                ('producto', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='promociones', to='app_productos.producto')),
+                ('proveedor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='promociones', to='app_productos.proveedor')),
+            ],
+            options={
+                'verbose_name': 'Promoción',
+                'verbose_name_plural': 'Promociones',
+            },
+        ),
+    ]
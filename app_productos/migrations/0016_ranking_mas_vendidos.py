@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:31
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_productos', '0015_promociones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadoRanking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PosicionRanking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ventana', models.PositiveSmallIntegerField(choices=[(1, 'Hoy'), (7, 'Últimos 7 días'), (30, 'Últimos 30 días')])),
+                ('unidades', models.IntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('categoria', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='app_productos.categoria')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app_productos.producto')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ventana', '-unidades', 'producto'], name='ranking_top_idx'), models.Index(fields=['ventana', 'categoria', '-unidades', 'producto'], name='ranking_categoria_top_idx')],
+                'unique_together': {('ventana', 'producto')},
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_productos', '0016_ranking_mas_vendidos'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ventaarchivada',
+            index=models.Index(fields=['empleado_vendedor', '-fecha_venta', '-id'], name='ventaarch_empleado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ventaarchivada',
+            index=models.Index(fields=['metodo_pago', '-fecha_venta', '-id'], name='ventaarch_metodo_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ventaarchivada',
+            index=models.Index(fields=['esta_pagada', '-fecha_venta', '-id'], name='ventaarch_pagada_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ventaarchivada',
+            index=models.Index(fields=['monto_total'], name='ventaarch_monto_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ventas',
+            index=models.Index(fields=['empleado_vendedor', '-fecha_venta', '-id'], name='ventas_empleado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ventas',
+            index=models.Index(fields=['metodo_pago', '-fecha_venta', '-id'], name='ventas_metodo_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ventas',
+            index=models.Index(fields=['esta_pagada', '-fecha_venta', '-id'], name='ventas_pagada_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ventas',
+            index=models.Index(fields=['monto_total'], name='ventas_monto_idx'),
+        ),
+    ]
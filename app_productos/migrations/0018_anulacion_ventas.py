@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_productos', '0017_indices_busqueda_ventas'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ventaarchivada',
+            name='ventaarch_fecha_empleado_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='ventas',
+            name='ventas_fecha_empleado_idx',
+        ),
+        migrations.AddField(
+            model_name='ventaarchivada',
+            name='anulada',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='ventaarchivada',
+            name='fecha_anulacion',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ventaarchivada',
+            name='motivo_anulacion',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='ventas',
+            name='anulada',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='ventas',
+            name='fecha_anulacion',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ventas',
+            name='motivo_anulacion',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='ventaarchivada',
+            index=models.Index(fields=['fecha_venta', 'empleado_vendedor', 'anulada'], name='ventaarch_fecha_empleado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ventas',
+            index=models.Index(fields=['fecha_venta', 'empleado_vendedor', 'anulada'], name='ventas_fecha_empleado_idx'),
+        ),
+    ]
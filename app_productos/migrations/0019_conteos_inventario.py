@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_productos', '0018_anulacion_ventas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SesionConteo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=150)),
+                ('completo', models.BooleanField(default=False)),
+                ('estado', models.CharField(choices=[('ABI', 'Abierta'), ('APL', 'Aplicada')], default='ABI', max_length=3)),
+                ('responsable', models.CharField(blank=True, max_length=100, null=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_aplicacion', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Sesión de Conteo',
+                'verbose_name_plural': 'Sesiones de Conteo',
+            },
+        ),
+        migrations.CreateModel(
+            name='ConteoCapturado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lote', models.CharField(max_length=64)),
+                ('codigo_barras', models.CharField(max_length=100)),
+                ('cantidad', models.IntegerField()),
+                ('producto', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='conteos', to='app_productos.producto')),
+                ('sesion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='capturas', to='app_productos.sesionconteo')),
+            ],
+            options={
+                'verbose_name': 'Conteo Capturado',
+                'verbose_name_plural': 'Conteos Capturados',
+                'indexes': [models.Index(fields=['sesion', 'producto'], name='conteo_sesion_producto_idx')],
+                'constraints': [models.UniqueConstraint(fields=('sesion', 'lote', 'codigo_barras'), name='conteo_lote_codigo_unico')],
+            },
+        ),
+    ]
@@ -1,6 +1,20 @@
-from django.db import models
+import time
+
+from django.db import models, transaction
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
 from decimal import Decimal # <--- IMPORTACIÓN NECESARIA
 
+
+def tienda_por_defecto():
+    """Sucursal de las ventas y movimientos nuevos: la activa en este proceso (ver tiendas.py)."""
+    from .tiendas import tienda_actual_id
+    return tienda_actual_id()
+
+
 # ====================================
 # MODELOS NUEVOS: CLIENTE Y EMPLEADO
 # ====================================
@@ -94,12 +108,63 @@ class Producto(models.Model):
     categoria = models.ForeignKey(Categoria, on_delete=models.SET_NULL, null=True)
     proveedores = models.ManyToManyField(Proveedor, blank=True)
 
+    class Meta:
+        indexes = [
+            # Conteo de productos con stock bajo para el tablero de inicio
+            models.Index(fields=['stock'], name='producto_stock_idx'),
+        ]
+
     def __str__(self):
         return self.nombre
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Guardamos precio y stock tal como vienen de la BD para detectar cambios en save()
+        instance._catalogo_original = (instance.__dict__.get('precio_venta'), instance.__dict__.get('stock'))
+        return instance
+
+    def save(self, *args, **kwargs):
+        original = getattr(self, '_catalogo_original', None)
+        super().save(*args, **kwargs)
+
+        actual = (self.__dict__.get('precio_venta'), self.__dict__.get('stock'))
+        antes = None if original is None else _valores_catalogo(original)
+        despues = _valores_catalogo(actual)
+        if antes != despues:
+            CambioProducto.registrar([self.pk])
+            # Un cambio solo de stock (cada venta) no invalida el catálogo de precios cacheado
+            if antes is None or antes[0] != despues[0]:
+                invalidar_precios(self._state.db)
+        self._catalogo_original = actual
+
+
+def _valores_catalogo(valores):
+    """Normaliza (precio, stock): las vistas asignan strings del POST antes de guardar."""
+    precio, stock = valores
+    try:
+        return (Decimal(str(precio)), int(stock))
+    except (TypeError, ValueError, ArithmeticError):
+        return (precio, stock)
+
+
+# Métodos de visualización compartidos por Ventas y VentaArchivada
+class NombresVentaMixin:
+    def get_nombre_cliente_display(self):
+        """Método auxiliar para obtener el nombre del cliente (nuevo o antiguo)"""
+        if self.cliente:
+            return self.cliente.nombre_completo
+        return self.nombre_cliente or 'N/A'
+    
+    def get_nombre_vendedor_display(self):
+        """Método auxiliar para obtener el nombre del vendedor (nuevo o antiguo)"""
+        if self.empleado_vendedor:
+            return self.empleado_vendedor.nombre_completo
+        return self.vendedor or 'N/A'
+
 
 # Modelo 4: Ventas (Cabecera de la Venta)
-class Ventas(models.Model):
+class Ventas(NombresVentaMixin, models.Model):
     METODOS_PAGO = [
         ('EFE', 'Efectivo'),
         ('TAR', 'Tarjeta de Crédito/Débito'),
@@ -138,6 +203,32 @@ class Ventas(models.Model):
     
     esta_pagada = models.BooleanField(default=True)
     notas = models.TextField(blank=True, null=True)
+
+    # Sucursal que registró la venta
+    tienda = models.ForeignKey(
+        'Tienda', on_delete=models.PROTECT, null=True, blank=True, default=tienda_por_defecto, related_name='ventas'
+    )
+
+    # Anulación (app_productos/anulaciones.py): la venta se conserva pero deja de contar en reportes y resúmenes
+    anulada = models.BooleanField(default=False)
+    fecha_anulacion = models.DateTimeField(null=True, blank=True)
+    motivo_anulacion = models.CharField(max_length=255, blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # Listados y date_hierarchy del admin ordenan y filtran por fecha
+            models.Index(fields=['fecha_venta'], name='ventas_fecha_idx'),
+            # Historial por cliente con paginación por llave (fecha, id)
+            models.Index(fields=['cliente', '-fecha_venta', '-id'], name='ventas_cliente_fecha_idx'),
+            # Índice cubriente del reporte por empleado (rango de fechas sin leer la tabla)
+            models.Index(fields=['fecha_venta', 'empleado_vendedor', 'anulada'], name='ventas_fecha_empleado_idx'),
+            # Filtros de la lista de ventas: igualdad + orden de la paginación por llave (fecha, id)
+            models.Index(fields=['empleado_vendedor', '-fecha_venta', '-id'], name='ventas_empleado_fecha_idx'),
+            models.Index(fields=['metodo_pago', '-fecha_venta', '-id'], name='ventas_metodo_fecha_idx'),
+            models.Index(fields=['esta_pagada', '-fecha_venta', '-id'], name='ventas_pagada_fecha_idx'),
+            # Rango de importe (búsquedas acotadas por monto)
+            models.Index(fields=['monto_total'], name='ventas_monto_idx'),
+        ]
     
     def __str__(self):
         # Priorizar el cliente de ForeignKey sobre nombre_cliente
@@ -145,18 +236,6 @@ class Ventas(models.Model):
             return f"Venta #{self.id} - Cliente: {self.cliente.nombre_completo}"
         return f"Venta #{self.id} - Cliente: {self.nombre_cliente or 'N/A'}"
     
-    def get_nombre_cliente_display(self):
-        """Método auxiliar para obtener el nombre del cliente (nuevo o antiguo)"""
-        if self.cliente:
-            return self.cliente.nombre_completo
-        return self.nombre_cliente or 'N/A'
-    
-    def get_nombre_vendedor_display(self):
-        """Método auxiliar para obtener el nombre del vendedor (nuevo o antiguo)"""
-        if self.empleado_vendedor:
-            return self.empleado_vendedor.nombre_completo
-        return self.vendedor or 'N/A'
-        
     def update_monto_total(self):
         # Calcula la suma de los subtotales de todos los detalles de esta venta
         total_agregado = self.detalleventa.aggregate(total=models.Sum('subtotal'))['total']
@@ -174,6 +253,10 @@ class DetalleVenta(models.Model):
     
     class Meta:
         unique_together = ('venta', 'producto') 
+        indexes = [
+            # Índice cubriente para los reportes que suman importes y unidades por venta
+            models.Index(fields=['venta', 'subtotal', 'cantidad_vendida'], name='detalleventa_importes_idx'),
+        ]
     
     def __str__(self):
         return f"{self.cantidad_vendida} x {self.producto.nombre} en Venta #{self.venta.id}"
@@ -217,6 +300,578 @@ class Inventario(models.Model):
     fecha_movimiento = models.DateTimeField(auto_now_add=True)
     razon = models.CharField(max_length=255, blank=True, null=True)
     responsable = models.CharField(max_length=100, blank=True, null=True)
+    tienda = models.ForeignKey(
+        'Tienda', on_delete=models.PROTECT, null=True, blank=True, default=tienda_por_defecto, related_name='movimientos'
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['fecha_movimiento'], name='inventario_fecha_idx'),
+            models.Index(fields=['tipo_movimiento', 'fecha_movimiento'], name='inventario_tipo_fecha_idx'),
+        ]
     
     def __str__(self):
-        return f"Movimiento {self.tipo_movimiento} de {self.cantidad} de {self.producto.nombre}"
\ No newline at end of file
+        return f"Movimiento {self.tipo_movimiento} de {self.cantidad} de {self.producto.nombre}"
+
+# ====================================
+# API DE VENTAS POR LOTE (POS FUERA DE LÍNEA)
+# ====================================
+
+# Modelo 7: ClaveIdempotencia
+class ClaveIdempotencia(models.Model):
+    # Clave generada por la terminal POS; el índice único evita aplicar dos veces la misma venta
+    clave = models.CharField(max_length=64, unique=True)
+    venta = models.ForeignKey(Ventas, on_delete=models.SET_NULL, null=True, blank=True, related_name='claves_idempotencia')
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.clave} -> Venta #{self.venta_id}"
+
+    class Meta:
+        verbose_name = "Clave de Idempotencia"
+        verbose_name_plural = "Claves de Idempotencia"
+
+
+
+# ====================================
+# FEED DE CAMBIOS DE CATÁLOGO (PRECIO Y STOCK)
+# ====================================
+
+# Modelo 8: CambioProducto (bitácora de solo inserción; el id es el número de secuencia)
+class CambioProducto(models.Model):
+    # Sin restricción de FK para conservar el registro aunque el producto se elimine
+    producto = models.ForeignKey(Producto, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    precio_venta = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    stock = models.IntegerField(null=True, blank=True)
+    eliminado = models.BooleanField(default=False)
+    fecha = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Cambio #{self.id} de Producto {self.producto_id}"
+
+    class Meta:
+        verbose_name = "Cambio de Producto"
+        verbose_name_plural = "Cambios de Productos"
+        ordering = ['id']
+
+    # Cada id es un parámetro de la consulta; SQLite admite 32766 por sentencia
+    MAX_IDS_POR_CONSULTA = 5000
+
+    @classmethod
+    def registrar(cls, producto_ids):
+        """
+        Registra el precio y stock actuales de los productos indicados.
+        Debe llamarse después de cualquier .update() masivo, que no pasa por Producto.save().
+        """
+        producto_ids = list(producto_ids)
+        registrados = []
+        for inicio in range(0, len(producto_ids), cls.MAX_IDS_POR_CONSULTA):
+            valores = Producto.objects.filter(
+                id__in=producto_ids[inicio:inicio + cls.MAX_IDS_POR_CONSULTA]
+            ).values_list('id', 'precio_venta', 'stock')
+            registrados += cls.objects.bulk_create([
+                cls(producto_id=pid, precio_venta=precio, stock=stock) for pid, precio, stock in valores
+            ])
+        return registrados
+
+    def as_dict(self):
+        return {
+            'seq': self.id,
+            'producto_id': self.producto_id,
+            'precio_venta': None if self.precio_venta is None else str(self.precio_venta),
+            'stock': self.stock,
+            'eliminado': self.eliminado,
+        }
+
+
+def _clave_version_precios(alias):
+    return f'catalogo_precios:{alias}:version'
+
+
+def version_precios(alias='default'):
+    """
+    Versión de los precios del catálogo de una base de datos (para cachear el JSON de la caja).
+    El seq del feed no sirve: CambioProducto también registra cada cambio de stock.
+    """
+    clave = _clave_version_precios(alias)
+    cache.add(clave, time.time_ns(), None)
+    return cache.get(clave)
+
+
+def invalidar_precios(alias='default'):
+    """Cambia la versión de precios al confirmar la transacción en curso (altas, bajas, precios)."""
+    transaction.on_commit(lambda: cache.set(_clave_version_precios(alias), time.time_ns(), None), using=alias)
+
+
+@receiver(post_delete, sender=Producto)
+def registrar_producto_eliminado(sender, instance, using, **kwargs):
+    # post_delete también se dispara en borrados masivos del admin (queryset.delete())
+    CambioProducto.objects.create(producto_id=instance.pk, eliminado=True)
+    invalidar_precios(using)
+
+
+# ====================================
+# RECEPCIÓN DE MERCANCÍA (DOCUMENTOS MULTI-LÍNEA)
+# ====================================
+
+# Modelo 9: RecepcionMercancia (Cabecera del documento de recepción)
+class RecepcionMercancia(models.Model):
+    proveedor = models.ForeignKey(Proveedor, on_delete=models.PROTECT, related_name='recepciones')
+    fecha_recepcion = models.DateTimeField(auto_now_add=True)
+    referencia = models.CharField(max_length=100, blank=True, null=True, help_text='Factura o remisión del proveedor')
+    responsable = models.CharField(max_length=100, blank=True, null=True)
+    notas = models.TextField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Recepción #{self.id} - {self.proveedor.nombre_empresa}"
+
+    class Meta:
+        verbose_name = "Recepción de Mercancía"
+        verbose_name_plural = "Recepciones de Mercancía"
+
+
+# Modelo 10: LineaRecepcion (Producto recibido en el documento)
+class LineaRecepcion(models.Model):
+    recepcion = models.ForeignKey(RecepcionMercancia, on_delete=models.CASCADE, related_name='lineas')
+    producto = models.ForeignKey(Producto, on_delete=models.PROTECT)
+    cantidad = models.IntegerField()
+    costo_unitario = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+
+    class Meta:
+        unique_together = ('recepcion', 'producto')
+
+    def __str__(self):
+        return f"{self.cantidad} x {self.producto.nombre} en Recepción #{self.recepcion_id}"
+
+
+# ====================================
+# SUGERENCIAS DE REORDEN
+# ====================================
+
+# Modelo 11: SugerenciaReorden (la genera el comando `calcular_reorden`, la vista solo la lee)
+class SugerenciaReorden(models.Model):
+    producto = models.OneToOneField(Producto, on_delete=models.CASCADE, related_name='sugerencia_reorden')
+    proveedor = models.ForeignKey(Proveedor, on_delete=models.SET_NULL, null=True, blank=True, related_name='sugerencias_reorden')
+    stock_actual = models.IntegerField()
+    velocidad_diaria = models.DecimalField(max_digits=10, decimal_places=3, help_text='Unidades vendidas por día')
+    dias_cobertura = models.DecimalField(max_digits=10, decimal_places=1)
+    cantidad_sugerida = models.IntegerField()
+    fecha_calculo = models.DateTimeField()
+
+    def __str__(self):
+        return f"Reordenar {self.cantidad_sugerida} de {self.producto.nombre}"
+
+    class Meta:
+        verbose_name = "Sugerencia de Reorden"
+        verbose_name_plural = "Sugerencias de Reorden"
+        ordering = ['proveedor', 'dias_cobertura']
+
+
+
+# ====================================
+# INDICADORES (KPIs) DEL TABLERO DE INICIO
+# ====================================
+
+# Modelo 12: KpiDiario (una fila por día; la página de inicio la lee en una sola consulta)
+class KpiDiario(models.Model):
+    fecha = models.DateField(unique=True)
+    num_ventas = models.IntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    # {'EFE': {'num': 3, 'monto': '120.00'}, ...}
+    ventas_por_metodo = models.JSONField(default=dict)
+    # [{'producto_id': 1, 'nombre': '...', 'unidades': 10}, ...] ya ordenado
+    top_productos = models.JSONField(default=list)
+    productos_bajo_stock = models.IntegerField(default=0)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"KPIs del {self.fecha}"
+
+    class Meta:
+        verbose_name = "KPI Diario"
+        verbose_name_plural = "KPIs Diarios"
+
+
+# Modelo 13: KpiProductoDia (contadores por producto y día para mantener el top 10)
+class KpiProductoDia(models.Model):
+    fecha = models.DateField()
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='+')
+    unidades = models.IntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        unique_together = ('fecha', 'producto')
+        indexes = [models.Index(fields=['fecha', '-unidades'], name='kpiproducto_top_idx')]
+
+
+
+# ====================================
+# ARCHIVO HISTÓRICO (DATOS FRÍOS)
+# ====================================
+# Copias sin restricciones de FK de las ventas y movimientos de periodos cerrados.
+# Conservan el id original; el comando `archivar_historico` los mueve por lotes.
+
+# Modelo 14: VentaArchivada
+class VentaArchivada(NombresVentaMixin, models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    fecha_venta = models.DateTimeField(db_index=True)
+    cliente = models.ForeignKey(Cliente, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    nombre_cliente = models.CharField(max_length=150, blank=True, null=True)
+    metodo_pago = models.CharField(max_length=3, choices=Ventas.METODOS_PAGO)
+    monto_total = models.DecimalField(max_digits=10, decimal_places=2)
+    empleado_vendedor = models.ForeignKey(Empleado, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    vendedor = models.CharField(max_length=100, blank=True, null=True)
+    esta_pagada = models.BooleanField(default=True)
+    notas = models.TextField(blank=True, null=True)
+    tienda = models.ForeignKey('Tienda', on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    anulada = models.BooleanField(default=False)
+    fecha_anulacion = models.DateTimeField(null=True, blank=True)
+    motivo_anulacion = models.CharField(max_length=255, blank=True, null=True)
+
+    archivada = True
+
+    def __str__(self):
+        return f"Venta archivada #{self.id}"
+
+    class Meta:
+        verbose_name = "Venta Archivada"
+        verbose_name_plural = "Ventas Archivadas"
+        indexes = [
+            models.Index(fields=['cliente', '-fecha_venta', '-id'], name='ventaarch_cliente_fecha_idx'),
+            models.Index(fields=['fecha_venta', 'empleado_vendedor', 'anulada'], name='ventaarch_fecha_empleado_idx'),
+            models.Index(fields=['empleado_vendedor', '-fecha_venta', '-id'], name='ventaarch_empleado_fecha_idx'),
+            models.Index(fields=['metodo_pago', '-fecha_venta', '-id'], name='ventaarch_metodo_fecha_idx'),
+            models.Index(fields=['esta_pagada', '-fecha_venta', '-id'], name='ventaarch_pagada_fecha_idx'),
+            models.Index(fields=['monto_total'], name='ventaarch_monto_idx'),
+        ]
+
+
+# Modelo 15: DetalleVentaArchivada
+class DetalleVentaArchivada(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    venta = models.ForeignKey(VentaArchivada, on_delete=models.CASCADE, related_name='detalleventa')
+    producto = models.ForeignKey(Producto, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    cantidad_vendida = models.IntegerField()
+    precio_unitario = models.DecimalField(max_digits=10, decimal_places=2)
+    descuento_porcentaje = models.DecimalField(max_digits=5, decimal_places=2)
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        indexes = [models.Index(fields=['venta', 'subtotal', 'cantidad_vendida'], name='detallearch_importes_idx')]
+
+
+# Modelo 16: InventarioArchivado
+class InventarioArchivado(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    producto = models.ForeignKey(Producto, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    tipo_movimiento = models.CharField(max_length=3, choices=Inventario.TIPO_MOVIMIENTO)
+    cantidad = models.IntegerField()
+    fecha_movimiento = models.DateTimeField(db_index=True)
+    razon = models.CharField(max_length=255, blank=True, null=True)
+    responsable = models.CharField(max_length=100, blank=True, null=True)
+    tienda = models.ForeignKey('Tienda', on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+
+    archivada = True
+
+    class Meta:
+        verbose_name = "Movimiento Archivado"
+        verbose_name_plural = "Movimientos Archivados"
+
+
+# Modelo 17: EstadoArchivo (fecha de corte por tabla: todo lo anterior puede estar en el archivo)
+class EstadoArchivo(models.Model):
+    tabla = models.CharField(max_length=30, unique=True)
+    corte = models.DateTimeField()
+    filas_archivadas = models.BigIntegerField(default=0)
+    en_progreso = models.BooleanField(default=False)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Archivo de {self.tabla} hasta {self.corte}"
+
+
+# ====================================
+# ACTUALIZACIÓN MASIVA DE PRECIOS
+# ====================================
+
+# Modelo 18: CambioPrecioLote (un registro compacto por cada actualización masiva)
+class CambioPrecioLote(models.Model):
+    fecha = models.DateTimeField(auto_now_add=True)
+    categoria = models.ForeignKey(Categoria, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    proveedor = models.ForeignKey(Proveedor, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    porcentaje = models.DecimalField(max_digits=6, decimal_places=2, default=Decimal('0.00'))
+    redondeo = models.DecimalField(max_digits=6, decimal_places=2, blank=True, null=True, help_text='Múltiplo al que se redondea, p. ej. 0.50')
+    num_productos = models.IntegerField(default=0)
+    responsable = models.CharField(max_length=100, blank=True, null=True)
+    # {producto_id: [precio_anterior, precio_nuevo]}
+    precios = models.JSONField(default=dict)
+
+    def __str__(self):
+        return f"Cambio de precios #{self.id} ({self.num_productos} productos)"
+
+    class Meta:
+        verbose_name = "Cambio Masivo de Precios"
+        verbose_name_plural = "Cambios Masivos de Precios"
+        ordering = ['-fecha']
+
+
+# ====================================
+# COLA DE TAREAS EN SEGUNDO PLANO
+# ====================================
+
+# Modelo 19: Tarea (trabajo diferido; ver tareas.py y el comando `procesar_tareas`)
+class Tarea(models.Model):
+    ESTADOS = [
+        ('PEN', 'Pendiente'),
+        ('EJE', 'En ejecución'),
+        ('OK', 'Completada'),
+        ('MUE', 'Fallida (sin más reintentos)'),
+    ]
+
+    nombre = models.CharField(max_length=100)
+    argumentos = models.JSONField(default=dict)
+    estado = models.CharField(max_length=3, choices=ESTADOS, default='PEN')
+    intentos = models.IntegerField(default=0)
+    max_intentos = models.IntegerField(default=5)
+    disponible_en = models.DateTimeField(default=timezone.now)
+    bloqueado_hasta = models.DateTimeField(blank=True, null=True)
+    ultimo_error = models.TextField(blank=True, null=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Tarea #{self.id} {self.nombre} ({self.get_estado_display()})"
+
+    class Meta:
+        verbose_name = "Tarea"
+        verbose_name_plural = "Tareas"
+        indexes = [models.Index(fields=['estado', 'disponible_en'], name='tarea_pendientes_idx')]
+
+
+# ====================================
+# ESTADÍSTICAS DE CLIENTES (DESNORMALIZADAS)
+# ====================================
+# Se mantienen de forma incremental con los efectos de venta (ver estadisticas_clientes.py);
+# el comando `recalcular_estadisticas_clientes` las reconstruye desde cero.
+
+# Modelo 20: EstadisticaCliente (totales de por vida de un cliente, incluye el archivo)
+class EstadisticaCliente(models.Model):
+    cliente = models.OneToOneField(Cliente, on_delete=models.CASCADE, primary_key=True, related_name='estadisticas')
+    num_compras = models.IntegerField(default=0)
+    gasto_total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    primera_compra = models.DateField(blank=True, null=True)
+    ultima_compra = models.DateField(blank=True, null=True)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Estadísticas de {self.cliente_id}"
+
+    @property
+    def ticket_promedio(self):
+        if not self.num_compras:
+            return Decimal('0.00')
+        return (self.gasto_total / self.num_compras).quantize(Decimal('0.01'))
+
+    class Meta:
+        verbose_name = "Estadística de Cliente"
+        verbose_name_plural = "Estadísticas de Clientes"
+
+
+# Modelo 21: ClienteProducto (unidades compradas por cliente y producto, para sus favoritos)
+class ClienteProducto(models.Model):
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='+')
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='+')
+    unidades = models.IntegerField(default=0)
+    gasto = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        unique_together = ('cliente', 'producto')
+        indexes = [models.Index(fields=['cliente', '-unidades'], name='clienteproducto_fav_idx')]
+
+
+# ====================================
+# SUCURSALES (TIENDAS)
+# ====================================
+# Cada sucursal guarda sus ventas, movimientos y stock en su propia base (ver tiendas.py).
+# El registro de sucursales se replica en todas las bases con `sincronizar_tiendas`.
+
+# Modelo 22: Tienda
+class Tienda(models.Model):
+    codigo = models.SlugField(max_length=30, unique=True, help_text='Identificador usado en TIENDA/TIENDAS')
+    nombre = models.CharField(max_length=100)
+    direccion = models.TextField(blank=True, null=True)
+    activa = models.BooleanField(default=True)
+
+    def __str__(self):
+        return self.nombre
+
+    class Meta:
+        verbose_name = "Tienda"
+        verbose_name_plural = "Tiendas"
+
+
+# ====================================
+# BITÁCORA DE INVENTARIO COMPACTADA
+# ====================================
+# Los movimientos anteriores al horizonte de compactación se sustituyen por un renglón por
+# producto, día, tipo y sucursal con la suma exacta de sus cantidades (ver archivo.compactar_movimientos).
+
+# Modelo 23: ResumenInventarioDiario
+class ResumenInventarioDiario(models.Model):
+    producto = models.ForeignKey(Producto, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    fecha = models.DateField()
+    tipo_movimiento = models.CharField(max_length=3, choices=Inventario.TIPO_MOVIMIENTO)
+    tienda = models.ForeignKey('Tienda', on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    cantidad = models.BigIntegerField(default=0)
+    num_movimientos = models.IntegerField(default=0)
+
+    resumen = True
+
+    def __str__(self):
+        return f"{self.get_tipo_movimiento_display()} de {self.cantidad} ({self.fecha})"
+
+    class Meta:
+        verbose_name = "Resumen Diario de Inventario"
+        verbose_name_plural = "Resúmenes Diarios de Inventario"
+        unique_together = ('producto', 'fecha', 'tipo_movimiento', 'tienda')
+        indexes = [models.Index(fields=['fecha'], name='resumeninv_fecha_idx')]
+
+
+# ====================================
+# PROMOCIONES
+# ====================================
+# Las reglas activas se compilan en un índice en memoria por producto, categoría y proveedor
+# (ver promociones.py); la caja las aplica a toda la canasta sin consultas por renglón.
+
+# Modelo 24: Promocion
+class Promocion(models.Model):
+    TIPOS = [
+        ('POR', 'Porcentaje de descuento'),
+        ('NXM', 'Lleva N, paga M'),
+    ]
+    nombre = models.CharField(max_length=100)
+    tipo = models.CharField(max_length=3, choices=TIPOS, default='POR')
+    porcentaje = models.DecimalField(max_digits=5, decimal_places=2, default=Decimal('0.00'))
+    lleva = models.PositiveIntegerField(null=True, blank=True)
+    paga = models.PositiveIntegerField(null=True, blank=True)
+
+    # Alcance: exactamente uno de los tres
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, null=True, blank=True, related_name='promociones')
+    categoria = models.ForeignKey(Categoria, on_delete=models.CASCADE, null=True, blank=True, related_name='promociones')
+    proveedor = models.ForeignKey(Proveedor, on_delete=models.CASCADE, null=True, blank=True, related_name='promociones')
+
+    vigente_desde = models.DateTimeField(null=True, blank=True)
+    vigente_hasta = models.DateTimeField(null=True, blank=True)
+    # Franja diaria opcional (p. ej. 18:00 a 20:00); si hora_fin < hora_inicio cruza la medianoche
+    hora_inicio = models.TimeField(null=True, blank=True)
+    hora_fin = models.TimeField(null=True, blank=True)
+    activa = models.BooleanField(default=True)
+    # Versión de las reglas: cualquier alta, edición o baja obliga a recompilar el índice
+    actualizado = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return self.nombre
+
+    def clean(self):
+        alcances = [campo for campo in (self.producto_id, self.categoria_id, self.proveedor_id) if campo]
+        if len(alcances) != 1:
+            raise ValidationError('Indica exactamente un producto, una categoría o un proveedor.')
+        if self.tipo == 'POR' and not (Decimal('0') < self.porcentaje <= Decimal('100')):
+            raise ValidationError('El porcentaje debe estar entre 0 y 100.')
+        if self.tipo == 'NXM' and not (self.lleva and self.paga is not None and self.paga < self.lleva):
+            raise ValidationError('En "lleva N, paga M", M debe ser menor que N.')
+        if self.vigente_desde and self.vigente_hasta and self.vigente_hasta <= self.vigente_desde:
+            raise ValidationError('La vigencia debe terminar después de empezar.')
+
+    class Meta:
+        verbose_name = "Promoción"
+        verbose_name_plural = "Promociones"
+
+
+# ====================================
+# RANKING DE PRODUCTOS MÁS VENDIDOS
+# ====================================
+# Totales por ventana móvil (hoy, 7 y 30 días) mantenidos con los efectos de venta; al cambiar
+# el día se resta la cubeta diaria (KpiProductoDia) que sale de cada ventana (ver ranking.py).
+
+# Modelo 25: PosicionRanking
+class PosicionRanking(models.Model):
+    VENTANAS = [
+        (1, 'Hoy'),
+        (7, 'Últimos 7 días'),
+        (30, 'Últimos 30 días'),
+    ]
+    ventana = models.PositiveSmallIntegerField(choices=VENTANAS)
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='+')
+    # Copia de la categoría del producto, para el ranking por categoría sin JOIN
+    categoria = models.ForeignKey(Categoria, on_delete=models.DO_NOTHING, db_constraint=False, null=True, related_name='+')
+    unidades = models.IntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        unique_together = ('ventana', 'producto')
+        indexes = [
+            # Incluyen el producto para desempatar sin ordenar: el top N es un recorrido con LIMIT
+            models.Index(fields=['ventana', '-unidades', 'producto'], name='ranking_top_idx'),
+            models.Index(fields=['ventana', 'categoria', '-unidades', 'producto'], name='ranking_categoria_top_idx'),
+        ]
+
+
+# Modelo 26: EstadoRanking (día al que están alineadas las ventanas; una sola fila)
+class EstadoRanking(models.Model):
+    fecha = models.DateField()
+    actualizado = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Ranking al {self.fecha}"
+
+
+# ====================================
+# CONTEOS FÍSICOS DE INVENTARIO
+# ====================================
+# Los escáneres suben por lotes lo contado (código de barras, cantidad) a ConteoCapturado; la
+# diferencia contra Producto.stock se calcula con un solo JOIN y se aplica con un UPDATE del stock
+# y movimientos 'AJU' (ver conteos.py).
+
+# Modelo 27: SesionConteo
+class SesionConteo(models.Model):
+    ESTADOS = [
+        ('ABI', 'Abierta'),
+        ('APL', 'Aplicada'),
+    ]
+    nombre = models.CharField(max_length=150)
+    # Conteo de toda la tienda: los productos que nadie escaneó cuentan como 0
+    completo = models.BooleanField(default=False)
+    estado = models.CharField(max_length=3, choices=ESTADOS, default='ABI')
+    responsable = models.CharField(max_length=100, blank=True, null=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_aplicacion = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Conteo #{self.id} - {self.nombre}"
+
+    class Meta:
+        verbose_name = "Sesión de Conteo"
+        verbose_name_plural = "Sesiones de Conteo"
+
+
+# Modelo 28: ConteoCapturado (una línea de un lote subido por un escáner)
+class ConteoCapturado(models.Model):
+    sesion = models.ForeignKey(SesionConteo, on_delete=models.CASCADE, related_name='capturas')
+    # Identificador del lote que asigna el escáner: reenviar un lote no vuelve a sumar sus líneas
+    lote = models.CharField(max_length=64)
+    codigo_barras = models.CharField(max_length=100)
+    # Resuelto al recibir el lote; nulo si el código no existe en el catálogo
+    producto = models.ForeignKey(Producto, on_delete=models.DO_NOTHING, db_constraint=False, null=True, related_name='conteos')
+    cantidad = models.IntegerField()
+
+    class Meta:
+        verbose_name = "Conteo Capturado"
+        verbose_name_plural = "Conteos Capturados"
+        constraints = [
+            models.UniqueConstraint(fields=['sesion', 'lote', 'codigo_barras'], name='conteo_lote_codigo_unico'),
+        ]
+        indexes = [
+            # JOIN de la diferencia: las líneas de una sesión por producto
+            models.Index(fields=['sesion', 'producto'], name='conteo_sesion_producto_idx'),
+        ]
@@ -0,0 +1,65 @@
+"""
+Paginación para tablas grandes (ventas, inventario).
+
+Un COUNT(*) exacto recorre toda la tabla; aquí el conteo se acota a LIMITE_CONTEO filas,
+así que el costo no crece con el histórico. Más allá del tope las páginas se siguen pudiendo
+recorrer: cada página lee una fila de más para saber si existe la siguiente.
+"""
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.utils.functional import cached_property
+
+LIMITE_CONTEO = 10000
+
+
+class PaginaAcotada(Page):
+    """Página de un conteo acotado: `has_next` sale de la fila extra leída, no del total."""
+
+    def __init__(self, object_list, number, paginator, hay_siguiente):
+        super().__init__(object_list, number, paginator)
+        self.hay_siguiente = hay_siguiente
+
+    def has_next(self):
+        return self.hay_siguiente
+
+
+class ConteoAcotadoPaginator(Paginator):
+    """Paginator cuyo `count` se detiene en `LIMITE_CONTEO`; `count_acotado` indica si hay más filas."""
+
+    limite_conteo = LIMITE_CONTEO
+
+    @cached_property
+    def count(self):
+        # SELECT COUNT(*) FROM (SELECT ... LIMIT n): nunca lee más de n filas
+        return self.object_list[:self.limite_conteo].count()
+
+    @property
+    def count_acotado(self):
+        return self.count >= self.limite_conteo
+
+    def validate_number(self, number):
+        if not self.count_acotado:
+            return super().validate_number(number)
+        # Con el conteo acotado se desconoce la última página: cualquier número >= 1 es válido
+        # y `page` rechaza la que ya no tiene filas
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(self.error_messages['invalid_page'])
+        if number < 1:
+            raise EmptyPage(self.error_messages['min_page'])
+        return number
+
+    def page(self, number):
+        if not self.count_acotado:
+            return super().page(number)
+        number = self.validate_number(number)
+        inicio = (number - 1) * self.per_page
+        filas = list(self.object_list[inicio:inicio + self.per_page + 1])
+        if not filas:
+            raise EmptyPage(self.error_messages['no_results'])
+        hay_siguiente = len(filas) > self.per_page
+        # La navegación (p. ej. la del admin) llega hasta la página siguiente a la actual
+        self.__dict__['num_pages'] = max(self.num_pages, number + hay_siguiente)
+        return PaginaAcotada(filas[:self.per_page], number, self, hay_siguiente)
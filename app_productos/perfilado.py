@@ -0,0 +1,239 @@
+"""
+Perfilado de vistas bajo demanda, sin redesplegar.
+
+Se perfila una petición si su nombre de URL o su ruta (patrón tipo '/ventas/*') está en
+settings.PERFILADO_VISTAS, o si la pide un usuario staff con la cabecera `X-Perfilar: 1` o el
+parámetro `?perfilar=1`. Mientras la vista corre:
+
+- un hilo muestrea la pila del hilo de la petición cada PERFILADO_INTERVALO_MS. Es un perfilador
+  por muestreo: el costo no depende de cuántas funciones llame la vista, así que se puede usar en
+  producción. Las pilas se guardan colapsadas (`.folded`, una línea 'f1;f2;f3 N' por pila), el
+  formato que leen flamegraph.pl y speedscope;
+- un `execute_wrapper` registra cada consulta SQL con su inicio y duración (línea de tiempo).
+
+Las capturas se guardan en PERFILADO_DIR, que funciona como búfer circular: al guardar una nueva
+se borran las más antiguas por encima de PERFILADO_MAX_CAPTURAS. La vista `ver_perfiles` (solo
+staff) las lista y permite descargarlas.
+"""
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from fnmatch import fnmatch
+from itertools import count
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+
+CABECERA = 'HTTP_X_PERFILAR'
+PARAMETRO = 'perfilar'
+MAX_CONSULTAS = 5000
+MAX_PROFUNDIDAD = 200
+RE_NOMBRE = re.compile(r'^[\w.-]+$')
+
+_secuencia = count()
+
+
+def _config(nombre, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+def directorio():
+    return Path(_config('PERFILADO_DIR', Path(settings.BASE_DIR) / 'perfiles'))
+
+
+def _por_configuracion(request):
+    patrones = _config('PERFILADO_VISTAS', ())
+    if not patrones or random.random() >= _config('PERFILADO_TASA', 1.0):
+        return None
+    try:
+        nombre = resolve(request.path_info).url_name
+    except Resolver404:
+        return None
+    for patron in patrones:
+        if patron == nombre or (patron.startswith('/') and fnmatch(request.path_info, patron)):
+            return 'configuracion'
+    return None
+
+
+def motivo(request):
+    """Por qué se perfila la petición ('configuracion' o 'staff'), o None si no se perfila."""
+    pedido = request.META.get(CABECERA) == '1' or request.GET.get(PARAMETRO) == '1'
+    # `request.user` consulta la sesión: solo se evalúa si la petición pidió el perfil
+    if pedido and request.user.is_staff:
+        return 'staff'
+    return _por_configuracion(request)
+
+
+class _Muestreador(threading.Thread):
+    """Cuenta las pilas del hilo `hilo_id` cada `intervalo` segundos."""
+
+    def __init__(self, hilo_id, intervalo):
+        super().__init__(name='perfilado', daemon=True)
+        self.hilo_id = hilo_id
+        self.intervalo = intervalo
+        self.pilas = Counter()
+        self.detener = threading.Event()
+
+    def run(self):
+        while not self.detener.wait(self.intervalo):
+            marco = sys._current_frames().get(self.hilo_id)
+            if marco is not None:
+                self.pilas[_pila(marco)] += 1
+
+
+def _pila(marco):
+    cuadros = []
+    while marco is not None and len(cuadros) < MAX_PROFUNDIDAD:
+        codigo = marco.f_code
+        cuadros.append(f'{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})')
+        marco = marco.f_back
+    return ';'.join(reversed(cuadros))
+
+
+class Captura:
+    """Perfil de una petición: `with captura: ...` y después `captura.guardar(response)`."""
+
+    def __init__(self, request, motivo):
+        self.request = request
+        self.motivo = motivo
+        self.consultas = []
+        self.consultas_omitidas = 0
+        self._pila_contextos = ExitStack()
+
+    def _registrar_consulta(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if len(self.consultas) < MAX_CONSULTAS:
+                self.consultas.append({
+                    'inicio_ms': round((inicio - self.inicio) * 1000, 3),
+                    'duracion_ms': round((time.perf_counter() - inicio) * 1000, 3),
+                    'alias': context['connection'].alias,
+                    'sql': sql[:2000],
+                    'many': many,
+                })
+            else:
+                self.consultas_omitidas += 1
+
+    def __enter__(self):
+        self.fecha = timezone.now()
+        self.inicio = time.perf_counter()
+        for conexion in connections.all():
+            self._pila_contextos.enter_context(conexion.execute_wrapper(self._registrar_consulta))
+        self.muestreador = _Muestreador(threading.get_ident(), _config('PERFILADO_INTERVALO_MS', 5) / 1000)
+        self.muestreador.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.duracion = time.perf_counter() - self.inicio
+        self.muestreador.detener.set()
+        self.muestreador.join()
+        self._pila_contextos.close()
+        return False
+
+    def guardar(self, response):
+        """Escribe la captura (meta, SQL y pilas) y poda el búfer. Devuelve el nombre de la captura."""
+        carpeta = directorio()
+        carpeta.mkdir(parents=True, exist_ok=True)
+        match = getattr(self.request, 'resolver_match', None)
+        vista = (match.url_name if match else None) or 'sin_nombre'
+        nombre = f'{self.fecha:%Y%m%dT%H%M%S%f}-{os.getpid()}-{next(_secuencia)}-{vista}'
+        meta = {
+            'nombre': nombre,
+            'fecha': self.fecha.isoformat(),
+            'vista': vista,
+            'metodo': self.request.method,
+            'ruta': self.request.get_full_path()[:500],
+            'estado': response.status_code,
+            'motivo': self.motivo,
+            'duracion_ms': round(self.duracion * 1000, 1),
+            'intervalo_ms': _config('PERFILADO_INTERVALO_MS', 5),
+            'muestras': sum(self.muestreador.pilas.values()),
+            'num_consultas': len(self.consultas) + self.consultas_omitidas,
+            'sql_ms': round(sum(c['duracion_ms'] for c in self.consultas), 1),
+            'consultas_omitidas': self.consultas_omitidas,
+        }
+        plegado = ''.join(f'{pila} {n}\n' for pila, n in self.muestreador.pilas.most_common())
+        _escribir(carpeta / f'{nombre}.folded', plegado)
+        _escribir(carpeta / f'{nombre}.sql.json', json.dumps(self.consultas))
+        # La meta va al final: una captura aparece en la lista solo cuando está completa
+        _escribir(carpeta / f'{nombre}.meta.json', json.dumps(meta))
+        podar(carpeta)
+        return nombre
+
+
+def _escribir(ruta, texto):
+    temporal = ruta.with_name(f'.{ruta.name}.tmp')
+    temporal.write_text(texto)
+    os.replace(temporal, ruta)
+
+
+def podar(carpeta=None, maximo=None):
+    """Borra las capturas más antiguas por encima de PERFILADO_MAX_CAPTURAS."""
+    carpeta = carpeta or directorio()
+    maximo = _config('PERFILADO_MAX_CAPTURAS', 50) if maximo is None else maximo
+    metas = sorted(carpeta.glob('*.meta.json'))
+    for meta in metas[:max(len(metas) - maximo, 0)]:
+        nombre = meta.name[:-len('.meta.json')]
+        for sufijo in ('.meta.json', '.sql.json', '.folded'):
+            # Otro proceso pudo haberla borrado ya
+            (carpeta / f'{nombre}{sufijo}').unlink(missing_ok=True)
+
+
+def capturas():
+    """Meta de las capturas guardadas, de la más reciente a la más antigua."""
+    carpeta = directorio()
+    if not carpeta.exists():
+        return []
+    resultado = []
+    for ruta in sorted(carpeta.glob('*.meta.json'), reverse=True):
+        try:
+            resultado.append(json.loads(ruta.read_text()))
+        except (OSError, ValueError):
+            continue  # podada mientras se leía
+    return resultado
+
+
+def archivo_de(nombre, tipo):
+    """Ruta del archivo 'meta', 'sql' o 'folded' de una captura, o None si no existe o el nombre no es válido."""
+    sufijos = {'meta': '.meta.json', 'sql': '.sql.json', 'folded': '.folded'}
+    if tipo not in sufijos or not RE_NOMBRE.match(nombre):
+        return None
+    ruta = directorio() / f'{nombre}{sufijos[tipo]}'
+    return ruta if ruta.is_file() else None
+
+
+def funciones_propias(plegado, limite=30):
+    """[(función, muestras)] de las funciones donde más se muestreó (tiempo propio, hoja de la pila)."""
+    propias = Counter()
+    for linea in plegado.splitlines():
+        pila, _, muestras = linea.rpartition(' ')
+        propias[pila.rsplit(';', 1)[-1]] += int(muestras)
+    return propias.most_common(limite)
+
+
+class PerfiladoMiddleware:
+    """Perfila las peticiones elegidas por `motivo`; añade la cabecera X-Perfil con el nombre de la captura."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        razon = motivo(request)
+        if razon is None:
+            return self.get_response(request)
+        captura = Captura(request, razon)
+        with captura:
+            response = self.get_response(request)
+        response['X-Perfil'] = captura.guardar(response)
+        return response
@@ -0,0 +1,92 @@
+"""
+Actualización masiva de precios por categoría y/o proveedor.
+
+La regla (porcentaje y redondeo a un múltiplo) se aplica con un único UPDATE en SQL; antes y
+después se leen los precios en una consulta cada uno para guardar el historial compacto.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import router, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Value
+from django.db.models.functions import Round
+
+from .models import CambioPrecioLote, CambioProducto, Producto, invalidar_precios
+
+CENTAVO = Decimal('0.01')
+
+
+def productos_afectados(categoria_id=None, proveedor_id=None):
+    if not categoria_id and not proveedor_id:
+        raise ValueError('Indica al menos una categoría o un proveedor.')
+    productos = Producto.objects.all()
+    if categoria_id:
+        productos = productos.filter(categoria_id=categoria_id)
+    if proveedor_id:
+        productos = productos.filter(proveedores=proveedor_id)
+    return productos
+
+
+def validar_regla(porcentaje, redondeo):
+    porcentaje = Decimal(str(porcentaje or '0'))
+    redondeo = Decimal(str(redondeo)) if redondeo not in (None, '') else None
+    if porcentaje <= Decimal('-100'):
+        raise ValueError('El porcentaje debe ser mayor a -100.')
+    if redondeo is not None and redondeo <= 0:
+        raise ValueError('El redondeo debe ser un múltiplo positivo, p. ej. 0.50.')
+    if porcentaje == 0 and redondeo is None:
+        raise ValueError('La regla no cambia ningún precio.')
+    return porcentaje, redondeo
+
+
+def calcular_precio(precio, porcentaje, redondeo):
+    """Versión en Python de la regla, para la vista previa."""
+    nuevo = precio * (Decimal(1) + porcentaje / Decimal(100))
+    if redondeo:
+        nuevo = (nuevo / redondeo).quantize(Decimal(1), rounding=ROUND_HALF_UP) * redondeo
+    return nuevo.quantize(CENTAVO, rounding=ROUND_HALF_UP)
+
+
+def _expresion_precio(porcentaje, redondeo):
+    salida = DecimalField(max_digits=10, decimal_places=2)
+    nuevo = ExpressionWrapper(F('precio_venta') * Value(Decimal(1) + porcentaje / Decimal(100)), output_field=salida)
+    if redondeo:
+        nuevo = ExpressionWrapper(Round(nuevo / Value(redondeo)) * Value(redondeo), output_field=salida)
+    return Round(nuevo, 2, output_field=salida)
+
+
+def previsualizar(productos, porcentaje, redondeo, limite=200):
+    """Primeros `limite` productos afectados con su precio actual y nuevo, y el total afectado."""
+    muestra = [
+        (p, calcular_precio(p.precio_venta, porcentaje, redondeo))
+        for p in productos.only('id', 'nombre', 'precio_venta').order_by('nombre')[:limite]
+    ]
+    return muestra, productos.count()
+
+
+@transaction.atomic
+def aplicar(categoria_id=None, proveedor_id=None, porcentaje=0, redondeo=None, responsable=None):
+    """Aplica la regla con un solo UPDATE y registra un CambioPrecioLote. Devuelve el lote."""
+    porcentaje, redondeo = validar_regla(porcentaje, redondeo)
+    productos = productos_afectados(categoria_id, proveedor_id)
+
+    # La selección se repite como filtro (subconsulta en el UPDATE), no como lista de ids: una
+    # categoría grande excedería el límite de parámetros de SQLite
+    antes = dict(productos.values_list('id', 'precio_venta'))
+    if antes:
+        productos.update(precio_venta=_expresion_precio(porcentaje, redondeo))
+    despues = dict(productos.values_list('id', 'precio_venta'))
+
+    cambiados = {pid: [str(antes[pid]), str(despues[pid])] for pid in despues if antes[pid] != despues[pid]}
+    # Un lote de registros en el feed; cambia la versión de precios una sola vez
+    CambioProducto.registrar(cambiados)
+    if cambiados:
+        invalidar_precios(router.db_for_write(Producto) or 'default')
+    return CambioPrecioLote.objects.create(
+        categoria_id=categoria_id or None,
+        proveedor_id=proveedor_id or None,
+        porcentaje=porcentaje,
+        redondeo=redondeo,
+        num_productos=len(cambiados),
+        responsable=responsable or None,
+        precios=cambiados,
+    )
@@ -0,0 +1,149 @@
+"""
+Motor de promociones de la caja.
+
+Las reglas activas se compilan una sola vez en índices en memoria por producto, categoría y
+proveedor. En cada canasta se lee la versión de las reglas (número de reglas y última
+modificación); si cambió, el índice se reconstruye. `aplicar` resuelve todos los renglones
+de la canasta en una pasada; la única otra consulta son los proveedores de los productos de la
+canasta, y solo si hay campañas de proveedor activas.
+
+Las promociones no se acumulan: cada renglón se queda con el mayor descuento entre sus reglas
+vigentes y el descuento capturado a mano.
+"""
+import threading
+from collections import defaultdict, namedtuple
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import router
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Producto, Promocion
+
+CENTESIMA = Decimal('0.01')
+
+Regla = namedtuple('Regla', 'id nombre tipo porcentaje lleva paga desde hasta hora_inicio hora_fin')
+Indice = namedtuple('Indice', 'version por_producto por_categoria por_proveedor num_reglas')
+
+_candado = threading.Lock()
+# Un índice por base de datos (cada sucursal tiene sus propias reglas)
+_indices = {}
+
+
+def version_reglas():
+    """Cambia con cualquier alta, edición (`actualizado`) o baja de reglas."""
+    # Dos consultas resueltas con índices; juntas en un solo aggregate SQLite recorre la tabla
+    return Promocion.objects.count(), Promocion.objects.aggregate(ultimo=Max('actualizado'))['ultimo']
+
+
+def compilar(version=None):
+    """Índices {producto_id | categoria_id | proveedor_id: [Regla]} de las reglas activas no vencidas."""
+    por_producto, por_categoria, por_proveedor = defaultdict(list), defaultdict(list), defaultdict(list)
+    filas = Promocion.objects.filter(activa=True).exclude(vigente_hasta__lte=timezone.now()).values_list(
+        'id', 'nombre', 'tipo', 'porcentaje', 'lleva', 'paga', 'vigente_desde', 'vigente_hasta',
+        'hora_inicio', 'hora_fin', 'producto_id', 'categoria_id', 'proveedor_id',
+    )
+    num_reglas = 0
+    for *campos, producto_id, categoria_id, proveedor_id in filas.iterator(chunk_size=2000):
+        regla = Regla(*campos)
+        if producto_id:
+            por_producto[producto_id].append(regla)
+        elif categoria_id:
+            por_categoria[categoria_id].append(regla)
+        elif proveedor_id:
+            por_proveedor[proveedor_id].append(regla)
+        num_reglas += 1
+    return Indice(
+        version, _podar(por_producto), _podar(por_categoria), _podar(por_proveedor), num_reglas
+    )
+
+
+def _podar(indice):
+    """Por llave, de los porcentajes sin vigencia ni franja solo puede ganar el mayor."""
+    podado = {}
+    for llave, reglas in indice.items():
+        condicionadas, mejor = [], None
+        for r in reglas:
+            if r.tipo == 'POR' and not (r.desde or r.hasta or r.hora_inicio or r.hora_fin):
+                if mejor is None or r.porcentaje > mejor.porcentaje:
+                    mejor = r
+            else:
+                condicionadas.append(r)
+        podado[llave] = condicionadas + ([mejor] if mejor else [])
+    return podado
+
+
+def indice_actual():
+    """Índice compilado vigente; se recompila si la versión de las reglas cambió."""
+    alias = router.db_for_read(Promocion) or 'default'
+    version = version_reglas()
+    indice = _indices.get(alias)
+    if indice is None or indice.version != version:
+        with _candado:
+            indice = _indices.get(alias)
+            if indice is None or indice.version != version:
+                indice = _indices[alias] = compilar(version)
+    return indice
+
+
+def invalidar():
+    """Descarta los índices compilados; la siguiente canasta los reconstruye."""
+    with _candado:
+        _indices.clear()
+
+
+def _vigente(regla, ahora, hora):
+    if regla.desde and ahora < regla.desde:
+        return False
+    if regla.hasta and ahora >= regla.hasta:
+        return False
+    if regla.hora_inicio is None or regla.hora_fin is None:
+        return True
+    if regla.hora_inicio <= regla.hora_fin:
+        return regla.hora_inicio <= hora < regla.hora_fin
+    return hora >= regla.hora_inicio or hora < regla.hora_fin
+
+
+def _descuento(regla, cantidad):
+    """Porcentaje equivalente de la regla para `cantidad` unidades."""
+    if regla.tipo == 'NXM':
+        gratis = (cantidad // regla.lleva) * (regla.lleva - regla.paga)
+        return (Decimal(gratis) * 100 / cantidad).quantize(CENTESIMA, rounding=ROUND_HALF_UP)
+    return regla.porcentaje
+
+
+def _proveedores(producto_ids):
+    proveedores = defaultdict(list)
+    for producto_id, proveedor_id in Producto.proveedores.through.objects.filter(
+        producto_id__in=producto_ids
+    ).values_list('producto_id', 'proveedor_id'):
+        proveedores[producto_id].append(proveedor_id)
+    return proveedores
+
+
+def aplicar(lineas, ahora=None, indice=None):
+    """
+    `lineas`: [(producto, cantidad, descuento_manual)], con `producto` una instancia de Producto.
+    Devuelve [(descuento_porcentaje, Regla o None)] en el mismo orden.
+    """
+    indice = indice or indice_actual()
+    ahora = ahora or timezone.now()
+    hora = timezone.localtime(ahora).time()
+    proveedores = _proveedores([p.id for p, _, _ in lineas]) if indice.por_proveedor else {}
+    sin_reglas = ()
+
+    resultado = []
+    for producto, cantidad, manual in lineas:
+        mejor, regla_mejor = manual or Decimal('0.00'), None
+        candidatas = [
+            indice.por_producto.get(producto.id, sin_reglas),
+            indice.por_categoria.get(producto.categoria_id, sin_reglas),
+        ] + [indice.por_proveedor.get(proveedor_id, sin_reglas) for proveedor_id in proveedores.get(producto.id, ())]
+        for reglas in candidatas:
+            for regla in reglas:
+                if cantidad > 0 and _vigente(regla, ahora, hora):
+                    descuento = _descuento(regla, cantidad)
+                    if descuento > mejor:
+                        mejor, regla_mejor = descuento, regla
+        resultado.append((mejor, regla_mejor))
+    return resultado
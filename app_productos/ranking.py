@@ -0,0 +1,164 @@
+"""
+Ranking de productos más vendidos por ventana móvil (hoy, 7 y 30 días), general y por categoría.
+
+Cada ventana guarda un total por producto (`PosicionRanking`). `aplicar_fotos` suma o resta las
+líneas de las ventas nuevas, editadas o borradas (ver efectos_venta.py) en las ventanas que
+cubren su fecha. Al cambiar el día, `alinear` resta de cada ventana la cubeta diaria
+(`KpiProductoDia`) que sale de ella, así que los contadores caducan sin re-agregar el historial.
+El top N es un recorrido del índice (ventana, -unidades) con LIMIT: no depende del volumen.
+
+`reconstruir` (comando `reconstruir_ranking`) recalcula todas las ventanas desde las ventas.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from . import archivo
+from .kpis import _inicio_dia
+from .models import (
+    DetalleVenta, DetalleVentaArchivada, EstadoRanking, KpiProductoDia, PosicionRanking, Producto,
+)
+
+VENTANAS = tuple(dias for dias, _ in PosicionRanking.VENTANAS)
+TOP_N = 10
+
+
+def _aplicar(deltas):
+    """Suma los deltas {(ventana, producto_id): [unidades, ingresos]} con un bulk_update y un bulk_create."""
+    deltas = {clave: valor for clave, valor in deltas.items() if valor[0] or valor[1]}
+    if not deltas:
+        return
+    producto_ids = {pid for _, pid in deltas}
+    categorias = dict(Producto.objects.filter(id__in=producto_ids).values_list('id', 'categoria_id'))
+    existentes = {
+        (p.ventana, p.producto_id): p
+        for p in PosicionRanking.objects.filter(ventana__in={v for v, _ in deltas}, producto_id__in=producto_ids)
+    }
+    modificados, nuevos = [], []
+    for (ventana, producto_id), (unidades, ingresos) in deltas.items():
+        if producto_id not in categorias:
+            continue  # producto borrado: su posición se eliminó en cascada
+        posicion = existentes.get((ventana, producto_id))
+        if posicion is None:
+            nuevos.append(PosicionRanking(
+                ventana=ventana, producto_id=producto_id, categoria_id=categorias[producto_id],
+                unidades=unidades, ingresos=ingresos,
+            ))
+        else:
+            posicion.unidades += unidades
+            posicion.ingresos += ingresos
+            posicion.categoria_id = categorias[producto_id]
+            modificados.append(posicion)
+    PosicionRanking.objects.bulk_update(modificados, ['unidades', 'ingresos', 'categoria_id'])
+    PosicionRanking.objects.bulk_create(nuevos)
+
+
+@transaction.atomic
+def alinear(hoy=None):
+    """Avanza las ventanas hasta `hoy` restando las cubetas diarias que caducaron."""
+    hoy = hoy or timezone.localdate()
+    estado = EstadoRanking.objects.first()
+    if estado is None or (hoy - estado.fecha).days >= max(VENTANAS):
+        return reconstruir(hoy)
+    if estado.fecha >= hoy:
+        return estado
+
+    # Al pasar de `estado.fecha` a `hoy`, la ventana de N días pierde los días
+    # (estado.fecha - N, hoy - N]
+    deltas = defaultdict(lambda: [0, Decimal('0.00')])
+    cubetas = KpiProductoDia.objects.filter(
+        fecha__gt=estado.fecha - timedelta(days=max(VENTANAS)), fecha__lte=hoy - timedelta(days=min(VENTANAS)),
+    ).values_list('fecha', 'producto_id', 'unidades', 'ingresos')
+    for fecha, producto_id, unidades, ingresos in cubetas:
+        for ventana in VENTANAS:
+            if estado.fecha - timedelta(days=ventana) < fecha <= hoy - timedelta(days=ventana):
+                delta = deltas[(ventana, producto_id)]
+                delta[0] -= unidades
+                delta[1] -= ingresos
+    _aplicar(deltas)
+    PosicionRanking.objects.filter(unidades=0, ingresos=0).delete()
+    estado.fecha = hoy
+    estado.save()
+    return estado
+
+
+def aplicar_fotos(antes=(), despues=()):
+    """
+    Resta las ventas de `antes` y suma las de `despues` en las ventanas que cubren su fecha.
+    Debe correr antes de `kpis.aplicar_fotos`: así la cubeta de un día que caduca al alinear
+    todavía no incluye las ventas que este mismo llamado agrega (o quita) al ranking.
+    """
+    if not antes and not despues:
+        return
+    hoy = timezone.localdate()
+    estado = EstadoRanking.objects.first()
+    if estado is None or (hoy - estado.fecha).days >= max(VENTANAS):
+        # La tarea corre después del commit: la reconstrucción ya lee este cambio y no se vuelve a sumar
+        reconstruir(hoy)
+        return
+    hoy = alinear(hoy).fecha
+    deltas = defaultdict(lambda: [0, Decimal('0.00')])
+    for signo, fotos in ((-1, antes), (1, despues)):
+        for foto in fotos:
+            edad = (hoy - foto['fecha']).days
+            for ventana in VENTANAS:
+                if 0 <= edad < ventana:
+                    for producto_id, cantidad, subtotal in foto['lineas']:
+                        delta = deltas[(ventana, producto_id)]
+                        delta[0] += signo * cantidad
+                        delta[1] += signo * subtotal
+    _aplicar(deltas)
+
+
+@transaction.atomic
+def reconstruir(hoy=None):
+    """Recalcula todas las ventanas desde las líneas de venta (activas y, si aplica, archivadas)."""
+    hoy = hoy or timezone.localdate()
+    desde = _inicio_dia(hoy - timedelta(days=max(VENTANAS) - 1))
+    hasta = _inicio_dia(hoy + timedelta(days=1))
+
+    modelos = [DetalleVenta]
+    if archivo.necesita_archivo(archivo.TABLA_VENTAS, desde):
+        modelos.append(DetalleVentaArchivada)
+    deltas = defaultdict(lambda: [0, Decimal('0.00')])
+    for modelo in modelos:
+        for fila in modelo.objects.filter(
+            venta__fecha_venta__gte=desde, venta__fecha_venta__lt=hasta, venta__anulada=False,
+        ).annotate(dia=TruncDate('venta__fecha_venta')).values('dia', 'producto_id').annotate(
+            unidades=Sum('cantidad_vendida'), ingresos=Sum('subtotal')
+        ).order_by():
+            edad = (hoy - fila['dia']).days
+            for ventana in VENTANAS:
+                if 0 <= edad < ventana:
+                    delta = deltas[(ventana, fila['producto_id'])]
+                    delta[0] += fila['unidades'] or 0
+                    delta[1] += (fila['ingresos'] or Decimal('0')).quantize(Decimal('0.01'))
+
+    PosicionRanking.objects.all().delete()
+    _aplicar(deltas)
+    EstadoRanking.objects.all().delete()
+    return EstadoRanking.objects.create(fecha=hoy)
+
+
+def top(ventana, categoria_id=None, limite=TOP_N):
+    """Los `limite` productos con más unidades en la ventana (opcionalmente de una categoría)."""
+    estado = EstadoRanking.objects.first()
+    fecha = timezone.localdate()
+    if estado is None or estado.fecha < fecha:
+        estado = alinear(fecha)
+    posiciones = PosicionRanking.objects.filter(ventana=ventana, unidades__gt=0)
+    if categoria_id:
+        posiciones = posiciones.filter(categoria_id=categoria_id)
+    filas = posiciones.order_by('-unidades', 'producto_id').values(
+        'producto_id', 'producto__nombre', 'unidades', 'ingresos',
+    )[:limite]
+    return estado.fecha, [
+        {'posicion': i, 'producto_id': f['producto_id'], 'nombre': f['producto__nombre'],
+         'unidades': f['unidades'], 'ingresos': f['ingresos']}
+        for i, f in enumerate(filas, start=1)
+    ]
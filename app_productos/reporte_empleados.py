@@ -0,0 +1,128 @@
+"""
+Reporte de desempeño de ventas por empleado.
+
+Una sola consulta agrupada sobre las líneas de venta del rango (filtro por el índice de fecha de
+Ventas) calcula ingresos, tickets y unidades, y el ranking general y por puesto con funciones de
+ventana (RANK() OVER ...). Si el rango alcanza el archivo histórico se suma la misma consulta
+sobre las tablas archivadas y el ranking se recalcula sobre los totales combinados.
+
+Los resultados se cachean: poco tiempo si el rango incluye hoy, más si es un periodo cerrado. Las
+claves llevan una versión que `invalidar` cambia cuando se modifican ventas de días anteriores
+(anulaciones, ediciones, bajas; ver efectos_venta.py): un periodo cerrado solo cambia así.
+
+Desde una vista de reporte los datos salen del snapshot (reportes_db.py) y la clave lleva su fecha.
+La versión es el momento de la última invalidación: un snapshot anterior todavía no tiene ese cambio,
+así que hasta el siguiente refresco el reporte se calcula desde `default`.
+"""
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Count, F, Sum, Window
+from django.db.models.functions import Rank
+from django.utils import timezone
+
+from . import archivo
+from .models import DetalleVenta, DetalleVentaArchivada, Empleado
+from .reportes_db import lectura_de_default, snapshot_en_uso
+
+DURACION_CACHE_ABIERTO = 60       # segundos, rangos que incluyen hoy
+DURACION_CACHE_CERRADO = 60 * 60  # segundos, periodos que ya terminaron
+CLAVE_VERSION = 'reporte_empleados:version'
+
+
+def _consulta(modelo_detalle, desde, hasta):
+    return (
+        modelo_detalle.objects.filter(
+            venta__fecha_venta__gte=desde, venta__fecha_venta__lt=hasta, venta__empleado_vendedor__isnull=False,
+            venta__anulada=False,
+        )
+        .values(
+            empleado_id=F('venta__empleado_vendedor_id'),
+            nombre=F('venta__empleado_vendedor__nombre_completo'),
+            puesto=F('venta__empleado_vendedor__puesto'),
+        )
+        .annotate(ingresos=Sum('subtotal'), tickets=Count('venta_id', distinct=True), unidades=Sum('cantidad_vendida'))
+        .annotate(
+            rango=Window(Rank(), order_by=F('ingresos').desc()),
+            rango_puesto=Window(Rank(), partition_by=F('puesto'), order_by=F('ingresos').desc()),
+        )
+        .order_by('rango', 'nombre')
+    )
+
+
+def _rankear(filas):
+    """Mismo RANK() que la consulta, para cuando se combinan las tablas activas y archivadas."""
+    def asignar(grupo, campo):
+        anterior, rango = None, 0
+        for posicion, fila in enumerate(sorted(grupo, key=lambda f: -f['ingresos']), start=1):
+            if fila['ingresos'] != anterior:
+                rango, anterior = posicion, fila['ingresos']
+            fila[campo] = rango
+
+    asignar(filas, 'rango')
+    por_puesto = defaultdict(list)
+    for fila in filas:
+        por_puesto[fila['puesto']].append(fila)
+    for grupo in por_puesto.values():
+        asignar(grupo, 'rango_puesto')
+    return sorted(filas, key=lambda f: (f['rango'], f['nombre']))
+
+
+def _combinar(activas, archivadas):
+    por_empleado = {f['empleado_id']: dict(f) for f in activas}
+    for fila in archivadas:
+        actual = por_empleado.setdefault(fila['empleado_id'], dict(fila, ingresos=0, tickets=0, unidades=0))
+        for campo in ('ingresos', 'tickets', 'unidades'):
+            actual[campo] += fila[campo]
+    return _rankear(list(por_empleado.values()))
+
+
+def calcular(desde, hasta):
+    """Filas del reporte para [desde, hasta), ordenadas por ranking general."""
+    filas = list(_consulta(DetalleVenta, desde, hasta))
+    if archivo.necesita_archivo(archivo.TABLA_VENTAS, desde):
+        filas = _combinar(filas, list(_consulta(DetalleVentaArchivada, desde, hasta)))
+
+    etiquetas = dict(Empleado.PUESTOS)
+    ingresos_puesto = defaultdict(Decimal)
+    for fila in filas:
+        fila['ingresos'] = (fila['ingresos'] or Decimal('0')).quantize(Decimal('0.01'))
+        ingresos_puesto[fila['puesto']] += fila['ingresos']
+    for fila in filas:
+        fila['puesto_nombre'] = etiquetas.get(fila['puesto'], fila['puesto'])
+        fila['ticket_promedio'] = (fila['ingresos'] / fila['tickets']).quantize(Decimal('0.01')) if fila['tickets'] else Decimal('0.00')
+        total = ingresos_puesto[fila['puesto']]
+        fila['participacion_puesto'] = (fila['ingresos'] * 100 / total).quantize(Decimal('0.1')) if total else Decimal('0.0')
+    return filas
+
+
+def _version():
+    # Si la caché desalojó la versión, una nueva: nunca se vuelve a una versión ya usada. Como no se
+    # sabe cuándo fue la última invalidación, cuenta como ahora (el snapshot vigente no se usa)
+    cache.add(CLAVE_VERSION, time.time_ns(), None)
+    return cache.get(CLAVE_VERSION)
+
+
+def invalidar():
+    """Descarta todos los reportes cacheados (cambia la versión de las claves)."""
+    cache.set(CLAVE_VERSION, time.time_ns(), None)
+
+
+def reporte(desde, hasta):
+    """`calcular` con caché por rango y por origen de los datos (snapshot o `default`)."""
+    version = _version()
+    snapshot = snapshot_en_uso()
+    if snapshot is not None and snapshot.timestamp() * 10 ** 9 < version:
+        snapshot = None  # tomado antes de la última invalidación
+    origen = snapshot.isoformat() if snapshot else 'default'
+    clave = f'reporte_empleados:{version}:{origen}:{desde.isoformat()}:{hasta.isoformat()}'
+    filas = cache.get(clave)
+    if filas is None:
+        with nullcontext() if snapshot else lectura_de_default():
+            filas = calcular(desde, hasta)
+        cerrado = hasta <= timezone.now()
+        cache.set(clave, filas, DURACION_CACHE_CERRADO if cerrado else DURACION_CACHE_ABIERTO)
+    return filas
@@ -0,0 +1,98 @@
+"""
+Base de datos de reportes: una copia (snapshot) de la base principal.
+
+Las vistas y comandos de reporte leen del alias `reporting` para no competir con las escrituras
+del punto de venta. El snapshot se refresca con `python manage.py refrescar_reportes`, que usa la
+API de respaldo en línea de SQLite. Si el snapshot no existe, todo se lee de `default`.
+"""
+import contextvars
+import os
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+from functools import wraps
+
+from django.conf import settings
+from django.utils import timezone
+
+ALIAS_REPORTES = 'reporting'
+
+_modo_reporte = contextvars.ContextVar('modo_reporte', default=False)
+
+
+def ruta_snapshot():
+    config = settings.DATABASES.get(ALIAS_REPORTES)
+    return str(config['NAME']) if config else None
+
+
+def fecha_snapshot():
+    """Momento al que corresponden los datos del snapshot, o None si no hay snapshot."""
+    ruta = ruta_snapshot()
+    if not ruta or not os.path.exists(ruta):
+        return None
+    return datetime.fromtimestamp(os.path.getmtime(ruta), tz=dt_timezone.utc)
+
+
+@contextmanager
+def lectura_de_reportes():
+    """Dentro del bloque, las lecturas ORM van al snapshot de reportes (si existe)."""
+    token = _modo_reporte.set(True)
+    try:
+        yield fecha_snapshot()
+    finally:
+        _modo_reporte.reset(token)
+
+
+def snapshot_en_uso():
+    """Fecha del snapshot si en este momento las lecturas van a él, o None si van a `default`."""
+    return fecha_snapshot() if _modo_reporte.get() else None
+
+
+@contextmanager
+def lectura_de_default():
+    """Dentro del bloque, las lecturas vuelven a `default` aunque se esté en modo reporte."""
+    token = _modo_reporte.set(False)
+    try:
+        yield
+    finally:
+        _modo_reporte.reset(token)
+
+
+def vista_de_reporte(solo_si=None):
+    """
+    Decorador para vistas de solo lectura que pueden servirse desde el snapshot.
+    `solo_si(request)` permite limitarlo, p. ej. a consultas históricas.
+    Añade la antigüedad de los datos en las cabeceras y en `request.snapshot_reportes`.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if solo_si is not None and not solo_si(request):
+                return vista(request, *args, **kwargs)
+            with lectura_de_reportes() as fecha:
+                request.snapshot_reportes = fecha
+                response = vista(request, *args, **kwargs)
+            if fecha is not None:
+                response['X-Snapshot-Fecha'] = fecha.isoformat()
+                response['X-Snapshot-Antiguedad'] = str(int((timezone.now() - fecha).total_seconds()))
+            return response
+        return envoltura
+    return decorador
+
+
+class ReportesRouter:
+    """Envía lecturas al snapshot solo en modo reporte; las escrituras siempre van a `default`."""
+
+    def db_for_read(self, model, **hints):
+        if _modo_reporte.get() and fecha_snapshot() is not None:
+            return ALIAS_REPORTES
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # El snapshot es una copia íntegra de `default` (esquema incluido)
+        return db != ALIAS_REPORTES
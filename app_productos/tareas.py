@@ -0,0 +1,149 @@
+"""
+Cola de tareas local respaldada por la base de datos.
+
+El trabajo no crítico posterior a una venta (resúmenes, notificaciones, ...) se registra como una
+fila `Tarea` dentro de la misma transacción que la venta, así que nunca se pierde ni se ejecuta si
+la venta se revierte. Según `settings.TAREAS_MODO`:
+
+    'worker'    solo la ejecuta el comando `procesar_tareas` (producción).
+    'hilo'      además se lanza en un hilo de este proceso al hacer commit (desarrollo); si falla,
+                el mismo proceso la vuelve a lanzar al cumplirse su espera.
+    'inmediato' se ejecuta al hacer commit en el mismo hilo (pruebas).
+
+Cada ejecución corre en su propia transacción junto con el cambio de estado a 'OK', de modo que
+una tarea se aplica exactamente una vez. Los fallos se reintentan con espera exponencial y, al
+agotar `max_intentos`, la tarea queda en estado 'MUE' (ver la vista de tareas fallidas).
+"""
+import logging
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Tarea
+
+logger = logging.getLogger(__name__)
+
+DURACION_BLOQUEO = timedelta(minutes=5)
+
+_registro = {}
+_pool = None
+
+
+def tarea(nombre, max_intentos=5):
+    """Registra una función como tarea encolable bajo `nombre`."""
+    def decorador(funcion):
+        funcion.nombre_tarea = nombre
+        funcion.max_intentos = max_intentos
+        _registro[nombre] = funcion
+        return funcion
+    return decorador
+
+
+def encolar(nombre, **argumentos):
+    """Crea la tarea en la transacción actual; se ejecuta solo si la transacción se confirma."""
+    funcion = _registro[nombre]
+    nueva = Tarea.objects.create(nombre=nombre, argumentos=argumentos, max_intentos=funcion.max_intentos)
+
+    modo = getattr(settings, 'TAREAS_MODO', 'worker')
+    if modo == 'inmediato':
+        transaction.on_commit(lambda: ejecutar(nueva.id))
+    elif modo == 'hilo':
+        transaction.on_commit(lambda: _pool_local().submit(_ejecutar_en_hilo, nueva.id))
+    return nueva
+
+
+def _pool_local():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='tareas')
+    return _pool
+
+
+def _ejecutar_en_hilo(tarea_id):
+    close_old_connections()
+    try:
+        _ejecutar_o_reprogramar(tarea_id)
+        # Sin worker dedicado, aprovechar para reintentar las que ya cumplieron su espera
+        for pendiente_id in pendientes(20):
+            _ejecutar_o_reprogramar(pendiente_id)
+    finally:
+        connection.close()
+
+
+def _ejecutar_o_reprogramar(tarea_id):
+    """
+    Sin worker nadie vuelve por una tarea que falló (p. ej. 'database is locked' mientras la petición
+    seguía escribiendo): se relanza en este proceso cuando se cumple su espera.
+    """
+    if ejecutar(tarea_id):
+        return
+    disponible_en = Tarea.objects.filter(id=tarea_id, estado='PEN').values_list('disponible_en', flat=True).first()
+    if disponible_en is None:
+        return
+    espera = max((disponible_en - timezone.now()).total_seconds(), 0)
+    temporizador = threading.Timer(espera, lambda: _pool_local().submit(_ejecutar_en_hilo, tarea_id))
+    temporizador.daemon = True
+    temporizador.start()
+
+
+def _disponibles(ahora):
+    return Q(estado='PEN', disponible_en__lte=ahora) | Q(estado='EJE', bloqueado_hasta__lt=ahora)
+
+
+def pendientes(limite):
+    """Ids de tareas listas para ejecutarse (incluye las que quedaron bloqueadas por un worker caído)."""
+    ahora = timezone.now()
+    return list(Tarea.objects.filter(_disponibles(ahora)).order_by('id').values_list('id', flat=True)[:limite])
+
+
+def ejecutar(tarea_id):
+    """Reclama y ejecuta una tarea. Devuelve True si se completó."""
+    ahora = timezone.now()
+    # Reclamo atómico: solo un worker puede pasar la tarea a 'EJE'
+    reclamada = Tarea.objects.filter(_disponibles(ahora), id=tarea_id).update(
+        estado='EJE', bloqueado_hasta=ahora + DURACION_BLOQUEO, intentos=F('intentos') + 1
+    )
+    if not reclamada:
+        return False
+
+    registro = Tarea.objects.get(id=tarea_id)
+    try:
+        with transaction.atomic():
+            funcion = _registro.get(registro.nombre)
+            if funcion is None:
+                raise LookupError(f'Tarea no registrada: {registro.nombre}')
+            funcion(**registro.argumentos)
+            Tarea.objects.filter(id=tarea_id).update(
+                estado='OK', bloqueado_hasta=None, ultimo_error=None, fecha_actualizacion=timezone.now()
+            )
+        return True
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning('Falló la tarea %s (%s), intento %s', tarea_id, registro.nombre, registro.intentos)
+        agotada = registro.intentos >= registro.max_intentos
+        Tarea.objects.filter(id=tarea_id).update(
+            estado='MUE' if agotada else 'PEN',
+            bloqueado_hasta=None,
+            disponible_en=timezone.now() + timedelta(seconds=2 ** registro.intentos),
+            ultimo_error=error[-4000:],
+            fecha_actualizacion=timezone.now(),
+        )
+        return False
+
+
+def reintentar(tarea_id):
+    """Devuelve a la cola una tarea fallida, con el contador de intentos en cero."""
+    return Tarea.objects.filter(id=tarea_id, estado='MUE').update(
+        estado='PEN', intentos=0, disponible_en=timezone.now(), fecha_actualizacion=timezone.now()
+    )
+
+
+def purgar_completadas(dias):
+    limite = timezone.now() - timedelta(days=dias)
+    return Tarea.objects.filter(estado='OK', fecha_actualizacion__lt=limite).delete()[0]
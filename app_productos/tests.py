@@ -1,3 +1,1744 @@
-from django.test import TestCase
+"""
+Presupuesto de consultas SQL por vista.
 
-# Create your tests here.
+Cada ruta de app_productos/urls.py se ejecuta (GET y POST) contra datos sembrados a dos escalas
+distintas. El número de consultas debe coincidir exactamente con el presupuesto declarado en
+PRESUPUESTOS y, por lo tanto, no puede crecer con el volumen de datos: un N+1 nuevo en una vista
+o en su plantilla hace fallar la escala grande.
+
+Después del presupuesto, cada funcionalidad tiene pruebas de comportamiento (stock, KPIs, ranking,
+promociones, archivo, conteos...). El modo de tareas 'inmediato' y `captureOnCommitCallbacks`
+ejecutan los efectos que en producción corren después del commit.
+"""
+import json
+import os
+import sqlite3
+import sys
+from contextlib import closing
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from importlib import import_module
+from importlib.util import find_spec
+from io import StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.core.paginator import EmptyPage
+from django.db import OperationalError, transaction
+from django.http import HttpResponse, QueryDict
+from django.test import LiveServerTestCase, RequestFactory, TestCase, override_settings
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+
+from . import (
+    anulaciones, archivo, conteos, estadisticas_clientes, kpis, perfilado, precios, promociones, ranking,
+    reporte_empleados, reportes_db, tareas, tiendas,
+)
+from .efectos_venta import fotos_ventas
+from .models import (
+    CambioPrecioLote, CambioProducto, Categoria, Cliente, ConteoCapturado, DetalleVenta, Empleado, EstadisticaCliente,
+    Inventario, InventarioArchivado, KpiDiario, KpiProductoDia, LineaRecepcion, PosicionRanking, Producto, Promocion,
+    Proveedor, RecepcionMercancia, ResumenInventarioDiario, SesionConteo, SugerenciaReorden, Tarea, Tienda, Ventas, version_precios,
+)
+from .paginacion import ConteoAcotadoPaginator
+from .urls import urlpatterns
+
+
+def sembrar(n):
+    """Crea `n` filas de cada entidad principal con inserciones masivas y devuelve ids de referencia."""
+    categorias = Categoria.objects.bulk_create([Categoria(nombre=f'Categoría {i}') for i in range(n)])
+    proveedores = Proveedor.objects.bulk_create([Proveedor(nombre_empresa=f'Proveedor {i}') for i in range(n)])
+    productos = Producto.objects.bulk_create([
+        Producto(nombre=f'Producto {i}', precio_venta=Decimal('10.00') + i, stock=10 ** 6,
+                 codigo_barras=f'75{i:010d}', categoria=categorias[i % n])
+        for i in range(n)
+    ])
+    Producto.proveedores.through.objects.bulk_create([
+        Producto.proveedores.through(producto_id=p.id, proveedor_id=proveedores[(i + k) % n].id)
+        for i, p in enumerate(productos) for k in range(2)
+    ])
+    clientes = Cliente.objects.bulk_create([Cliente(nombre_completo=f'Cliente {i}') for i in range(n)])
+    empleados = Empleado.objects.bulk_create([
+        Empleado(nombre_completo=f'Empleado {i}', fecha_contratacion=date(2024, 1, 1)) for i in range(n)
+    ])
+    ventas = Ventas.objects.bulk_create([
+        Ventas(cliente=clientes[i], empleado_vendedor=empleados[i], monto_total=Decimal('25.00'))
+        for i in range(n)
+    ])
+    DetalleVenta.objects.bulk_create([
+        DetalleVenta(venta=v, producto=productos[(i + k) % n], cantidad_vendida=1,
+                     precio_unitario=Decimal('12.50'), subtotal=Decimal('12.50'))
+        for i, v in enumerate(ventas) for k in range(2)
+    ])
+    movimientos = Inventario.objects.bulk_create([
+        Inventario(producto=productos[i], tipo_movimiento='ENT', cantidad=5, razon='Carga inicial')
+        for i in range(n)
+    ])
+    recepciones = RecepcionMercancia.objects.bulk_create([
+        RecepcionMercancia(proveedor=proveedores[i], referencia=f'F-{i}') for i in range(n)
+    ])
+    LineaRecepcion.objects.bulk_create([
+        LineaRecepcion(recepcion=r, producto=productos[i], cantidad=5) for i, r in enumerate(recepciones)
+    ])
+    SugerenciaReorden.objects.bulk_create([
+        SugerenciaReorden(producto=productos[i], proveedor=proveedores[i], stock_actual=1,
+                          velocidad_diaria=Decimal('1.000'), dias_cobertura=Decimal('1.0'),
+                          cantidad_sugerida=10, fecha_calculo=timezone.now())
+        for i in range(n)
+    ])
+    CambioProducto.objects.bulk_create([
+        CambioProducto(producto=p, precio_venta=p.precio_venta, stock=p.stock) for p in productos
+    ])
+    CambioPrecioLote.objects.bulk_create([CambioPrecioLote(categoria=categorias[0], num_productos=1)])
+    tareas = Tarea.objects.bulk_create([
+        Tarea(nombre='efectos_venta', estado='MUE' if i % 2 else 'OK', ultimo_error='Error') for i in range(n)
+    ])
+    KpiDiario.objects.create(
+        fecha=timezone.localdate(), num_ventas=n, ingresos=Decimal('25.00') * n,
+        ventas_por_metodo={'EFE': {'num': n, 'monto': str(Decimal('25.00') * n)}},
+        top_productos=[{'producto_id': productos[0].id, 'nombre': 'Producto 0', 'unidades': 2, 'ingresos': '25.00'}],
+    )
+
+    Promocion.objects.bulk_create([
+        Promocion(nombre='Categoría', categoria=categorias[0], porcentaje=Decimal('10.00')),
+        Promocion(nombre='3x2', producto=productos[0], tipo='NXM', lleva=3, paga=2),
+        Promocion(nombre='Proveedor', proveedor=proveedores[0], porcentaje=Decimal('5.00')),
+    ])
+
+    # Conteo físico parcial abierto (un pasillo): dos de cada tres productos con diferencia, más un
+    # código desconocido. Tamaño fijo: los movimientos 'AJU' se insertan por lotes
+    sesion_conteo = SesionConteo.objects.create(nombre='Conteo')
+    ConteoCapturado.objects.bulk_create([
+        ConteoCapturado(sesion=sesion_conteo, lote=f'L{i // 3}', codigo_barras=p.codigo_barras, producto=p,
+                        cantidad=p.stock + i % 3 - 1)
+        for i, p in enumerate(productos[:6])
+    ] + [ConteoCapturado(sesion=sesion_conteo, lote='L0', codigo_barras='000', cantidad=2)])
+
+    estadisticas_clientes.recalcular()
+    ranking.reconstruir()
+
+    # Filas sin referencias, para poder borrarlas
+    return {
+        'producto': productos[0].id,
+        'producto_libre': Producto.objects.create(nombre='Libre', precio_venta=Decimal('1.00'), stock=1).id,
+        'codigo_barras': productos[0].codigo_barras,
+        'categoria': categorias[0].id,
+        'categoria_libre': Categoria.objects.create(nombre='Libre').id,
+        'proveedor': proveedores[0].id,
+        'proveedor_libre': Proveedor.objects.create(nombre_empresa='Libre').id,
+        'cliente': clientes[0].id,
+        'empleado': empleados[0].id,
+        'venta': ventas[0].id,
+        'detalles': [d.id for d in ventas[0].detalleventa.order_by('id')],
+        'productos_detalle': [productos[0].id, productos[1 % n].id],
+        'movimiento': movimientos[0].id,
+        'tarea_fallida': tareas[1].id,
+        'sesion_conteo': sesion_conteo.id,
+        # Las capturas del perfilador viven en disco, no en la base
+        'captura': 'captura-inexistente',
+    }
+
+
+# --- Datos de los POST ---
+
+def _producto(ids):
+    return {'nombre': 'Nuevo', 'precio_venta': '9.99', 'stock': '5', 'categoria': ids['categoria'],
+            'proveedores': [ids['proveedor']]}
+
+
+def _venta_nueva(ids):
+    return {
+        'cliente_id': ids['cliente'], 'empleado_id': ids['empleado'], 'metodo_pago': 'EFE', 'esta_pagada': 'on',
+        'detalleventa-TOTAL_FORMS': '2', 'detalleventa-INITIAL_FORMS': '0',
+        'detalleventa-0-producto': ids['productos_detalle'][0], 'detalleventa-0-cantidad_vendida': '1',
+        'detalleventa-0-precio_unitario': '10.00', 'detalleventa-0-descuento_porcentaje': '0',
+        'detalleventa-1-producto': ids['productos_detalle'][1], 'detalleventa-1-cantidad_vendida': '2',
+        'detalleventa-1-precio_unitario': '11.00', 'detalleventa-1-descuento_porcentaje': '0',
+    }
+
+
+def _venta_editada(ids):
+    datos = {
+        'metodo_pago': 'TAR', 'esta_pagada': 'on',
+        'detalleventa-TOTAL_FORMS': '2', 'detalleventa-INITIAL_FORMS': '2',
+    }
+    for i, (detalle_id, producto_id) in enumerate(zip(ids['detalles'], ids['productos_detalle'])):
+        datos.update({
+            f'detalleventa-{i}-id': detalle_id, f'detalleventa-{i}-venta': ids['venta'],
+            f'detalleventa-{i}-producto': producto_id, f'detalleventa-{i}-cantidad_vendida': '3',
+            f'detalleventa-{i}-precio_unitario': '12.50', f'detalleventa-{i}-descuento_porcentaje': '0',
+        })
+    return datos
+
+
+def _lote_ventas(ids):
+    return {'ventas': [
+        {'clave': f'caja1-{i}', 'cliente_id': ids['cliente'], 'metodo_pago': 'EFE',
+         'detalles': [{'producto_id': pid, 'cantidad': 1} for pid in ids['productos_detalle']]}
+        for i in range(3)
+    ]}
+
+
+def _cliente(ids):
+    return {'nombre_completo': 'Cliente Nuevo', 'telefono': '555', 'activo': 'on'}
+
+
+def _empleado(ids):
+    return {'nombre_completo': 'Empleado Nuevo', 'puesto': 'CAJ', 'fecha_contratacion': '2024-05-01', 'activo': 'on'}
+
+
+def _anulacion(ids):
+    return {'ids': str(ids['venta']), 'motivo': 'Prueba'}
+
+
+def _borrado(ids):
+    return {'motivo': 'Ticket duplicado', 'responsable': 'Gerente'}
+
+
+def _lote_conteo(ids):
+    return {'lote': 'L-prueba', 'lineas': [{'codigo_barras': ids['codigo_barras'], 'cantidad': 3}, {'codigo_barras': '999', 'cantidad': 1}]}
+
+
+def _movimiento(ids):
+    return {'producto': ids['producto'], 'tipo_movimiento': 'ENT', 'cantidad': '3', 'razon': 'Prueba'}
+
+
+def _recepcion(ids):
+    return {'proveedor': ids['proveedor'], 'lineas': f"{ids['codigo_barras']}, 10\n#{ids['producto_libre']}, 2"}
+
+
+def _recepcion_api(ids):
+    return {'proveedor_id': ids['proveedor'], 'lineas': [{'producto_id': ids['producto'], 'cantidad': 4}]}
+
+
+def _ventas_de_cliente(ids):
+    return {'cliente': ids['cliente'], 'empleado': ids['empleado']}
+
+
+def _ventas_filtradas(ids):
+    return {
+        'desde': '2000-01-01', 'hasta': '2999-12-31', 'codigo': ids['codigo_barras'], 'metodo_pago': 'EFE',
+        'pagada': 'si', 'monto_min': '1', 'monto_max': '100000', 'despues': f"{timezone.now().isoformat()}_{ids['venta']}",
+    }
+
+
+def _pagina_siguiente(ids):
+    return {'despues': f"{timezone.now().isoformat()}_{ids['venta']}"}
+
+
+def _ranking_categoria(ids):
+    return {'ventana': '30', 'categoria': ids['categoria']}
+
+
+def _precios(ids):
+    return {'categoria': ids['categoria'], 'porcentaje': '5', 'accion': 'previsualizar'}
+
+
+SIN_DATOS = None
+
+
+# Presupuesto de consultas por ruta.
+# (nombre de la URL, método, kwargs de la URL -> ids, datos -> ids, consultas permitidas)
+# 'JSON' es un POST con cuerpo JSON. Un presupuesto no puede depender del volumen de datos.
+PRESUPUESTOS = [
+    ('inicio', 'GET', {}, SIN_DATOS, 2),
+
+    ('ver_productos', 'GET', {}, SIN_DATOS, 2),
+    ('agregar_producto', 'GET', {}, SIN_DATOS, 2),
+    ('agregar_producto', 'POST', {}, _producto, 5),
+    ('actualizar_producto', 'GET', {'producto_id': 'producto'}, SIN_DATOS, 4),
+    ('actualizar_producto', 'POST', {'producto_id': 'producto'}, _producto, 6),
+    ('borrar_producto', 'GET', {'producto_id': 'producto_libre'}, SIN_DATOS, 1),
+    ('borrar_producto', 'POST', {'producto_id': 'producto_libre'}, SIN_DATOS, 12),
+    ('ver_reorden', 'GET', {}, SIN_DATOS, 1),
+    ('ver_ranking', 'GET', {}, SIN_DATOS, 3),
+    ('ver_ranking', 'GET', {}, _ranking_categoria, 3),
+    ('api_ranking', 'GET', {}, {'ventana': '1', 'limite': '50'}, 2),
+    ('actualizar_precios_masivo', 'GET', {}, SIN_DATOS, 3),
+    ('actualizar_precios_masivo', 'POST', {}, _precios, 5),
+
+    ('ver_categorias', 'GET', {}, SIN_DATOS, 1),
+    ('agregar_categoria', 'GET', {}, SIN_DATOS, 0),
+    ('agregar_categoria', 'POST', {}, {'nombre': 'Nueva', 'pasillo': '3', 'activa': 'on'}, 1),
+    ('actualizar_categoria', 'GET', {'categoria_id': 'categoria'}, SIN_DATOS, 1),
+    ('actualizar_categoria', 'POST', {'categoria_id': 'categoria'}, {'nombre': 'Renombrada', 'pasillo': '4'}, 2),
+    ('borrar_categoria', 'GET', {'categoria_id': 'categoria_libre'}, SIN_DATOS, 1),
+    ('borrar_categoria', 'POST', {'categoria_id': 'categoria_libre'}, SIN_DATOS, 5),
+
+    ('ver_proveedores', 'GET', {}, SIN_DATOS, 1),
+    ('agregar_proveedor', 'GET', {}, SIN_DATOS, 0),
+    ('agregar_proveedor', 'POST', {}, {'nombre_empresa': 'Nuevo'}, 1),
+    ('actualizar_proveedor', 'GET', {'proveedor_id': 'proveedor'}, SIN_DATOS, 1),
+    ('actualizar_proveedor', 'POST', {'proveedor_id': 'proveedor'}, {'nombre_empresa': 'Renombrado'}, 2),
+    ('borrar_proveedor', 'GET', {'proveedor_id': 'proveedor_libre'}, SIN_DATOS, 1),
+    ('borrar_proveedor', 'POST', {'proveedor_id': 'proveedor_libre'}, SIN_DATOS, 7),
+
+    ('ver_ventas', 'GET', {}, SIN_DATOS, 2),
+    ('ver_ventas', 'GET', {}, {'desde': '2000-01-01', 'hasta': '2999-12-31'}, 3),
+    ('ver_ventas', 'GET', {}, _ventas_de_cliente, 2),
+    ('ver_ventas', 'GET', {}, _ventas_filtradas, 5),
+    ('agregar_venta', 'GET', {}, SIN_DATOS, 8),
+    ('agregar_venta', 'POST', {}, _venta_nueva, 33),
+    ('actualizar_venta', 'GET', {'venta_id': 'venta'}, SIN_DATOS, 10),
+    ('actualizar_venta', 'POST', {'venta_id': 'venta'}, _venta_editada, 32),
+    ('borrar_venta', 'GET', {'venta_id': 'venta'}, SIN_DATOS, 1),
+    ('borrar_venta', 'POST', {'venta_id': 'venta'}, _borrado, 13),
+    ('anular_ventas', 'GET', {}, _anulacion, 2),
+    ('anular_ventas', 'POST', {}, _anulacion, 13),
+    ('api_ventas_lote', 'JSON', {}, _lote_ventas, 15),
+    ('api_cambios_productos', 'GET', {}, {'desde': '0'}, 1),
+
+    ('ver_clientes', 'GET', {}, SIN_DATOS, 1),
+    ('detalle_cliente', 'GET', {'cliente_id': 'cliente'}, SIN_DATOS, 4),
+    ('detalle_cliente', 'GET', {'cliente_id': 'cliente'}, _pagina_siguiente, 4),
+    ('agregar_cliente', 'GET', {}, SIN_DATOS, 0),
+    ('agregar_cliente', 'POST', {}, _cliente, 1),
+    ('actualizar_cliente', 'GET', {'cliente_id': 'cliente'}, SIN_DATOS, 1),
+    ('actualizar_cliente', 'POST', {'cliente_id': 'cliente'}, _cliente, 2),
+    ('borrar_cliente', 'GET', {'cliente_id': 'cliente'}, SIN_DATOS, 1),
+    ('borrar_cliente', 'POST', {'cliente_id': 'cliente'}, SIN_DATOS, 5),
+
+    ('ver_empleados', 'GET', {}, SIN_DATOS, 1),
+    ('ver_reporte_empleados', 'GET', {}, SIN_DATOS, 2),
+    ('ver_reporte_empleados', 'GET', {}, {'desde': '2000-01-01', 'formato': 'csv'}, 2),
+    ('ver_reporte_tiendas', 'GET', {}, SIN_DATOS, 4),
+    ('agregar_empleado', 'GET', {}, SIN_DATOS, 0),
+    ('agregar_empleado', 'POST', {}, _empleado, 1),
+    ('actualizar_empleado', 'GET', {'empleado_id': 'empleado'}, SIN_DATOS, 1),
+    ('actualizar_empleado', 'POST', {'empleado_id': 'empleado'}, _empleado, 2),
+    ('borrar_empleado', 'GET', {'empleado_id': 'empleado'}, SIN_DATOS, 1),
+    ('borrar_empleado', 'POST', {'empleado_id': 'empleado'}, SIN_DATOS, 3),
+
+    ('ver_movimientos_inventario', 'GET', {}, SIN_DATOS, 1),
+    ('ver_movimientos_inventario', 'GET', {}, {'desde': '2000-01-01'}, 3),
+    ('agregar_movimiento_inventario', 'GET', {}, SIN_DATOS, 3),
+    ('agregar_movimiento_inventario', 'POST', {}, _movimiento, 7),
+    ('actualizar_movimiento', 'GET', {'movimiento_id': 'movimiento'}, SIN_DATOS, 3),
+    ('actualizar_movimiento', 'POST', {'movimiento_id': 'movimiento'}, _movimiento, 2),
+    ('borrar_movimiento', 'GET', {'movimiento_id': 'movimiento'}, SIN_DATOS, 4),
+    ('borrar_movimiento', 'POST', {'movimiento_id': 'movimiento'}, SIN_DATOS, 8),
+
+    ('ver_recepciones', 'GET', {}, SIN_DATOS, 1),
+    ('agregar_recepcion', 'GET', {}, SIN_DATOS, 1),
+    ('agregar_recepcion', 'POST', {}, _recepcion, 11),
+    ('api_recepciones', 'JSON', {}, _recepcion_api, 11),
+
+    ('ver_conteos', 'GET', {}, SIN_DATOS, 1),
+    ('agregar_conteo', 'GET', {}, SIN_DATOS, 0),
+    ('agregar_conteo', 'POST', {}, {'nombre': 'Pasillo 4', 'completo': 'on'}, 1),
+    ('detalle_conteo', 'GET', {'sesion_id': 'sesion_conteo'}, SIN_DATOS, 5),
+    ('detalle_conteo', 'POST', {'sesion_id': 'sesion_conteo'}, lambda ids: {'lineas': f"{ids['codigo_barras']}, 3\n999"}, 11),
+    ('aplicar_conteo', 'POST', {'sesion_id': 'sesion_conteo'}, lambda ids: {'excluir': [ids['producto']]}, 12),
+    ('api_conteo_lote', 'JSON', {'sesion_id': 'sesion_conteo'}, _lote_conteo, 7),
+
+    ('ver_tareas', 'GET', {}, SIN_DATOS, 2),
+    ('reintentar_tarea', 'POST', {'tarea_id': 'tarea_fallida'}, SIN_DATOS, 1),
+
+    # Solo staff: el cliente anónimo va al login del admin
+    ('ver_perfiles', 'GET', {}, SIN_DATOS, 0),
+    ('detalle_perfil', 'GET', {'nombre': 'captura'}, SIN_DATOS, 0),
+    ('descargar_perfil', 'GET', {'nombre': 'captura', 'formato': 'captura'}, SIN_DATOS, 0),
+]
+
+
+class PresupuestoConsultasMixin:
+    ESCALA = None
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ids = sembrar(cls.ESCALA)
+
+    def setUp(self):
+        # El catálogo de la venta y las promociones se cachean por versión; cada medición parte en frío
+        cache.clear()
+        promociones.invalidar()
+
+    def _solicitar(self, metodo, url, datos):
+        if metodo == 'GET':
+            return self.client.get(url, datos or {})
+        if metodo == 'JSON':
+            return self.client.post(url, json.dumps(datos), content_type='application/json')
+        return self.client.post(url, datos or {})
+
+    def test_presupuesto_de_consultas_por_vista(self):
+        for nombre, metodo, url_kwargs, datos, presupuesto in PRESUPUESTOS:
+            kwargs = {k: self.ids[v] for k, v in url_kwargs.items()}
+            url = reverse(nombre, kwargs=kwargs)
+            datos = datos(self.ids) if callable(datos) else datos
+            with self.subTest(vista=nombre, metodo=metodo, escala=self.ESCALA):
+                cache.clear()
+                promociones.invalidar()
+                # Cada caso se revierte para que el siguiente vea los datos sembrados intactos
+                punto = transaction.savepoint()
+                try:
+                    with self.assertNumQueries(presupuesto):
+                        response = self._solicitar(metodo, url, datos)
+                    self.assertLess(response.status_code, 400)
+                finally:
+                    transaction.savepoint_rollback(punto)
+
+
+class PresupuestoConsultasEscalaChicaTests(PresupuestoConsultasMixin, TestCase):
+    ESCALA = 10
+
+
+class PresupuestoConsultasEscalaGrandeTests(PresupuestoConsultasMixin, TestCase):
+    ESCALA = 1000
+
+
+class CoberturaPresupuestosTests(TestCase):
+    def test_todas_las_rutas_tienen_presupuesto(self):
+        rutas = {p.name for p in urlpatterns if isinstance(p, URLPattern)}
+        cubiertas = {caso[0] for caso in PRESUPUESTOS}
+        self.assertEqual(rutas - cubiertas, set(), 'Rutas sin presupuesto de consultas en PRESUPUESTOS')
+
+
+# =======================================================================
+# --- API DE VENTAS POR LOTE ---
+# =======================================================================
+
+class LoteVentasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.producto = Producto.objects.create(nombre='Arroz', precio_venta=Decimal('20.00'), stock=10)
+
+    def _enviar(self, *ventas):
+        response = self.client.post(reverse('api_ventas_lote'), json.dumps({'ventas': list(ventas)}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['resultados']
+
+    def _venta(self, clave, cantidad=2, **extra):
+        return dict({'clave': clave, 'detalles': [{'producto_id': self.producto.id, 'cantidad': cantidad}]}, **extra)
+
+    def test_descuenta_stock_y_omite_claves_repetidas(self):
+        primero = self._enviar(self._venta('caja1-1'), self._venta('caja1-1'))
+        self.assertEqual([r['estado'] for r in primero], ['aplicada', 'duplicada'])
+        # El reenvío del lote completo (la terminal no recibió la respuesta) no vuelve a vender
+        reenvio = self._enviar(self._venta('caja1-1'))
+        self.assertEqual(reenvio[0], {'clave': 'caja1-1', 'estado': 'duplicada', 'venta_id': primero[0]['venta_id']})
+
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock, 8)
+        self.assertEqual(Ventas.objects.get().monto_total, Decimal('40.00'))
+        self.assertEqual(Inventario.objects.get(tipo_movimiento='SAL').cantidad, 2)
+
+    def test_stock_insuficiente_considera_lo_reservado_en_el_lote(self):
+        resultados = self._enviar(self._venta('a', cantidad=6), self._venta('b', cantidad=6))
+        self.assertEqual([r['estado'] for r in resultados], ['aplicada', 'error'])
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock, 4)
+
+    def test_payload_mal_formado_da_error_por_venta(self):
+        casos = [
+            {'clave': 'k1', 'detalles': 5},
+            {'clave': 'k2', 'detalles': [{'producto_id': [self.producto.id], 'cantidad': 1}]},
+            {'clave': 'k3', 'detalles': ['x']},
+            self._venta('k4', cliente_id=[1]),
+            self._venta('k5', metodo_pago=['EFE']),
+            self._venta('k6', esta_pagada='false'),
+            self._venta('k7', detalles=[{'producto_id': True, 'cantidad': 1}]),
+        ]
+        resultados = self._enviar(*casos, self._venta('k8'))
+        self.assertEqual([r['estado'] for r in resultados], ['error'] * len(casos) + ['aplicada'])
+        self.assertEqual(Ventas.objects.count(), 1)
+
+    def test_esta_pagada_solo_acepta_booleano(self):
+        self._enviar(self._venta('p1', esta_pagada=False), self._venta('p2'))
+        self.assertEqual(
+            dict(Ventas.objects.values_list('claves_idempotencia__clave', 'esta_pagada')), {'p1': False, 'p2': True}
+        )
+
+    @override_settings(TAREAS_MODO='inmediato')
+    def test_una_venta_diferida_conserva_la_fecha_de_la_terminal(self):
+        cobrada = timezone.now() - timedelta(days=2, hours=3)
+        with self.captureOnCommitCallbacks(execute=True):
+            resultados = self._enviar(
+                self._venta('noche-1', fecha=cobrada.isoformat()), self._venta('noche-2', cantidad=1),
+            )
+        fechas = dict(Ventas.objects.values_list('claves_idempotencia__clave', 'fecha_venta'))
+        self.assertEqual(fechas['noche-1'], cobrada)
+        self.assertLess(timezone.now() - fechas['noche-2'], timedelta(minutes=1))
+        # Los resúmenes cuentan la venta en el día en que se cobró
+        kpi = KpiDiario.objects.get(fecha=timezone.localdate(cobrada))
+        self.assertEqual((kpi.num_ventas, kpi.ingresos), (1, Decimal('40.00')))
+        self.assertEqual(resultados[0]['venta_id'], Ventas.objects.get(fecha_venta=cobrada).id)
+
+    def test_fecha_futura_muy_antigua_o_mal_formada_da_error(self):
+        ahora = timezone.now()
+        resultados = self._enviar(
+            self._venta('f1', fecha=(ahora + timedelta(hours=1)).isoformat()),
+            self._venta('f2', fecha=(ahora - timedelta(days=30)).isoformat()),
+            self._venta('f3', fecha='ayer'),
+            self._venta('f4', fecha=1700000000),
+            self._venta('f5', fecha=(ahora + timedelta(minutes=1)).isoformat()),
+        )
+        self.assertEqual([r['estado'] for r in resultados], ['error'] * 4 + ['aplicada'])
+        # Un reloj ligeramente adelantado se registra como "ahora", nunca en el futuro
+        self.assertLessEqual(Ventas.objects.get().fecha_venta, timezone.now())
+
+
+# =======================================================================
+# --- RECEPCIÓN DE MERCANCÍA ---
+# =======================================================================
+
+class RecepcionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.proveedor = Proveedor.objects.create(nombre_empresa='Granos SA')
+        cls.arroz = Producto.objects.create(nombre='Arroz', precio_venta=Decimal('20.00'), stock=5, codigo_barras='7501')
+        cls.frijol = Producto.objects.create(nombre='Frijol', precio_venta=Decimal('25.00'), stock=5)
+
+    def _api(self, lineas):
+        return self.client.post(reverse('api_recepciones'), json.dumps({'proveedor_id': self.proveedor.id, 'lineas': lineas}),
+                                content_type='application/json')
+
+    def test_suma_lineas_repetidas_y_registra_entradas(self):
+        response = self._api([
+            {'codigo_barras': '7501', 'cantidad': 4, 'costo_unitario': '15.50'},
+            {'producto_id': self.frijol.id, 'cantidad': 3},
+            {'codigo_barras': '7501', 'cantidad': 1},
+        ])
+        self.assertEqual(response.status_code, 201)
+        self.arroz.refresh_from_db()
+        self.frijol.refresh_from_db()
+        self.assertEqual((self.arroz.stock, self.frijol.stock), (10, 8))
+        self.assertEqual(
+            dict(Inventario.objects.filter(tipo_movimiento='ENT').values_list('producto_id', 'cantidad')),
+            {self.arroz.id: 5, self.frijol.id: 3},
+        )
+        self.assertEqual(LineaRecepcion.objects.get(producto=self.arroz).costo_unitario, Decimal('15.50'))
+
+    def test_codigo_numerico_desconocido_no_se_toma_como_id(self):
+        response = self._api([{'codigo_barras': str(self.frijol.id), 'cantidad': 7}])
+        self.assertEqual(response.status_code, 400)
+        self.frijol.refresh_from_db()
+        self.assertEqual(self.frijol.stock, 5)
+        self.assertFalse(RecepcionMercancia.objects.exists())
+
+    def test_un_producto_inexistente_revierte_todo_el_documento(self):
+        response = self._api([{'codigo_barras': '7501', 'cantidad': 4}, {'producto_id': 999999, 'cantidad': 1}])
+        self.assertEqual(response.status_code, 400)
+        self.arroz.refresh_from_db()
+        self.assertEqual(self.arroz.stock, 5)
+
+    def test_formulario_acepta_id_con_almohadilla(self):
+        response = self.client.post(reverse('agregar_recepcion'), {
+            'proveedor': self.proveedor.id, 'lineas': f'7501, 2\n#{self.frijol.id}, 3',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.frijol.refresh_from_db()
+        self.assertEqual(self.frijol.stock, 8)
+
+
+# =======================================================================
+# --- KPIs DEL TABLERO ---
+# =======================================================================
+
+def _venta_del(fecha, producto, cantidad=2, precio=Decimal('10.00'), **extra):
+    """Venta con una línea en una fecha dada (fecha_venta es auto_now_add: se fija con un UPDATE)."""
+    venta = Ventas.objects.create(monto_total=precio * cantidad, **extra)
+    Ventas.objects.filter(pk=venta.pk).update(fecha_venta=fecha)
+    DetalleVenta.objects.bulk_create([DetalleVenta(
+        venta=venta, producto=producto, cantidad_vendida=cantidad, precio_unitario=precio, subtotal=precio * cantidad,
+    )])
+    venta.refresh_from_db()
+    return venta
+
+
+class KpisTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.producto = Producto.objects.create(nombre='Arroz', precio_venta=Decimal('10.00'), stock=3)
+
+    def test_stock_bajo_se_cuenta_al_leer_el_tablero(self):
+        KpiDiario.objects.create(fecha=timezone.localdate(), productos_bajo_stock=0)
+        self.assertEqual(kpis.leer_tablero()['kpi'].productos_bajo_stock, 1)
+        # Una recepción, un conteo o el admin cambian el stock sin pasar por las ventas
+        Producto.objects.filter(pk=self.producto.pk).update(stock=50)
+        self.assertEqual(kpis.leer_tablero()['kpi'].productos_bajo_stock, 0)
+
+    def test_recalcular_un_dia_archivado_conserva_sus_ventas(self):
+        fecha = timezone.now() - timedelta(days=10)
+        dia = timezone.localdate(fecha)
+        _venta_del(fecha, self.producto, cantidad=2)
+        _venta_del(fecha, self.producto, cantidad=1, metodo_pago='TAR')
+        kpis.recalcular(dia, dia)
+        esperado = KpiDiario.objects.values('num_ventas', 'ingresos', 'ventas_por_metodo').get(fecha=dia)
+
+        archivo.archivar_ventas(timezone.now() - timedelta(days=5))
+        self.assertFalse(Ventas.objects.exists())
+        kpis.recalcular(dia, dia)
+        self.assertEqual(KpiDiario.objects.values('num_ventas', 'ingresos', 'ventas_por_metodo').get(fecha=dia), esperado)
+        self.assertEqual(esperado['num_ventas'], 2)
+        self.assertEqual(KpiProductoDia.objects.get(fecha=dia, producto=self.producto).unidades, 3)
+
+
+# =======================================================================
+# --- LISTA DE VENTAS (FILTROS Y PAGINACIÓN POR LLAVE) ---
+# =======================================================================
+
+class ListaVentasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        arroz = Producto.objects.create(nombre='Arroz', precio_venta=Decimal('10.00'), stock=100, codigo_barras='750001')
+        frijol = Producto.objects.create(nombre='Frijol', precio_venta=Decimal('20.00'), stock=100, codigo_barras='750002')
+        ahora = timezone.now()
+        # Las dos más antiguas se archivan: solo aparecen si el rango las alcanza
+        cls.ventas = [
+            _venta_del(
+                ahora - timedelta(days=dias), producto, cantidad=cantidad, precio=producto.precio_venta,
+                metodo_pago=metodo, esta_pagada=pagada,
+            )
+            for dias, producto, cantidad, metodo, pagada in (
+                (40, arroz, 1, 'EFE', True), (20, frijol, 2, 'TAR', False), (5, arroz, 3, 'EFE', True),
+                (2, frijol, 1, 'TAR', False), (0, arroz, 5, 'TAR', True),
+            )
+        ]
+        cls.posicion = {venta.id: i for i, venta in enumerate(cls.ventas)}
+        archivo.archivar_ventas(ahora - timedelta(days=10))
+        cls.desde = timezone.localdate(ahora - timedelta(days=60)).isoformat()
+
+    def _ids(self, **parametros):
+        response = self.client.get(reverse('ver_ventas'), parametros)
+        return [self.posicion[venta.id] for venta in response.context['ventas']]
+
+    def test_filtros_de_la_lista(self):
+        self.assertEqual(self._ids(), [4, 3, 2])
+        self.assertEqual(self._ids(codigo='750001'), [4, 2])
+        self.assertEqual(self._ids(codigo='750001', desde=self.desde), [4, 2, 0])
+        self.assertEqual(self._ids(metodo_pago='TAR', pagada='no'), [3])
+        self.assertEqual(self._ids(metodo_pago='TAR', pagada='no', desde=self.desde), [3, 1])
+        self.assertEqual(self._ids(monto_min='20', monto_max='40', desde=self.desde), [3, 2, 1])
+        hasta = timezone.localdate(timezone.now() - timedelta(days=3)).isoformat()
+        self.assertEqual(self._ids(desde=self.desde, hasta=hasta), [2, 1, 0])
+        # Un código desconocido no muestra nada; los valores inválidos se ignoran
+        response = self.client.get(reverse('ver_ventas'), {'codigo': '999', 'desde': self.desde})
+        self.assertEqual((list(response.context['ventas']), response.context['total']), ([], 0))
+        self.assertEqual(self._ids(monto_min='abc', monto_max='NaN', metodo_pago='XXX', pagada='quizá'), [4, 3, 2])
+
+    def test_la_pagina_siguiente_conserva_los_filtros_y_cruza_al_archivo(self):
+        url, datos, paginas = reverse('ver_ventas'), {'desde': self.desde, 'pagada': 'si'}, []
+        with mock.patch('app_productos.views.POR_PAGINA_VENTAS', 1):
+            while True:
+                response = self.client.get(url, datos)
+                self.assertEqual((response.context['pagada'], response.context['total']), ('si', 3))
+                paginas.append([v.id for v in response.context['ventas']])
+                if not response.context['siguiente']:
+                    break
+                datos = QueryDict(response.context['siguiente'])
+        self.assertEqual(paginas, [[self.ventas[4].id], [self.ventas[2].id], [self.ventas[0].id]])
+        self.assertEqual(QueryDict(response.context['primera_pagina']).dict(), {'desde': self.desde, 'pagada': 'si'})
+
+
+# =======================================================================
+# --- PAGINACIÓN CON CONTEO ACOTADO ---
+# =======================================================================
+
+class ConteoAcotadoPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        producto = Producto.objects.create(nombre='Arroz', precio_venta=Decimal('10.00'), stock=1)
+        Inventario.objects.bulk_create([
+            Inventario(producto=producto, tipo_movimiento='ENT', cantidad=i) for i in range(35)
+        ])
+
+    def _paginador(self):
+        paginador = ConteoAcotadoPaginator(Inventario.objects.order_by('id'), 10)
+        paginador.limite_conteo = 15
+        return paginador
+
+    def test_las_paginas_pasado_el_tope_se_pueden_recorrer(self):
+        paginador = self._paginador()
+        self.assertEqual(paginador.count, 15)
+        self.assertTrue(paginador.count_acotado)
+        pagina = paginador.page(3)
+        self.assertEqual([m.cantidad for m in pagina], list(range(20, 30)))
+        self.assertTrue(pagina.has_next())
+        self.assertEqual(paginador.num_pages, 4)
+
+        ultima = self._paginador().page(4)
+        self.assertEqual(len(ultima), 5)
+        self.assertFalse(ultima.has_next())
+        with self.assertRaises(EmptyPage):
+            self._paginador().page(5)
+
+    def test_admin_muestra_paginas_pasado_el_tope(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'x'))
+        url = reverse('admin:app_productos_inventario_changelist')
+        with mock.patch.object(ConteoAcotadoPaginator, 'limite_conteo', 15), \
+                mock.patch.object(admin.site._registry[Inventario], 'list_per_page', 10):
+            response = self.client.get(url, {'p': 4})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.context['cl'].result_list), 5)
+            self.assertEqual(self.client.get(url, {'p': 5}).status_code, 302)
+
+
+# =======================================================================
+# --- ARCHIVO HISTÓRICO Y COMPACTACIÓN ---
+# =======================================================================
+
+class ArchivoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.producto = Producto.objects.create(nombre='Arroz', precio_venta=Decimal('10.00'), stock=100)
+        ahora = timezone.now()
+        # Dos días compactables (dos movimientos el primero), tres archivables y tres recientes
+        for dias, cantidad in ((41, 1), (41, 2), (40, 4), (20, 8), (19, 16), (18, 32), (2, 64), (1, 128), (0, 256)):
+            movimiento = Inventario.objects.create(producto=cls.producto, tipo_movimiento='ENT', cantidad=cantidad)
+            Inventario.objects.filter(pk=movimiento.pk).update(fecha_movimiento=ahora - timedelta(days=dias))
+        cls.desde = ahora - timedelta(days=60)
+
+    def test_archivar_y_compactar_conservan_los_totales(self):
+        antes = archivo.totales_movimientos()
+        self.assertEqual(archivo.archivar_movimientos(timezone.now() - timedelta(days=10), tamano_lote=2), 6)
+        self.assertEqual(archivo.compactar_movimientos(timezone.now() - timedelta(days=30), tamano_lote=2), 3)
+        self.assertEqual(archivo.totales_movimientos(), antes)
+        self.assertEqual(Inventario.objects.count(), 3)
+        self.assertEqual(InventarioArchivado.objects.count(), 3)
+        self.assertEqual(
+            sorted(ResumenInventarioDiario.objects.values_list('cantidad', 'num_movimientos')), [(3, 2), (4, 1)],
+        )
+
+    def test_movimientos_en_rango_pagina_por_llave_a_traves_del_archivo(self):
+        archivo.archivar_movimientos(timezone.now() - timedelta(days=10))
+        archivo.compactar_movimientos(timezone.now() - timedelta(days=30))
+        vistos, despues = [], None
+        while True:
+            pagina, hay_mas = archivo.movimientos_en_rango(
+                Inventario.objects.select_related('producto'), self.desde, despues=despues, limite=2,
+            )
+            vistos += pagina
+            if not hay_mas:
+                break
+            ultimo = pagina[-1]
+            fuente = archivo.fuente_de(ultimo)
+            despues = (fuente, ultimo.fecha if fuente == archivo.FUENTE_RESUMEN else ultimo.fecha_movimiento, ultimo.id)
+        self.assertEqual([m.cantidad for m in vistos], [256, 128, 64, 32, 16, 8, 4, 3])
+        self.assertEqual([archivo.fuente_de(m) for m in vistos], ['a'] * 3 + ['h'] * 3 + ['r'] * 2)
+
+    def test_la_vista_de_inventario_pagina_con_el_enlace_siguiente(self):
+        archivo.archivar_movimientos(timezone.now() - timedelta(days=10))
+        url = reverse('ver_movimientos_inventario')
+        datos, cantidades = {'desde': timezone.localdate(self.desde).isoformat()}, []
+        with mock.patch('app_productos.views.POR_PAGINA_MOVIMIENTOS', 4):
+            while True:
+                response = self.client.get(url, datos)
+                cantidades += [m.cantidad for m in response.context['movimientos']]
+                if not response.context['siguiente']:
+                    break
+                datos = QueryDict(response.context['siguiente'])
+        self.assertEqual(cantidades, [256, 128, 64, 32, 16, 8, 4, 2, 1])
+
+
+# =======================================================================
+# --- COLA DE TAREAS ---
+# =======================================================================
+
+class _PoolEnLinea:
+    """Sustituye al pool de hilos: la prueba corre dentro de una transacción que otro hilo no ve."""
+
+    def submit(self, funcion, *args):
+        funcion(*args)
+
+
+class TareasTests(TestCase):
+    def _registrar(self, nombre, funcion):
+        tareas.tarea(nombre)(funcion)
+        self.addCleanup(tareas._registro.pop, nombre)
+
+    def test_una_tarea_fallida_pasa_a_pendiente_con_espera_y_luego_a_muerta(self):
+        self._registrar('prueba_siempre_falla', lambda: 1 / 0)
+        tarea = Tarea.objects.create(nombre='prueba_siempre_falla', argumentos={}, max_intentos=2)
+        self.assertFalse(tareas.ejecutar(tarea.id))
+        tarea.refresh_from_db()
+        self.assertEqual((tarea.estado, tarea.intentos), ('PEN', 1))
+        self.assertGreater(tarea.disponible_en, timezone.now())
+        self.assertIn('ZeroDivisionError', tarea.ultimo_error)
+        # Aún en espera: no se puede reclamar
+        self.assertFalse(tareas.ejecutar(tarea.id))
+
+        Tarea.objects.filter(pk=tarea.pk).update(disponible_en=timezone.now())
+        tareas.ejecutar(tarea.id)
+        tarea.refresh_from_db()
+        self.assertEqual(tarea.estado, 'MUE')
+        self.assertEqual(tareas.reintentar(tarea.id), 1)
+
+    @mock.patch.object(tareas, 'connection')
+    @mock.patch.object(tareas, 'close_old_connections')
+    def test_en_modo_hilo_la_tarea_fallida_se_relanza_al_cumplir_su_espera(self, *_):
+        llamadas = []
+
+        def falla_la_primera_vez():
+            llamadas.append(1)
+            if len(llamadas) == 1:
+                raise OperationalError('database is locked')
+
+        self._registrar('prueba_bloqueada', falla_la_primera_vez)
+        tarea = Tarea.objects.create(nombre='prueba_bloqueada', argumentos={})
+        with mock.patch.object(tareas.threading, 'Timer') as temporizador, \
+                mock.patch.object(tareas, '_pool_local', return_value=_PoolEnLinea()):
+            tareas._ejecutar_en_hilo(tarea.id)
+            espera, relanzar = temporizador.call_args.args
+            self.assertTrue(0 < espera <= 2)
+            temporizador.return_value.start.assert_called_once_with()
+
+            Tarea.objects.filter(pk=tarea.pk).update(disponible_en=timezone.now())
+            relanzar()
+        tarea.refresh_from_db()
+        self.assertEqual((tarea.estado, len(llamadas)), ('OK', 2))
+
+
+# =======================================================================
+# --- SUCURSALES ---
+# =======================================================================
+
+@override_settings(TIENDA='centro', TIENDAS=['centro'])
+class TiendasTests(TestCase):
+    def setUp(self):
+        tiendas._ids_por_tienda.clear()
+        self.addCleanup(tiendas._ids_por_tienda.clear)
+
+    def test_codigo_no_configurado_es_un_error(self):
+        self.assertEqual(tiendas.alias_de('centro'), 'default')
+        with self.assertRaises(LookupError):
+            tiendas.alias_de('cetnro')
+        with self.assertRaises(LookupError), tiendas.en_tienda('cetnro'):
+            pass
+
+    def test_id_de_la_tienda_no_se_memoriza_mientras_no_exista(self):
+        self.assertIsNone(tiendas.tienda_actual_id())
+        tienda = Tienda.objects.create(codigo='centro', nombre='Centro')
+        self.assertEqual(tiendas.tienda_actual_id(), tienda.id)
+        producto = Producto.objects.create(nombre='Arroz', precio_venta=Decimal('10.00'), stock=1)
+        movimiento = Inventario.objects.create(producto=producto, tipo_movimiento='ENT', cantidad=1)
+        self.assertEqual(movimiento.tienda_id, tienda.id)
+
+
+# =======================================================================
+# --- REPORTE DE EMPLEADOS ---
+# =======================================================================
+
+@override_settings(TAREAS_MODO='inmediato')
+class ReporteEmpleadosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.producto = Producto.objects.create(nombre='Arroz', precio_venta=Decimal('10.00'), stock=100)
+        cls.ana = Empleado.objects.create(nombre_completo='Ana', puesto='CAJ', fecha_contratacion=date(2024, 1, 1))
+        cls.beto = Empleado.objects.create(nombre_completo='Beto', puesto='CAJ', fecha_contratacion=date(2024, 1, 1))
+
+    def setUp(self):
+        cache.clear()
+        fecha = timezone.now() - timedelta(days=10)
+        self.desde = kpis._inicio_dia(timezone.localdate(fecha))
+        self.hasta = self.desde + timedelta(days=1)
+        self.venta_ana = _venta_del(fecha, self.producto, cantidad=3, empleado_vendedor=self.ana)
+        _venta_del(fecha, self.producto, cantidad=1, empleado_vendedor=self.ana)
+        _venta_del(fecha, self.producto, cantidad=2, empleado_vendedor=self.beto)
+
+    def test_ranking_y_totales_por_empleado(self):
+        filas = reporte_empleados.calcular(self.desde, self.hasta)
+        self.assertEqual(
+            [(f['nombre'], f['ingresos'], f['tickets'], f['unidades'], f['rango']) for f in filas],
+            [('Ana', Decimal('40.00'), 2, 4, 1), ('Beto', Decimal('20.00'), 1, 2, 2)],
+        )
+        self.assertEqual(filas[0]['ticket_promedio'], Decimal('20.00'))
+        self.assertEqual(filas[0]['participacion_puesto'], Decimal('66.7'))
+
+    def test_anular_ventas_de_un_periodo_cerrado_invalida_el_reporte_cacheado(self):
+        self.assertEqual(reporte_empleados.reporte(self.desde, self.hasta)[0]['ingresos'], Decimal('40.00'))
+        with self.captureOnCommitCallbacks(execute=True):
+            anulaciones.anular_ventas([self.venta_ana.id], 'Ticket duplicado')
+        filas = reporte_empleados.reporte(self.desde, self.hasta)
+        self.assertEqual([(f['nombre'], f['ingresos']) for f in filas], [('Beto', Decimal('20.00')), ('Ana', Decimal('10.00'))])
+
+    def test_tras_invalidar_no_se_cachea_un_snapshot_anterior_al_cambio(self):
+        # El snapshot se tomó antes de la anulación: ahí la venta de Ana sigue activa
+        filas_snapshot = reporte_empleados.calcular(self.desde, self.hasta)
+        calcular = reporte_empleados.calcular
+
+        def leer(desde, hasta):
+            # El alias `reporting` no se puede abrir en la transacción de la prueba: se simula su contenido
+            return filas_snapshot if reportes_db.snapshot_en_uso() else calcular(desde, hasta)
+
+        hace_una_hora = timezone.now() - timedelta(hours=1)
+        with mock.patch.object(reporte_empleados, 'calcular', side_effect=leer), \
+                mock.patch.object(reportes_db, 'fecha_snapshot', return_value=hace_una_hora):
+            with reportes_db.lectura_de_reportes():
+                self.assertEqual(reporte_empleados.reporte(self.desde, self.hasta)[0]['ingresos'], Decimal('40.00'))
+            with self.captureOnCommitCallbacks(execute=True):
+                anulaciones.anular_ventas([self.venta_ana.id], 'Ticket duplicado')
+            with reportes_db.lectura_de_reportes():
+                filas = reporte_empleados.reporte(self.desde, self.hasta)
+                self.assertEqual([(f['nombre'], f['ingresos']) for f in filas], [('Beto', Decimal('20.00')), ('Ana', Decimal('10.00'))])
+                # Otra lectura antes del refresco tampoco devuelve el snapshot viejo desde la caché
+                self.assertEqual(reporte_empleados.reporte(self.desde, self.hasta), filas)
+
+            # Un snapshot refrescado después de la anulación ya se usa
+            filas_snapshot = [dict(f, nombre='Desde snapshot') for f in filas]
+            reportes_db.fecha_snapshot.return_value = timezone.now() + timedelta(seconds=1)
+            with reportes_db.lectura_de_reportes():
+                self.assertEqual(reporte_empleados.reporte(self.desde, self.hasta), filas_snapshot)
+
+
+# =======================================================================
+# --- CONTEOS FÍSICOS ---
+# =======================================================================
+
+class ConteosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.productos = Producto.objects.bulk_create([
+            Producto(nombre=f'Producto {i}', precio_venta=Decimal('10.00'), stock=10, codigo_barras=f'75{i:04d}')
+            for i in range(5)
+        ])
+
+    def _sesion(self, completo=False):
+        sesion = SesionConteo.objects.create(nombre='Pasillo 1', completo=completo)
+        # 0: cuadra; 1: sobran 2 (en dos lotes); 2: faltan 7; 3 y 4 sin escanear; más un código desconocido
+        conteos.registrar_lote(sesion, 'esc1-1', [
+            {'codigo_barras': '750000', 'cantidad': 10}, {'codigo_barras': '750001', 'cantidad': 5},
+            {'codigo_barras': '750002', 'cantidad': 3}, {'codigo_barras': '999', 'cantidad': 1},
+        ])
+        conteos.registrar_lote(sesion, 'esc2-1', [{'codigo_barras': '750001', 'cantidad': 7}])
+        return sesion
+
+    def test_un_lote_reenviado_no_se_vuelve_a_sumar(self):
+        sesion = self._sesion()
+        self.assertEqual(conteos.registrar_lote(sesion, 'esc2-1', [{'codigo_barras': '750001', 'cantidad': 7}]), (0, []))
+        self.assertEqual(conteos.desconocidos(sesion), [('999', 1)])
+        contado = {f['codigo_barras']: f['contado'] for f in conteos.diferencias(sesion)}
+        self.assertEqual(contado, {'750000': 10, '750001': 12, '750002': 3})
+
+    def test_resumen_ordena_y_suma_en_sql(self):
+        filas, num, sobrantes, faltantes = conteos.resumen(self._sesion(), limite=1)
+        self.assertEqual((num, sobrantes, faltantes), (2, 2, 7))
+        self.assertEqual([(f['codigo_barras'], f['diferencia']) for f in filas], [('750002', -7)])
+
+        # Sesión completa: lo no escaneado cuenta como 0
+        filas, num, sobrantes, faltantes = conteos.resumen(self._sesion(completo=True), limite=10)
+        self.assertEqual((num, sobrantes, faltantes), (4, 2, 27))
+        self.assertEqual([f['diferencia'] for f in filas], [-10, -10, -7, 2])
+
+    def test_aplicar_ajusta_stock_y_registra_ajustes_firmados(self):
+        sesion = self._sesion(completo=True)
+        resultado = conteos.aplicar(sesion, excluir=[self.productos[4].id], responsable='Ana')
+        self.assertEqual(resultado, conteos.Aplicacion(productos=3, piezas_sobrantes=2, piezas_faltantes=17))
+        self.assertEqual(list(Producto.objects.order_by('id').values_list('stock', flat=True)), [10, 12, 3, 0, 10])
+        self.assertEqual(
+            dict(Inventario.objects.filter(tipo_movimiento='AJU').values_list('producto_id', 'cantidad')),
+            {self.productos[1].id: 2, self.productos[2].id: -7, self.productos[3].id: -10},
+        )
+        self.assertEqual(SesionConteo.objects.get(pk=sesion.pk).estado, 'APL')
+        with self.assertRaises(ValueError):
+            conteos.aplicar(sesion)
+        with self.assertRaises(ValueError):
+            conteos.registrar_lote(sesion, 'tarde', [{'codigo_barras': '750000', 'cantidad': 1}])
+
+    def test_la_pantalla_muestra_las_mayores_diferencias_y_los_totales(self):
+        sesion = self._sesion(completo=True)
+        with mock.patch('app_productos.views.MAX_DIFERENCIAS_EN_PANTALLA', 2):
+            response = self.client.get(reverse('detalle_conteo', args=[sesion.id]))
+        self.assertEqual(len(response.context['diferencias']), 2)
+        self.assertEqual(
+            (response.context['num_diferencias'], response.context['sobrantes'], response.context['faltantes']), (4, 2, 27),
+        )
+
+
+# =======================================================================
+# --- RANKING DE MÁS VENDIDOS ---
+# =======================================================================
+
+class RankingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.arroz = Producto.objects.create(nombre='Arroz', precio_venta=Decimal('10.00'), stock=100)
+        cls.frijol = Producto.objects.create(nombre='Frijol', precio_venta=Decimal('10.00'), stock=100)
+
+    def _unidades(self, ventana):
+        return [(f['nombre'], f['unidades']) for f in ranking.top(ventana)[1]]
+
+    def test_la_primera_venta_reconstruye_sin_contarse_dos_veces(self):
+        # Sin estado previo la tarea reconstruye las ventanas desde las ventas ya confirmadas
+        venta = _venta_del(timezone.now(), self.arroz, cantidad=3)
+        ranking.aplicar_fotos(despues=fotos_ventas([venta.id]))
+        self.assertEqual(self._unidades(1), [('Arroz', 3)])
+
+        otra = _venta_del(timezone.now() - timedelta(days=3), self.frijol, cantidad=5)
+        ranking.aplicar_fotos(despues=fotos_ventas([otra.id]))
+        self.assertEqual(self._unidades(1), [('Arroz', 3)])
+        self.assertEqual(self._unidades(7), [('Frijol', 5), ('Arroz', 3)])
+
+    def test_alinear_caduca_las_cubetas_que_salen_de_cada_ventana(self):
+        hoy = timezone.localdate()
+        ventas = [
+            _venta_del(timezone.now() - timedelta(days=dias), producto, cantidad=cantidad)
+            for dias, producto, cantidad in ((0, self.arroz, 3), (2, self.frijol, 5), (6, self.arroz, 1))
+        ]
+        kpis.aplicar_fotos(despues=fotos_ventas([v.id for v in ventas]))
+        ranking.reconstruir(hoy)
+
+        def ventanas():
+            return {
+                ventana: dict(PosicionRanking.objects.filter(ventana=ventana).values_list('producto__nombre', 'unidades'))
+                for ventana in ranking.VENTANAS
+            }
+
+        self.assertEqual(ventanas(), {1: {'Arroz': 3}, 7: {'Arroz': 4, 'Frijol': 5}, 30: {'Arroz': 4, 'Frijol': 5}})
+        for dias, esperado in (
+            (1, {1: {}, 7: {'Arroz': 3, 'Frijol': 5}, 30: {'Arroz': 4, 'Frijol': 5}}),
+            (5, {1: {}, 7: {'Arroz': 3}, 30: {'Arroz': 4, 'Frijol': 5}}),
+            (7, {1: {}, 7: {}, 30: {'Arroz': 4, 'Frijol': 5}}),
+        ):
+            self.assertEqual(ranking.alinear(hoy + timedelta(days=dias)).fecha, hoy + timedelta(days=dias))
+            self.assertEqual(ventanas(), esperado)
+            # Avanzar de a saltos deja lo mismo que reconstruir desde las ventas
+            ranking.reconstruir(hoy + timedelta(days=dias))
+            self.assertEqual(ventanas(), esperado)
+
+
+# =======================================================================
+# --- EFECTOS DE UNA VENTA (STOCK, KPIs, RANKING, CLIENTES) ---
+# =======================================================================
+
+@override_settings(TAREAS_MODO='inmediato')
+class EfectosVentaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.arroz = Producto.objects.create(nombre='Arroz', precio_venta=Decimal('10.00'), stock=20)
+        cls.frijol = Producto.objects.create(nombre='Frijol', precio_venta=Decimal('20.00'), stock=20)
+        cls.cliente = Cliente.objects.create(nombre_completo='Ana')
+        cls.empleado = Empleado.objects.create(nombre_completo='Beto', fecha_contratacion=date(2024, 1, 1))
+        Promocion.objects.create(nombre='Frijol -10%', tipo='POR', porcentaje=Decimal('10'), producto=cls.frijol)
+
+    def setUp(self):
+        promociones.invalidar()
+
+    def _vender(self):
+        datos = {
+            'cliente_id': self.cliente.id, 'empleado_id': self.empleado.id, 'metodo_pago': 'EFE', 'esta_pagada': 'on',
+            'detalleventa-TOTAL_FORMS': '2', 'detalleventa-INITIAL_FORMS': '0',
+            'detalleventa-0-producto': self.arroz.id, 'detalleventa-0-cantidad_vendida': '3',
+            'detalleventa-0-precio_unitario': '10.00', 'detalleventa-0-descuento_porcentaje': '0',
+            'detalleventa-1-producto': self.frijol.id, 'detalleventa-1-cantidad_vendida': '2',
+            'detalleventa-1-precio_unitario': '20.00', 'detalleventa-1-descuento_porcentaje': '0',
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('agregar_venta'), datos)
+        self.assertEqual(response.status_code, 302)
+        return Ventas.objects.get()
+
+    def _stock(self):
+        return list(Producto.objects.order_by('id').values_list('stock', flat=True))
+
+    def test_venta_descuenta_stock_y_actualiza_los_resumenes(self):
+        venta = self._vender()
+        # La promoción del frijol se aplica en la caja: 2 x 20.00 - 10%
+        self.assertEqual(venta.monto_total, Decimal('66.00'))
+        self.assertEqual(DetalleVenta.objects.get(producto=self.frijol).descuento_porcentaje, Decimal('10.00'))
+        self.assertEqual(self._stock(), [17, 18])
+        self.assertEqual(
+            dict(Inventario.objects.filter(tipo_movimiento='SAL').values_list('producto_id', 'cantidad')),
+            {self.arroz.id: 3, self.frijol.id: 2},
+        )
+
+        kpi = KpiDiario.objects.get(fecha=timezone.localdate())
+        self.assertEqual((kpi.num_ventas, kpi.ingresos), (1, Decimal('66.00')))
+        self.assertEqual(kpi.ventas_por_metodo, {'EFE': {'num': 1, 'monto': '66.00'}})
+        self.assertEqual(
+            dict(KpiProductoDia.objects.values_list('producto_id', 'unidades')), {self.arroz.id: 3, self.frijol.id: 2},
+        )
+        _, filas = ranking.top(1)
+        self.assertEqual([(f['posicion'], f['nombre'], f['unidades']) for f in filas], [(1, 'Arroz', 3), (2, 'Frijol', 2)])
+
+        estadistica = self.cliente.estadisticas
+        self.assertEqual((estadistica.num_compras, estadistica.gasto_total), (1, Decimal('66.00')))
+        self.assertEqual(estadistica.ultima_compra, timezone.localdate())
+        self.assertEqual([f.producto_id for f in estadisticas_clientes.favoritos(self.cliente.id)], [self.arroz.id, self.frijol.id])
+
+    def test_anular_devuelve_el_stock_y_resta_la_venta_de_los_resumenes(self):
+        venta = self._vender()
+        with self.captureOnCommitCallbacks(execute=True):
+            resultado = anulaciones.anular_ventas([venta.id], 'Ticket duplicado', responsable='Beto')
+        self.assertEqual(resultado, anulaciones.Anulacion(ventas=1, productos=2, unidades=5))
+        self.assertEqual(self._stock(), [20, 20])
+        self.assertEqual(
+            dict(Inventario.objects.filter(tipo_movimiento='ENT').values_list('producto_id', 'cantidad')),
+            {self.arroz.id: 3, self.frijol.id: 2},
+        )
+
+        kpi = KpiDiario.objects.get(fecha=timezone.localdate())
+        self.assertEqual((kpi.num_ventas, kpi.ingresos), (0, Decimal('0.00')))
+        self.assertEqual(ranking.top(1)[1], [])
+        estadistica = EstadisticaCliente.objects.get(cliente=self.cliente)
+        self.assertEqual((estadistica.num_compras, estadistica.gasto_total), (0, Decimal('0.00')))
+        self.assertEqual(estadisticas_clientes.favoritos(self.cliente.id), [])
+
+        # Una venta ya anulada no se vuelve a restar
+        self.assertEqual(anulaciones.anular_ventas([venta.id], 'Otra vez'), anulaciones.Anulacion(0, 0, 0))
+        self.assertEqual(self._stock(), [20, 20])
+
+    def test_borrar_una_venta_la_anula_y_devuelve_el_stock(self):
+        venta = self._vender()
+        url = reverse('borrar_venta', args=[venta.id])
+        # Sin motivo no se toca nada
+        self.assertContains(self.client.post(url, {'motivo': ' '}), 'Indique el motivo')
+        self.assertEqual(self._stock(), [17, 18])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {'motivo': 'Cobro duplicado', 'responsable': 'Gerente'})
+        self.assertRedirects(response, reverse('ver_ventas'))
+        venta.refresh_from_db()
+        self.assertEqual((venta.anulada, venta.motivo_anulacion), (True, 'Cobro duplicado'))
+        self.assertEqual(DetalleVenta.objects.filter(venta=venta).count(), 2)
+        self.assertEqual(self._stock(), [20, 20])
+        self.assertEqual(
+            dict(Inventario.objects.filter(tipo_movimiento='ENT', responsable='Gerente').values_list('producto_id', 'cantidad')),
+            {self.arroz.id: 3, self.frijol.id: 2},
+        )
+        self.assertEqual(KpiDiario.objects.get(fecha=timezone.localdate()).num_ventas, 0)
+        # Una venta ya anulada no se vuelve a "borrar"
+        self.assertRedirects(self.client.post(url, {'motivo': 'Otra vez'}), reverse('ver_ventas'))
+        self.assertEqual(self._stock(), [20, 20])
+
+    def test_anular_por_filtro_devuelve_el_stock_de_todo_el_lote(self):
+        otro = Empleado.objects.create(nombre_completo='Caro', fecha_contratacion=date(2024, 1, 1))
+        ventas = [
+            _venta_del(timezone.now(), producto, cantidad=cantidad, empleado_vendedor=empleado)
+            for producto, cantidad, empleado in ((self.arroz, 3, self.empleado), (self.arroz, 2, self.empleado), (self.frijol, 4, otro))
+        ]
+        with self.assertRaises(CommandError):
+            call_command('anular_ventas', '--motivo', 'Sin filtro', stdout=StringIO())
+        salida = StringIO()
+        call_command('anular_ventas', '--empleado', str(self.empleado.id), '--motivo', 'Turno de prueba', '--simular', stdout=salida)
+        self.assertEqual(salida.getvalue().strip(), 'Se anularían 2 ventas.')
+        self.assertEqual(self._stock(), [20, 20])
+
+        salida = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('anular_ventas', '--empleado', str(self.empleado.id), '--motivo', 'Turno de prueba', stdout=salida)
+        self.assertIn('2 ventas anuladas; 5 piezas de 1 productos', salida.getvalue())
+        # Un movimiento de entrada por producto, no uno por venta
+        self.assertEqual(list(Inventario.objects.filter(tipo_movimiento='ENT').values_list('producto_id', 'cantidad')), [(self.arroz.id, 5)])
+        self.assertEqual(self._stock(), [25, 20])
+        self.assertEqual([v.anulada for v in Ventas.objects.filter(id__in=[v.id for v in ventas]).order_by('id')], [True, True, False])
+
+
+# =======================================================================
+# --- ESTADÍSTICAS E HISTORIAL DEL CLIENTE ---
+# =======================================================================
+
+class EstadisticasClientesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.arroz = Producto.objects.create(nombre='Arroz', precio_venta=Decimal('10.00'), stock=100)
+        cls.frijol = Producto.objects.create(nombre='Frijol', precio_venta=Decimal('20.00'), stock=100)
+        cls.cliente = Cliente.objects.create(nombre_completo='Ana')
+        ahora = timezone.now()
+        # Dos compras viejas (se archivan) y dos recientes
+        cls.ventas = [
+            _venta_del(ahora - timedelta(days=dias), producto, cantidad=cantidad, precio=producto.precio_venta, cliente=cls.cliente)
+            for dias, producto, cantidad in ((40, cls.frijol, 1), (30, cls.arroz, 2), (3, cls.arroz, 4), (1, cls.frijol, 2))
+        ]
+
+    def _estadisticas(self):
+        stats = EstadisticaCliente.objects.get(cliente=self.cliente)
+        favoritos = [(f.producto_id, f.unidades) for f in estadisticas_clientes.favoritos(self.cliente.id)]
+        return stats.num_compras, stats.gasto_total, stats.primera_compra, stats.ultima_compra, favoritos
+
+    def test_recalcular_con_archivo_coincide_con_el_incremental(self):
+        estadisticas_clientes.aplicar_fotos(despues=fotos_ventas([v.id for v in self.ventas]))
+        incremental = self._estadisticas()
+        self.assertEqual(incremental, (
+            4, Decimal('120.00'), timezone.localdate(self.ventas[0].fecha_venta), timezone.localdate(self.ventas[-1].fecha_venta),
+            [(self.arroz.id, 6), (self.frijol.id, 3)],
+        ))
+
+        self.assertEqual(archivo.archivar_ventas(timezone.now() - timedelta(days=10)), 2)
+        self.assertEqual(estadisticas_clientes.recalcular([self.cliente.id]), 1)
+        self.assertEqual(self._estadisticas(), incremental)
+
+    def test_quitar_la_primera_compra_relee_las_fechas(self):
+        estadisticas_clientes.aplicar_fotos(despues=fotos_ventas([v.id for v in self.ventas]))
+        primera = fotos_ventas([self.ventas[0].id])
+        Ventas.objects.filter(pk=self.ventas[0].pk).update(anulada=True)
+        estadisticas_clientes.aplicar_fotos(antes=primera)
+        num, gasto, desde, hasta, favoritos = self._estadisticas()
+        self.assertEqual((num, gasto), (3, Decimal('100.00')))
+        self.assertEqual(desde, timezone.localdate(self.ventas[1].fecha_venta))
+        self.assertEqual(favoritos, [(self.arroz.id, 6), (self.frijol.id, 2)])
+
+    def test_el_historial_pagina_por_llave_de_las_ventas_activas_a_las_archivadas(self):
+        estadisticas_clientes.recalcular([self.cliente.id])
+        archivo.archivar_ventas(timezone.now() - timedelta(days=10))
+        url = reverse('detalle_cliente', args=[self.cliente.id])
+        vistas, datos = [], {}
+        with mock.patch('app_productos.views.POR_PAGINA_HISTORIAL', 3):
+            while True:
+                response = self.client.get(url, datos)
+                self.assertEqual(response.context['es_primera_pagina'], not datos)
+                vistas.append([v.id for v in response.context['ventas']])
+                if not response.context['siguiente']:
+                    break
+                datos = {'despues': response.context['siguiente']}
+        # La primera página junta las dos activas con la archivada más reciente
+        self.assertEqual(vistas, [[v.id for v in reversed(self.ventas[1:])], [self.ventas[0].id]])
+        self.assertEqual(response.context['estadisticas'].num_compras, 4)
+        self.assertEqual([f.producto_id for f in response.context['favoritos']], [self.arroz.id, self.frijol.id])
+        # Un cursor mal formado vuelve a la primera página
+        self.assertTrue(self.client.get(url, {'despues': 'x'}).context['es_primera_pagina'])
+
+
+# =======================================================================
+# --- PROMOCIONES ---
+# =======================================================================
+
+class PromocionesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.categoria = Categoria.objects.create(nombre='Abarrotes')
+        cls.proveedor = Proveedor.objects.create(nombre_empresa='La Costeña')
+        cls.arroz = Producto.objects.create(nombre='Arroz', precio_venta=Decimal('10.00'), stock=10, categoria=cls.categoria)
+        cls.frijol = Producto.objects.create(nombre='Frijol', precio_venta=Decimal('20.00'), stock=10)
+        cls.frijol.proveedores.add(cls.proveedor)
+
+    def setUp(self):
+        promociones.invalidar()
+
+    def _descuentos(self, *lineas, ahora=None):
+        return [descuento for descuento, _ in promociones.aplicar(list(lineas), ahora=ahora)]
+
+    def test_gana_el_mayor_descuento_sin_acumular(self):
+        Promocion.objects.create(nombre='Abarrotes -10%', porcentaje=Decimal('10'), categoria=self.categoria)
+        mejor = Promocion.objects.create(nombre='Arroz -15%', porcentaje=Decimal('15'), producto=self.arroz)
+        Promocion.objects.create(nombre='Costeña -5%', porcentaje=Decimal('5'), proveedor=self.proveedor)
+
+        (descuento, regla), (frijol, _) = promociones.aplicar([(self.arroz, 1, None), (self.frijol, 1, None)])
+        self.assertEqual((descuento, regla.id), (Decimal('15.00'), mejor.id))
+        self.assertEqual(frijol, Decimal('5.00'))
+        # Un descuento manual mayor se respeta y no se atribuye a ninguna regla
+        self.assertEqual(promociones.aplicar([(self.arroz, 1, Decimal('20'))]), [(Decimal('20'), None)])
+
+    def test_lleva_n_paga_m_segun_la_cantidad(self):
+        Promocion.objects.create(nombre='Frijol 3x2', tipo='NXM', lleva=3, paga=2, producto=self.frijol)
+        # 7 piezas: 2 gratis de 7
+        self.assertEqual(
+            self._descuentos((self.frijol, 2, None), (self.frijol, 3, None), (self.frijol, 7, None)),
+            [Decimal('0.00'), Decimal('33.33'), Decimal('28.57')],
+        )
+
+    def test_vigencia_y_franja_horaria(self):
+        Promocion.objects.create(
+            nombre='Hora feliz', porcentaje=Decimal('10'), producto=self.arroz,
+            hora_inicio=time(18, 0), hora_fin=time(20, 0),
+        )
+        Promocion.objects.create(
+            nombre='Vencida', porcentaje=Decimal('50'), producto=self.arroz,
+            vigente_hasta=timezone.now() - timedelta(days=1),
+        )
+        dia = timezone.localdate()
+        a_las = lambda hora: timezone.make_aware(datetime.combine(dia, time(hora, 30)))
+        self.assertEqual(self._descuentos((self.arroz, 1, None), ahora=a_las(19)), [Decimal('10')])
+        self.assertEqual(self._descuentos((self.arroz, 1, None), ahora=a_las(21)), [Decimal('0.00')])
+
+    def test_el_indice_se_recompila_al_cambiar_las_reglas(self):
+        self.assertEqual(self._descuentos((self.arroz, 1, None)), [Decimal('0.00')])
+        promocion = Promocion.objects.create(nombre='Arroz -10%', porcentaje=Decimal('10'), producto=self.arroz)
+        self.assertEqual(self._descuentos((self.arroz, 1, None)), [Decimal('10')])
+        promocion.activa = False
+        promocion.save()
+        self.assertEqual(self._descuentos((self.arroz, 1, None)), [Decimal('0.00')])
+
+
+# =======================================================================
+# --- ACTUALIZACIÓN MASIVA DE PRECIOS ---
+# =======================================================================
+
+class PreciosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.categoria = Categoria.objects.create(nombre='Lácteos')
+        cls.leche = Producto.objects.create(nombre='Leche', precio_venta=Decimal('10.00'), stock=5, categoria=cls.categoria)
+        cls.queso = Producto.objects.create(nombre='Queso', precio_venta=Decimal('13.30'), stock=5, categoria=cls.categoria)
+        cls.pan = Producto.objects.create(nombre='Pan', precio_venta=Decimal('10.00'), stock=5)
+
+    def _precios(self):
+        return dict(Producto.objects.values_list('nombre', 'precio_venta'))
+
+    def test_aplica_porcentaje_y_redondeo_solo_a_la_categoria(self):
+        muestra, total = precios.previsualizar(
+            precios.productos_afectados(categoria_id=self.categoria.id), Decimal('10'), Decimal('0.50'),
+        )
+        self.assertEqual(total, 2)
+        previstos = {p.nombre: nuevo for p, nuevo in muestra}
+        seq = CambioProducto.objects.order_by('-id').values_list('id', flat=True).first()
+
+        lote = precios.aplicar(categoria_id=self.categoria.id, porcentaje='10', redondeo='0.50', responsable='Ana')
+        # 13.30 + 10% = 14.63 -> múltiplo de 0.50 más cercano
+        self.assertEqual(self._precios(), {'Leche': Decimal('11.00'), 'Queso': Decimal('14.50'), 'Pan': Decimal('10.00')})
+        # La vista previa en Python coincide con el UPDATE en SQL
+        self.assertEqual(previstos, {'Leche': Decimal('11.00'), 'Queso': Decimal('14.50')})
+        self.assertEqual(lote.num_productos, 2)
+        self.assertEqual(lote.precios, {self.leche.id: ['10.00', '11.00'], self.queso.id: ['13.30', '14.50']})
+        self.assertEqual(
+            sorted(CambioProducto.objects.filter(id__gt=seq).values_list('producto_id', 'precio_venta')),
+            [(self.leche.id, Decimal('11.00')), (self.queso.id, Decimal('14.50'))],
+        )
+
+    def test_aplica_por_proveedor_con_una_subconsulta(self):
+        proveedor = Proveedor.objects.create(nombre_empresa='Lala')
+        self.leche.proveedores.add(proveedor)
+        self.pan.proveedores.add(proveedor)
+        with mock.patch.object(CambioProducto, 'MAX_IDS_POR_CONSULTA', 1):
+            lote = precios.aplicar(proveedor_id=proveedor.id, porcentaje='-10')
+        self.assertEqual(self._precios(), {'Leche': Decimal('9.00'), 'Queso': Decimal('13.30'), 'Pan': Decimal('9.00')})
+        self.assertEqual(lote.num_productos, 2)
+        self.assertEqual(CambioProducto.objects.filter(precio_venta=Decimal('9.00')).count(), 2)
+
+    def test_el_catalogo_de_la_caja_solo_se_invalida_con_cambios_de_precio(self):
+        cache.clear()
+        catalogo = lambda: {p['id']: p['precio_venta'] for p in json.loads(
+            self.client.get(reverse('agregar_venta')).context['productos_json']
+        )}
+        version = version_precios()
+        self.assertEqual(catalogo()[self.leche.id], '10.00')
+
+        # Una venta solo cambia el stock: el JSON cacheado sigue vigente
+        with self.captureOnCommitCallbacks(execute=True):
+            self.leche.stock -= 1
+            self.leche.save()
+        self.assertEqual(version_precios(), version)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            precios.aplicar(categoria_id=self.categoria.id, porcentaje='10')
+        self.assertNotEqual(version_precios(), version)
+        self.assertEqual(catalogo()[self.leche.id], '11.00')
+
+        version = version_precios()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pan.precio_venta = '12.00'
+            self.pan.save()
+        self.assertNotEqual(version_precios(), version)
+        self.assertEqual(catalogo()[self.pan.id], '12.00')
+
+    def test_reglas_invalidas_no_cambian_precios(self):
+        with self.assertRaises(ValueError):
+            precios.aplicar(categoria_id=self.categoria.id, porcentaje='0')
+        with self.assertRaises(ValueError):
+            precios.aplicar(categoria_id=self.categoria.id, porcentaje='-100')
+        with self.assertRaises(ValueError):
+            precios.aplicar(porcentaje='5')
+        self.assertFalse(CambioPrecioLote.objects.exists())
+        self.assertEqual(set(self._precios().values()), {Decimal('10.00'), Decimal('13.30')})
+
+
+# =======================================================================
+# --- FEED DE CAMBIOS DEL CATÁLOGO ---
+# =======================================================================
+
+class CambiosProductoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.producto = Producto.objects.create(nombre='Arroz', precio_venta=Decimal('10.00'), stock=5)
+
+    def _cambios(self, desde):
+        return self.client.get(reverse('api_cambios_productos'), {'desde': desde}).json()
+
+    def test_solo_devuelve_los_cambios_posteriores_a_la_secuencia(self):
+        desde = self._cambios(0)['ultimo_seq']
+        producto_id = self.producto.id
+        self.producto.precio_venta = Decimal('12.00')
+        self.producto.save()
+        self.producto.delete()
+
+        datos = self._cambios(desde)
+        self.assertEqual(
+            [(c['producto_id'], c['precio_venta'], c['eliminado']) for c in datos['cambios']],
+            [(producto_id, '12.00', False), (producto_id, None, True)],
+        )
+        self.assertEqual(datos['ultimo_seq'], datos['cambios'][-1]['seq'])
+        self.assertEqual(
+            self._cambios(datos['ultimo_seq']), {'cambios': [], 'ultimo_seq': datos['ultimo_seq'], 'reintentar_en': 3000},
+        )
+        self.assertEqual(self.client.get(reverse('api_cambios_productos'), {'desde': 'x'}).status_code, 400)
+
+    def test_sse_responde_de_inmediato_y_reconecta_desde_el_ultimo_id(self):
+        desde = self._cambios(0)['ultimo_seq']
+        self.producto.precio_venta = Decimal('12.00')
+        self.producto.save()
+        seq = CambioProducto.objects.latest('id').id
+
+        response = self.client.get(reverse('api_cambios_productos'), {'desde': desde}, HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        cuerpo = response.content.decode()
+        self.assertTrue(cuerpo.startswith('retry: 3000\n\n'))
+        self.assertIn(f'id: {seq}\nevent: cambio\n', cuerpo)
+
+        # La reconexión de EventSource manda Last-Event-ID: sin cambios nuevos solo lleva el `retry`
+        response = self.client.get(
+            reverse('api_cambios_productos'), {'desde': desde}, HTTP_ACCEPT='text/event-stream', HTTP_LAST_EVENT_ID=str(seq),
+        )
+        self.assertEqual(response.content.decode(), 'retry: 3000\n\n')
+
+        # Con más cambios pendientes que el máximo por respuesta, se vuelve a consultar casi de inmediato
+        with mock.patch('app_productos.views.MAX_CAMBIOS_POR_RESPUESTA', 1):
+            self.assertEqual(self._cambios(0)['reintentar_en'], 100)
+
+
+# =======================================================================
+# --- SUGERENCIAS DE REORDEN ---
+# =======================================================================
+
+@skipUnless(find_spec('numpy'), 'calcular_reorden requiere NumPy')
+class ReordenTests(TestCase):
+    def test_sugiere_reordenar_segun_la_velocidad_mas_alta(self):
+        proveedor = Proveedor.objects.create(nombre_empresa='Granos del Norte')
+        arroz = Producto.objects.create(nombre='Arroz', precio_venta=Decimal('10.00'), stock=5)
+        arroz.proveedores.add(proveedor)
+        surtido = Producto.objects.create(nombre='Frijol', precio_venta=Decimal('10.00'), stock=1000)
+        hace_dos_dias = timezone.now() - timedelta(days=2)
+        _venta_del(hace_dos_dias, arroz, cantidad=14)
+        _venta_del(hace_dos_dias, surtido, cantidad=14)
+        # Una venta anulada no cuenta en la velocidad
+        _venta_del(hace_dos_dias, arroz, cantidad=100, anulada=True)
+
+        call_command('calcular_reorden', '--ventanas', '7,30', '--dias-objetivo', '14', '--dias-entrega', '3', stdout=StringIO())
+        # 14 piezas en 7 días = 2/día; cubrir 17 días pide 34 - 5 en stock
+        sugerencia = SugerenciaReorden.objects.get()
+        self.assertEqual(
+            (sugerencia.producto_id, sugerencia.proveedor_id, sugerencia.velocidad_diaria,
+             sugerencia.dias_cobertura, sugerencia.cantidad_sugerida),
+            (arroz.id, proveedor.id, Decimal('2.000'), Decimal('2.5'), 29),
+        )
+
+
+# =======================================================================
+# --- INSTANTÁNEA DE ANÁLISIS (NUMPY) ---
+# =======================================================================
+
+@skipUnless(find_spec('numpy'), 'exportar_analitica requiere NumPy')
+class AnaliticaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        granos = Categoria.objects.create(nombre='Granos')
+        arroz = Producto.objects.create(nombre='Arroz', precio_venta=Decimal('10.00'), stock=100, categoria=granos)
+        frijol = Producto.objects.create(nombre='Frijol', precio_venta=Decimal('20.00'), stock=100)
+        ahora = timezone.now()
+        cls.vieja = _venta_del(ahora - timedelta(days=40), arroz, cantidad=2, metodo_pago='EFE')
+        cls.recientes = [
+            _venta_del(ahora - timedelta(hours=2), frijol, cantidad=3, precio=Decimal('20.00'), metodo_pago='TAR'),
+            _venta_del(ahora, arroz, cantidad=1, metodo_pago='EFE'),
+        ]
+        # Una venta anulada no se exporta
+        _venta_del(ahora, arroz, cantidad=100, anulada=True)
+        archivo.archivar_ventas(ahora - timedelta(days=10))
+
+    def setUp(self):
+        directorio = TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.ruta = Path(directorio.name) / 'analitica'
+        # Sin snapshot de reportes: se lee la base activa
+        parche = mock.patch.object(reportes_db, 'fecha_snapshot', return_value=None)
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def _exportar(self, *opciones):
+        salida = StringIO()
+        call_command('exportar_analitica', '--salida', str(self.ruta), *opciones, stdout=salida)
+        return salida.getvalue()
+
+    def test_exporta_por_lotes_y_carga_con_memoria_mapeada(self):
+        from . import analitica
+
+        salida = self._exportar('--lote', '1')
+        self.assertIn('líneas: 3 / 3', salida)
+        self.assertIn('3 líneas exportadas', salida)
+
+        instantanea = analitica.cargar(self.ruta)
+        self.assertEqual(len(instantanea), 3)
+        self.assertIsInstance(instantanea['cantidad'], analitica.np.memmap)
+        # Las activas primero, luego las archivadas
+        self.assertEqual(instantanea['venta_id'].tolist(), [v.id for v in self.recientes] + [self.vieja.id])
+        self.assertEqual(instantanea['archivada'].tolist(), [False, False, True])
+        self.assertEqual(list(instantanea.etiquetas('producto', instantanea['producto'])), ['Frijol', 'Arroz', 'Arroz'])
+        self.assertEqual(instantanea['subtotal_centavos'].tolist(), [6000, 1000, 2000])
+        self.assertEqual(
+            instantanea['fecha'][0].item(),
+            self.recientes[0].fecha_venta.astimezone(dt_timezone.utc).replace(tzinfo=None, microsecond=0),
+        )
+        self.assertEqual(
+            instantanea.sumar_por('categoria', 'subtotal_centavos'), {'Granos': 3000.0, 'Sin categoría': 6000.0},
+        )
+        self.assertEqual(
+            instantanea.sumar_por('metodo_pago', mascara=~instantanea['archivada']),
+            {'Efectivo': 1.0, 'Tarjeta de Crédito/Débito': 1.0, 'Transferencia Bancaria': 0.0, 'Otro': 0.0},
+        )
+
+    def test_reexportar_reemplaza_la_instantanea_completa(self):
+        from . import analitica
+
+        self._exportar()
+        anterior = analitica.cargar(self.ruta)
+        self._exportar('--sin-archivo')
+        self.assertEqual(len(analitica.cargar(self.ruta)), 2)
+        # Quien ya la tenía abierta sigue leyendo la versión anterior completa
+        self.assertEqual(anterior['cantidad'].tolist(), [3, 1, 2])
+        self.assertEqual(sorted(p.name for p in self.ruta.parent.iterdir()), ['analitica'])
+
+        with self.assertRaises(CommandError):
+            self._exportar('--lote', '0')
+        meta = self.ruta / 'meta.json'
+        meta.write_text(meta.read_text().replace(f'"version": {analitica.VERSION}', '"version": 0'))
+        with self.assertRaises(ValueError):
+            analitica.cargar(self.ruta)
+
+
+# =======================================================================
+# --- MIGRACIÓN DE NOMBRES LEGADOS ---
+# =======================================================================
+
+class MigrarNombresLegadosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.jose = Cliente.objects.create(nombre_completo='José Pérez')
+        cls.ventas = Ventas.objects.bulk_create([
+            Ventas(nombre_cliente='  jose   PEREZ ', vendedor='Ana'),
+            Ventas(nombre_cliente='Público General', vendedor='ana'),
+            Ventas(nombre_cliente='María', vendedor='Sistema'),
+        ])
+
+    def _enlaces(self):
+        return list(Ventas.objects.order_by('id').values_list('cliente__nombre_completo', 'empleado_vendedor__nombre_completo'))
+
+    def test_enlaza_por_nombre_normalizado_y_crea_los_faltantes_inactivos(self):
+        call_command('migrar_nombres_legados', '--lote', '2', stdout=StringIO())
+        self.assertEqual(self._enlaces(), [('José Pérez', 'Ana'), (None, 'Ana'), ('María', None)])
+        self.assertFalse(Cliente.objects.get(nombre_completo='María').activo)
+        self.assertFalse(Empleado.objects.get().activo)
+        self.assertEqual(EstadisticaCliente.objects.get(cliente=self.jose).num_compras, 1)
+
+        # Volver a ejecutarlo no crea duplicados
+        call_command('migrar_nombres_legados', stdout=StringIO())
+        self.assertEqual((Cliente.objects.count(), Empleado.objects.count()), (2, 1))
+
+    def test_la_simulacion_no_guarda_cambios(self):
+        call_command('migrar_nombres_legados', '--simular', stdout=StringIO())
+        self.assertEqual(self._enlaces(), [(None, None)] * 3)
+        self.assertEqual((Cliente.objects.count(), Empleado.objects.count()), (1, 0))
+
+
+# =======================================================================
+# --- PERFILADO DE VISTAS ---
+# =======================================================================
+
+class PerfiladoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('gerente', password='x', is_staff=True)
+        cls.cajero = User.objects.create_user('cajero', password='x')
+
+    def setUp(self):
+        directorio = TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(
+            PERFILADO_DIR=Path(directorio.name), PERFILADO_VISTAS=[], PERFILADO_TASA=1.0,
+            PERFILADO_INTERVALO_MS=1, PERFILADO_MAX_CAPTURAS=2,
+        )
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def _peticion(self, ruta, usuario=None, **extra):
+        request = RequestFactory().get(ruta, **extra)
+        if usuario is not None:
+            request.user = usuario
+        return request
+
+    def test_motivo_por_usuario_staff_o_por_configuracion(self):
+        ventas = reverse('ver_ventas')
+        # Sin pedir el perfil no se lee `request.user` (no hay usuario en la petición)
+        self.assertIsNone(perfilado.motivo(self._peticion(ventas)))
+        self.assertIsNone(perfilado.motivo(self._peticion(ventas, self.cajero, data={'perfilar': '1'})))
+        self.assertEqual(perfilado.motivo(self._peticion(ventas, self.staff, data={'perfilar': '1'})), 'staff')
+        self.assertEqual(perfilado.motivo(self._peticion(ventas, self.staff, HTTP_X_PERFILAR='1')), 'staff')
+
+        with self.settings(PERFILADO_VISTAS=['ver_ventas']):
+            self.assertEqual(perfilado.motivo(self._peticion(ventas)), 'configuracion')
+            self.assertIsNone(perfilado.motivo(self._peticion(reverse('ver_clientes'))))
+        with self.settings(PERFILADO_VISTAS=[ventas + '*']):
+            self.assertEqual(perfilado.motivo(self._peticion(ventas)), 'configuracion')
+        with self.settings(PERFILADO_VISTAS=['ver_ventas'], PERFILADO_TASA=0.0):
+            self.assertIsNone(perfilado.motivo(self._peticion(ventas)))
+
+    def test_captura_pilas_y_sql_y_se_consulta_desde_el_navegador(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('ver_ventas'), HTTP_X_PERFILAR='1')
+        nombre = response['X-Perfil']
+        meta = json.loads(perfilado.archivo_de(nombre, 'meta').read_text())
+        self.assertEqual((meta['vista'], meta['motivo'], meta['estado']), ('ver_ventas', 'staff', 200))
+        consultas = json.loads(perfilado.archivo_de(nombre, 'sql').read_text())
+        self.assertEqual(meta['num_consultas'], len(consultas))
+        self.assertTrue(any('app_productos_ventas' in c['sql'] for c in consultas))
+        # Una petición sin perfil no deja captura
+        self.assertNotIn('X-Perfil', self.client.get(reverse('ver_ventas')))
+
+        self.assertEqual([c['nombre'] for c in self.client.get(reverse('ver_perfiles')).context['capturas']], [nombre])
+        self.assertEqual(self.client.get(reverse('detalle_perfil', args=[nombre])).context['meta'], meta)
+        descarga = self.client.get(reverse('descargar_perfil', args=[nombre, 'folded']))
+        self.assertIn('attachment', descarga['Content-Disposition'])
+        self.assertEqual(b''.join(descarga.streaming_content).decode(), perfilado.archivo_de(nombre, 'folded').read_text())
+        # Nombres que no son de una captura, formatos desconocidos y usuarios sin staff
+        self.assertIsNone(perfilado.archivo_de('../settings', 'meta'))
+        self.assertEqual(self.client.get(reverse('descargar_perfil', args=[nombre, 'meta'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('detalle_perfil', args=['no-existe'])).status_code, 404)
+        self.client.force_login(self.cajero)
+        self.assertEqual(self.client.get(reverse('ver_perfiles')).status_code, 302)
+
+    def test_el_bufer_conserva_las_capturas_mas_recientes(self):
+        self.client.force_login(self.staff)
+        nombres = [self.client.get(reverse('ver_ventas'), {'perfilar': '1'})['X-Perfil'] for _ in range(3)]
+        self.assertEqual([c['nombre'] for c in perfilado.capturas()], nombres[:0:-1])
+        self.assertIsNone(perfilado.archivo_de(nombres[0], 'folded'))
+        self.assertEqual(len(list(settings.PERFILADO_DIR.iterdir())), 6)
+
+
+# =======================================================================
+# --- BASE DE REPORTES (SNAPSHOT) ---
+# =======================================================================
+
+class ReportesDbTests(TestCase):
+    def test_las_lecturas_van_al_snapshot_solo_en_modo_reporte(self):
+        enrutador = reportes_db.ReportesRouter()
+        hace_un_minuto = timezone.now() - timedelta(minutes=1)
+        with mock.patch.object(reportes_db, 'fecha_snapshot', return_value=hace_un_minuto):
+            self.assertIsNone(enrutador.db_for_read(Ventas))
+            with reportes_db.lectura_de_reportes() as fecha:
+                self.assertEqual(fecha, hace_un_minuto)
+                self.assertEqual(enrutador.db_for_read(Ventas), reportes_db.ALIAS_REPORTES)
+                self.assertEqual(enrutador.db_for_write(Ventas), 'default')
+                with reportes_db.lectura_de_default():
+                    self.assertIsNone(enrutador.db_for_read(Ventas))
+                self.assertEqual(reportes_db.snapshot_en_uso(), hace_un_minuto)
+            self.assertIsNone(enrutador.db_for_read(Ventas))
+        # Sin snapshot todo se lee de `default`, aun en modo reporte
+        with mock.patch.object(reportes_db, 'fecha_snapshot', return_value=None), reportes_db.lectura_de_reportes():
+            self.assertIsNone(enrutador.db_for_read(Ventas))
+        self.assertFalse(enrutador.allow_migrate(reportes_db.ALIAS_REPORTES, 'app_productos'))
+
+    def test_la_vista_de_reporte_anuncia_la_antiguedad_del_snapshot(self):
+        @reportes_db.vista_de_reporte(solo_si=lambda request: request.GET.get('historico') == '1')
+        def vista(request):
+            return HttpResponse(str(reportes_db.snapshot_en_uso()))
+
+        hace_diez_minutos = timezone.now() - timedelta(minutes=10)
+        peticion = RequestFactory()
+        with mock.patch.object(reportes_db, 'fecha_snapshot', return_value=hace_diez_minutos):
+            response = vista(peticion.get('/', {'historico': '1'}))
+            self.assertEqual(response['X-Snapshot-Fecha'], hace_diez_minutos.isoformat())
+            self.assertEqual(int(response['X-Snapshot-Antiguedad']) // 60, 10)
+            # Fuera del criterio la vista lee de `default` y no anuncia snapshot
+            response = vista(peticion.get('/'))
+            self.assertEqual(response.content, b'None')
+            self.assertNotIn('X-Snapshot-Fecha', response)
+
+    def test_refrescar_reportes_copia_la_base_y_fecha_el_snapshot(self):
+        with TemporaryDirectory() as carpeta:
+            origen, destino = Path(carpeta) / 'principal.sqlite3', Path(carpeta) / 'reportes.sqlite3'
+            with closing(sqlite3.connect(origen)) as conexion, conexion:
+                conexion.execute('CREATE TABLE ventas (id INTEGER PRIMARY KEY)')
+                conexion.executemany('INSERT INTO ventas VALUES (?)', [(i,) for i in range(1, 51)])
+            bases = {
+                'default': dict(settings.DATABASES['default'], NAME=origen),
+                'reporting': dict(settings.DATABASES['reporting'], NAME=destino),
+            }
+            inicio = timezone.now()
+            with mock.patch.object(settings, 'DATABASES', bases):
+                call_command('refrescar_reportes', '--paginas', '1', stdout=StringIO())
+                with closing(sqlite3.connect(destino)) as conexion:
+                    self.assertEqual(conexion.execute('SELECT COUNT(*) FROM ventas').fetchone(), (50,))
+                fecha = reportes_db.fecha_snapshot()
+                self.assertLessEqual(abs((fecha - inicio).total_seconds()), 1)
+
+                # Un snapshot reciente no se vuelve a copiar
+                salida = StringIO()
+                call_command('refrescar_reportes', '--si-mas-antiguo-que', '600', stdout=salida)
+                self.assertIn('no se refresca', salida.getvalue())
+                self.assertEqual(reportes_db.fecha_snapshot(), fecha)
+
+
+# =======================================================================
+# --- SETTINGS DE PRODUCCIÓN ---
+# =======================================================================
+
+class SettingsProduccionTests(TestCase):
+    MODULO = 'backend_abarrotes.settings_produccion'
+
+    def _cargar(self, **entorno):
+        """Importa el módulo de settings de producción desde cero con el entorno dado."""
+        sys.modules.pop(self.MODULO, None)
+        self.addCleanup(sys.modules.pop, self.MODULO, None)
+        with mock.patch.dict(os.environ, entorno):
+            for variable in ('SECRET_KEY', 'ALLOWED_HOSTS', 'CONN_MAX_AGE'):
+                if variable not in entorno:
+                    os.environ.pop(variable, None)
+            return import_module(self.MODULO)
+
+    def test_sin_secret_key_no_arranca(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self._cargar()
+
+    def test_conexiones_persistentes_salvo_el_snapshot_de_reportes(self):
+        produccion = self._cargar(SECRET_KEY='x' * 50, ALLOWED_HOSTS='caja.local, 10.0.0.5,', CONN_MAX_AGE='120')
+        self.assertFalse(produccion.DEBUG)
+        self.assertEqual(produccion.ALLOWED_HOSTS, ['caja.local', '10.0.0.5'])
+
+        default, reporting = produccion.DATABASES['default'], produccion.DATABASES['reporting']
+        self.assertEqual((default['CONN_MAX_AGE'], default['CONN_HEALTH_CHECKS']), (120, True))
+        self.assertEqual(default['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+        self.assertIn('journal_mode=WAL', default['OPTIONS']['init_command'])
+        # `refrescar_reportes` reemplaza el archivo: cada petición abre una conexión nueva
+        self.assertEqual(reporting['CONN_MAX_AGE'], 0)
+        self.assertNotIn('transaction_mode', reporting.get('OPTIONS', {}))
+
+        # Los settings de desarrollo no se modifican
+        self.assertEqual(import_module('backend_abarrotes.settings').DATABASES['default']['CONN_MAX_AGE'], 0)
+        self.assertEqual(self._cargar(SECRET_KEY='x' * 50).DATABASES['default']['CONN_MAX_AGE'], 600)
+
+
+# =======================================================================
+# --- PRUEBA DE CARGA ---
+# =======================================================================
+
+class PruebaCargaOpcionesTests(TestCase):
+    def test_opciones_invalidas_y_catalogo_vacio(self):
+        with self.assertRaisesMessage(CommandError, '--mezcla'):
+            call_command('prueba_carga', '--mezcla', 'venta=x', stdout=StringIO())
+        with self.assertRaisesMessage(CommandError, '--mezcla'):
+            call_command('prueba_carga', '--mezcla', 'devolucion=5', stdout=StringIO())
+        with self.assertRaisesMessage(CommandError, 'No hay productos con stock'):
+            call_command('prueba_carga', '--duracion', '1', stdout=StringIO())
+
+
+@override_settings(TAREAS_MODO='inmediato')
+class PruebaCargaTests(LiveServerTestCase):
+    def test_cajeros_contra_el_servidor_y_stock_consistente(self):
+        Producto.objects.bulk_create([
+            Producto(nombre=f'Producto {i}', precio_venta=Decimal('10.00'), stock=500) for i in range(5)
+        ])
+        salida = StringIO()
+        call_command(
+            'prueba_carga', '--url', self.live_server_url, '--cajeros', '1', '--operaciones', '12',
+            '--duracion', '60', '--mezcla', 'venta=3,movimiento=1,lista=1', stdout=salida, stderr=StringIO(),
+        )
+        self.assertIn('12 operaciones', salida.getvalue())
+        self.assertIn('Stock consistente con los movimientos registrados.', salida.getvalue())
+        self.assertTrue(Ventas.objects.exists())
+        self.assertEqual(
+            Inventario.objects.filter(tipo_movimiento='SAL').count(), DetalleVenta.objects.count(),
+        )
@@ -0,0 +1,191 @@
+"""
+Sucursales: una base SQLite por tienda y reportes consolidados entre tiendas.
+
+Cada sucursal corre su propia copia de la aplicación con TIENDA=<codigo>; sus ventas, movimientos
+y stock viven en su `default`, así que un cobro en una tienda nunca bloquea la base de otra.
+Un proceso con TIENDAS=a,b,c (oficina central) abre cada sucursal como el alias `tienda_<codigo>`:
+
+    with en_tienda('norte'):
+        Ventas.objects.count()          # se lee de la base de la tienda norte
+
+`en_todas` ejecuta una función en todas las sucursales en paralelo (un hilo y una conexión por
+tienda) y `reporte_consolidado` la usa para sumar ventas y productos de todas las tiendas.
+"""
+import contextvars
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count, Sum
+
+from . import archivo
+from .kpis import UMBRAL_STOCK_BAJO
+
+MAX_HILOS = 8
+TOP_PRODUCTOS = 10
+
+_tienda_activa = contextvars.ContextVar('tienda_activa', default=None)
+_ids_por_tienda = {}
+
+
+def alias_de(codigo):
+    """
+    Alias de base de datos de una sucursal; la de este proceso es `default`. Un código que no está en
+    TIENDAS es un error: con un código mal escrito los datos irían a parar a la base de esta tienda.
+    """
+    if not codigo or codigo == settings.TIENDA:
+        return 'default'
+    alias = f'tienda_{codigo}'
+    if alias not in settings.DATABASES:
+        raise LookupError(f'Sucursal no configurada: {codigo!r} (agregarla a TIENDAS).')
+    return alias
+
+
+def tienda_actual():
+    """Código de la sucursal en contexto (`en_tienda`) o, si no hay, la de este proceso."""
+    return _tienda_activa.get() or settings.TIENDA
+
+
+def tienda_actual_id():
+    """
+    Id de `Tienda` de la sucursal actual en su propia base. Se memoriza por proceso solo si existe:
+    mientras `sincronizar_tiendas` no cree el registro, se vuelve a buscar.
+    """
+    codigo = tienda_actual()
+    if not codigo:
+        return None
+    alias = alias_de(codigo)
+    if (alias, codigo) not in _ids_por_tienda:
+        from .models import Tienda
+        tienda_id = Tienda.objects.using(alias).filter(codigo=codigo).values_list('id', flat=True).first()
+        if tienda_id is None:
+            return None
+        _ids_por_tienda[(alias, codigo)] = tienda_id
+    return _ids_por_tienda[(alias, codigo)]
+
+
+def tiendas_visibles():
+    """Sucursales configuradas en TIENDAS; sin configuración, solo la de este proceso (None = sin nombre)."""
+    return list(settings.TIENDAS) or [settings.TIENDA]
+
+
+@contextmanager
+def en_tienda(codigo):
+    """Dentro del bloque, todas las lecturas y escrituras ORM van a la base de la sucursal `codigo`."""
+    alias = alias_de(codigo)
+    token = _tienda_activa.set(codigo)
+    try:
+        yield alias
+    finally:
+        _tienda_activa.reset(token)
+
+
+class TiendasRouter:
+    """Envía todo a la base de la sucursal activa en `en_tienda`; fuera de él decide el siguiente router."""
+
+    def _alias(self):
+        codigo = _tienda_activa.get()
+        alias = alias_de(codigo) if codigo else 'default'
+        # La sucursal propia sigue las reglas normales (p. ej. el snapshot de reportes)
+        return None if alias == 'default' else alias
+
+    def db_for_read(self, model, **hints):
+        return self._alias()
+
+    def db_for_write(self, model, **hints):
+        return self._alias()
+
+
+def en_todas(funcion, tiendas=None):
+    """{codigo: funcion(codigo)} ejecutando en paralelo, cada sucursal en su propio hilo y conexión."""
+    codigos = list(tiendas) if tiendas is not None else tiendas_visibles()
+
+    def ejecutar(codigo):
+        with en_tienda(codigo):
+            return funcion(codigo)
+
+    def ejecutar_en_hilo(codigo):
+        try:
+            return ejecutar(codigo)
+        finally:
+            # Las conexiones son por hilo: cerrar las que abrió este hilo del pool
+            connections.close_all()
+
+    if len(codigos) <= 1:
+        return {codigo: ejecutar(codigo) for codigo in codigos}
+    with ThreadPoolExecutor(max_workers=min(MAX_HILOS, len(codigos)), thread_name_prefix='tiendas') as pool:
+        # Cada hilo recibe una copia del contexto (p. ej. el modo de lectura de reportes)
+        futuros = {codigo: pool.submit(contextvars.copy_context().run, ejecutar_en_hilo, codigo) for codigo in codigos}
+        return {codigo: futuro.result() for codigo, futuro in futuros.items()}
+
+
+def resumen_tienda(desde, hasta):
+    """Totales de ventas del rango [desde, hasta) en la base activa, incluido su archivo si aplica."""
+    from .models import DetalleVenta, DetalleVentaArchivada, Producto, Tienda, VentaArchivada, Ventas
+
+    fuentes = [(Ventas, DetalleVenta)]
+    if archivo.necesita_archivo(archivo.TABLA_VENTAS, desde):
+        fuentes.append((VentaArchivada, DetalleVentaArchivada))
+
+    resumen = {'num_ventas': 0, 'ingresos': Decimal('0.00'), 'unidades': 0, 'productos': {}}
+    for modelo_venta, modelo_detalle in fuentes:
+        totales = modelo_venta.objects.filter(fecha_venta__gte=desde, fecha_venta__lt=hasta, anulada=False).aggregate(
+            num=Count('id'), ingresos=Sum('monto_total')
+        )
+        resumen['num_ventas'] += totales['num']
+        resumen['ingresos'] += (totales['ingresos'] or Decimal('0')).quantize(Decimal('0.01'))
+        # Los ids de producto pueden diferir entre tiendas: se consolidan por código de barras o nombre
+        for fila in modelo_detalle.objects.filter(
+            venta__fecha_venta__gte=desde, venta__fecha_venta__lt=hasta, venta__anulada=False
+        ).values('producto__codigo_barras', 'producto__nombre').annotate(
+            unidades=Sum('cantidad_vendida'), ingresos=Sum('subtotal')
+        ).order_by():
+            clave = fila['producto__codigo_barras'] or fila['producto__nombre']
+            actual = resumen['productos'].setdefault(clave, [fila['producto__nombre'], 0, Decimal('0.00')])
+            actual[1] += fila['unidades'] or 0
+            actual[2] += fila['ingresos'] or Decimal('0')
+            resumen['unidades'] += fila['unidades'] or 0
+
+    resumen['bajo_stock'] = Producto.objects.filter(stock__lte=UMBRAL_STOCK_BAJO).count()
+    codigo = tienda_actual()
+    resumen['nombre'] = (
+        Tienda.objects.filter(codigo=codigo).values_list('nombre', flat=True).first() or codigo
+        if codigo else 'Esta tienda'
+    )
+    return resumen
+
+
+def reporte_consolidado(desde, hasta, tiendas=None):
+    """Resumen por sucursal (en paralelo) más el total y el top de productos de todas las tiendas."""
+    por_tienda = en_todas(lambda codigo: resumen_tienda(desde, hasta), tiendas)
+
+    filas, productos = [], defaultdict(lambda: [None, 0, Decimal('0.00')])
+    total = {'nombre': 'Total', 'num_ventas': 0, 'ingresos': Decimal('0.00'), 'unidades': 0, 'bajo_stock': 0}
+    for codigo, resumen in por_tienda.items():
+        fila = {campo: resumen[campo] for campo in ('nombre', 'num_ventas', 'ingresos', 'unidades', 'bajo_stock')}
+        fila['codigo'] = codigo
+        filas.append(fila)
+        for campo in ('num_ventas', 'ingresos', 'unidades', 'bajo_stock'):
+            total[campo] += resumen[campo]
+        for clave, (nombre, unidades, ingresos) in resumen['productos'].items():
+            producto = productos[clave]
+            producto[0] = producto[0] or nombre
+            producto[1] += unidades
+            producto[2] += ingresos
+
+    for fila in filas + [total]:
+        fila['ticket_promedio'] = (
+            (fila['ingresos'] / fila['num_ventas']).quantize(Decimal('0.01')) if fila['num_ventas'] else Decimal('0.00')
+        )
+        fila['participacion'] = (
+            (fila['ingresos'] * 100 / total['ingresos']).quantize(Decimal('0.1')) if total['ingresos'] else Decimal('0.0')
+        )
+    top = sorted(productos.values(), key=lambda p: -p[1])[:TOP_PRODUCTOS]
+    return {
+        'tiendas': sorted(filas, key=lambda f: -f['ingresos']),
+        'total': total,
+        'top_productos': [{'nombre': n, 'unidades': u, 'ingresos': i.quantize(Decimal('0.01'))} for n, u, i in top],
+    }
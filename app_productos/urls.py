@@ -10,6 +10,10 @@ urlpatterns = [
     path('productos/agregar/', views.agregar_producto, name='agregar_producto'),
     path('productos/<int:producto_id>/editar/', views.actualizar_producto, name='actualizar_producto'),
     path('productos/<int:producto_id>/borrar/', views.borrar_producto, name='borrar_producto'),
+    path('productos/reorden/', views.ver_reorden, name='ver_reorden'),
+    path('productos/ranking/', views.ver_ranking, name='ver_ranking'),
+    path('api/productos/ranking/', views.api_ranking, name='api_ranking'),
+    path('productos/precios/', views.actualizar_precios_masivo, name='actualizar_precios_masivo'),
 
     # --- RUTAS DE CATEGORIAS ---
     path('categorias/', views.ver_categorias, name='ver_categorias'),
@@ -28,22 +32,51 @@ urlpatterns = [
     path('ventas/agregar/', views.agregar_venta, name='agregar_venta'),
     path('ventas/<int:venta_id>/editar/', views.actualizar_venta, name='actualizar_venta'),
     path('ventas/<int:venta_id>/borrar/', views.borrar_venta, name='borrar_venta'),
+    path('ventas/anular/', views.anular_ventas, name='anular_ventas'),
+    path('api/ventas/lote/', views.api_ventas_lote, name='api_ventas_lote'),
+    path('api/productos/cambios/', views.api_cambios_productos, name='api_cambios_productos'),
 
     # --- RUTAS DE CLIENTES ---
     path('clientes/', views.ver_clientes, name='ver_clientes'),
     path('clientes/agregar/', views.agregar_cliente, name='agregar_cliente'),
+    path('clientes/<int:cliente_id>/', views.detalle_cliente, name='detalle_cliente'),
     path('clientes/<int:cliente_id>/editar/', views.actualizar_cliente, name='actualizar_cliente'),
     path('clientes/<int:cliente_id>/borrar/', views.borrar_cliente, name='borrar_cliente'),
 
     # --- RUTAS DE EMPLEADOS ---
     path('empleados/', views.ver_empleados, name='ver_empleados'),
     path('empleados/agregar/', views.agregar_empleado, name='agregar_empleado'),
+    path('empleados/reporte/', views.ver_reporte_empleados, name='ver_reporte_empleados'),
     path('empleados/<int:empleado_id>/editar/', views.actualizar_empleado, name='actualizar_empleado'),
     path('empleados/<int:empleado_id>/borrar/', views.borrar_empleado, name='borrar_empleado'),
 
+    # --- RUTAS DE SUCURSALES ---
+    path('tiendas/reporte/', views.ver_reporte_tiendas, name='ver_reporte_tiendas'),
+
     # --- RUTAS DE INVENTARIO ---
     path('inventario/', views.ver_movimientos_inventario, name='ver_movimientos_inventario'),
     path('inventario/agregar/', views.agregar_movimiento_inventario, name='agregar_movimiento_inventario'),
     path('inventario/<int:movimiento_id>/editar/', views.actualizar_movimiento, name='actualizar_movimiento'),
     path('inventario/<int:movimiento_id>/borrar/', views.borrar_movimiento, name='borrar_movimiento'),
+
+    # --- RUTAS DE RECEPCIÓN DE MERCANCÍA ---
+    path('recepciones/', views.ver_recepciones, name='ver_recepciones'),
+    path('recepciones/agregar/', views.agregar_recepcion, name='agregar_recepcion'),
+    path('api/recepciones/', views.api_recepciones, name='api_recepciones'),
+
+    # --- RUTAS DE CONTEOS FÍSICOS ---
+    path('inventario/conteos/', views.ver_conteos, name='ver_conteos'),
+    path('inventario/conteos/agregar/', views.agregar_conteo, name='agregar_conteo'),
+    path('inventario/conteos/<int:sesion_id>/', views.detalle_conteo, name='detalle_conteo'),
+    path('inventario/conteos/<int:sesion_id>/aplicar/', views.aplicar_conteo, name='aplicar_conteo'),
+    path('api/conteos/<int:sesion_id>/lotes/', views.api_conteo_lote, name='api_conteo_lote'),
+
+    # --- RUTAS DE LA COLA DE TAREAS ---
+    path('tareas/', views.ver_tareas, name='ver_tareas'),
+    path('tareas/<int:tarea_id>/reintentar/', views.reintentar_tarea, name='reintentar_tarea'),
+
+    # --- RUTAS DE DIAGNÓSTICO ---
+    path('perfiles/', views.ver_perfiles, name='ver_perfiles'),
+    path('perfiles/<str:nombre>/', views.detalle_perfil, name='detalle_perfil'),
+    path('perfiles/<str:nombre>/<str:formato>/', views.descargar_perfil, name='descargar_perfil'),
 ]
\ No newline at end of file
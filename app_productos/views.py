@@ -1,15 +1,37 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.db import IntegrityError, transaction
+from django.db import IntegrityError, router, transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from django.forms import inlineformset_factory, ModelForm, TextInput, Select 
-from decimal import Decimal 
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+import csv
 import json
 
 # Importamos todos los modelos necesarios
 from .models import (
     Producto, Categoria, Proveedor, 
     Ventas, Inventario, DetalleVenta,
-    Cliente, Empleado  # <-- NUEVOS MODELOS
+    Cliente, Empleado,  # <-- NUEVOS MODELOS
+    ClaveIdempotencia, CambioProducto,
+    RecepcionMercancia, LineaRecepcion,
+    SugerenciaReorden, CambioPrecioLote, Tarea,
+    EstadisticaCliente, VentaArchivada, PosicionRanking, SesionConteo,
+    version_precios,
 )
+from . import estadisticas_clientes, precios, promociones, ranking, reporte_empleados, tareas, tiendas
+from . import anulaciones, archivo, conteos, perfilado
+from .efectos_venta import fotos_ventas, registrar_efectos
+from . import kpis
+from .kpis import leer_tablero
+from .reportes_db import vista_de_reporte
 
 
 # =======================================================================
@@ -17,8 +39,8 @@ from .models import (
 # =======================================================================
 
 def inicio(request):
-    """Vista de la página de inicio."""
-    return render(request, 'inicio.html')
+    """Vista de la página de inicio con los KPIs precalculados del día."""
+    return render(request, 'inicio.html', leer_tablero())
 
 
 # =======================================================================
@@ -58,7 +80,7 @@ DetalleVentaFormSet = inlineformset_factory(
 
 def ver_productos(request):
     """Muestra la lista de productos."""
-    productos = Producto.objects.all()
+    productos = Producto.objects.select_related('categoria').prefetch_related('proveedores')
     return render(request, 'producto/ver_productos.html', {'productos': productos})
 
 def agregar_producto(request):
@@ -117,7 +139,9 @@ def actualizar_producto(request, producto_id):
     return render(request, 'producto/actualizar_producto.html', {
         'producto': producto,
         'categorias': categorias,
-        'proveedores': proveedores
+        'proveedores': proveedores,
+        # Un solo query para marcar los seleccionados, en vez de uno por opción
+        'proveedores_seleccionados': set(producto.proveedores.values_list('id', flat=True)),
     })
 
 def borrar_producto(request, producto_id):
@@ -131,14 +155,186 @@ def borrar_producto(request, producto_id):
     return render(request, 'producto/borrar_producto.html', {'producto': producto})
 
 
+def actualizar_precios_masivo(request):
+    """Vista previa y aplicación de un cambio de precios por categoría y/o proveedor."""
+    context = {
+        'categorias': Categoria.objects.all().order_by('nombre'),
+        'proveedores': Proveedor.objects.all().order_by('nombre_empresa'),
+        'historial': CambioPrecioLote.objects.select_related('categoria', 'proveedor')[:10],
+        'datos': request.POST,
+    }
+
+    if request.method == 'POST':
+        categoria_id = request.POST.get('categoria') or None
+        proveedor_id = request.POST.get('proveedor') or None
+        try:
+            porcentaje, redondeo = precios.validar_regla(
+                request.POST.get('porcentaje'), request.POST.get('redondeo')
+            )
+            if request.POST.get('accion') == 'aplicar':
+                precios.aplicar(categoria_id, proveedor_id, porcentaje, redondeo, request.POST.get('responsable'))
+                return redirect('ver_productos')
+            context['vista_previa'], context['total_afectados'] = precios.previsualizar(
+                precios.productos_afectados(categoria_id, proveedor_id), porcentaje, redondeo
+            )
+        except (ValueError, ArithmeticError) as e:
+            context['error'] = str(e) or 'Regla inválida.'
+
+    return render(request, 'producto/actualizar_precios.html', context)
+
+
+# =======================================================================
+# --- SUGERENCIAS DE REORDEN ---
+# =======================================================================
+
+def ver_reorden(request):
+    """Lee las sugerencias precalculadas por `calcular_reorden`, agrupadas por proveedor."""
+    sugerencias = (
+        SugerenciaReorden.objects.select_related('producto', 'proveedor')
+        .order_by('proveedor__nombre_empresa', 'dias_cobertura')
+    )
+    return render(request, 'producto/ver_reorden.html', {'sugerencias': sugerencias})
+
+
+# =======================================================================
+# --- RANKING DE MÁS VENDIDOS ---
+# =======================================================================
+
+def _parametros_ranking(request):
+    """?ventana=1|7|30 (por defecto 7) y ?categoria=<id>; None si la ventana no es válida."""
+    ventana = request.GET.get('ventana', '7')
+    ventana = int(ventana) if ventana.isdigit() and int(ventana) in ranking.VENTANAS else None
+    categoria = request.GET.get('categoria', '')
+    return ventana, int(categoria) if categoria.isdigit() else None
+
+
+def ver_ranking(request):
+    """Productos más vendidos por ventana móvil, general o de una categoría."""
+    ventana, categoria_id = _parametros_ranking(request)
+    ventana = ventana or 7
+    fecha, posiciones = ranking.top(ventana, categoria_id)
+    return render(request, 'producto/ver_ranking.html', {
+        'posiciones': posiciones,
+        'fecha': fecha,
+        'ventana': ventana,
+        'ventanas': PosicionRanking.VENTANAS,
+        'categoria_id': categoria_id,
+        'categorias': Categoria.objects.order_by('nombre').values('id', 'nombre'),
+    })
+
+
+def api_ranking(request):
+    """Mismo ranking en JSON: ?ventana=1|7|30&categoria=<id>&limite=<n> (máximo 100)."""
+    ventana, categoria_id = _parametros_ranking(request)
+    if ventana is None:
+        return JsonResponse({'error': f'"ventana" debe ser una de {list(ranking.VENTANAS)}.'}, status=400)
+    limite = request.GET.get('limite', str(ranking.TOP_N))
+    if not limite.isdigit() or not 1 <= int(limite) <= 100:
+        return JsonResponse({'error': '"limite" debe ser un entero entre 1 y 100.'}, status=400)
+    fecha, posiciones = ranking.top(ventana, categoria_id, int(limite))
+    for posicion in posiciones:
+        posicion['ingresos'] = str(posicion['ingresos'])
+    return JsonResponse({
+        'fecha': fecha.isoformat(), 'ventana': ventana, 'categoria_id': categoria_id, 'productos': posiciones,
+    })
+
+
 # =======================================================================
 # --- VISTAS DE VENTAS (CRUD) ---
 # =======================================================================
 
+def _rango_fechas(request):
+    """Lee ?desde=AAAA-MM-DD&hasta=AAAA-MM-DD (ambos inclusive) como datetimes [desde, hasta)."""
+    rango = []
+    for nombre, dias_extra in (('desde', 0), ('hasta', 1)):
+        fecha = parse_date(request.GET.get(nombre) or '')
+        if fecha:
+            valor = datetime.combine(fecha + timedelta(days=dias_extra), datetime.min.time())
+            fecha = timezone.make_aware(valor) if settings.USE_TZ else valor
+        rango.append(fecha)
+    return rango
+
+
+def _es_consulta_historica(request):
+    return bool(request.GET.get('desde') or request.GET.get('hasta'))
+
+
+POR_PAGINA_VENTAS = 50
+
+
+def _filtros_ventas(request):
+    """
+    Filtros de la lista de ventas, cada uno respaldado por un índice (ver Ventas.Meta):
+    ?cliente, ?empleado y ?producto (ids), ?codigo (código de barras de un producto de la venta),
+    ?metodo_pago, ?pagada=si|no, ?monto_min y ?monto_max. Los valores inválidos se ignoran.
+    Devuelve (filtros de la cabecera, id del producto o None).
+    """
+    filtros = {}
+    for parametro, campo in (('cliente', 'cliente_id'), ('empleado', 'empleado_vendedor_id')):
+        valor = request.GET.get(parametro, '')
+        if valor.isdigit():
+            filtros[campo] = int(valor)
+    producto = request.GET.get('producto', '')
+    producto_id = int(producto) if producto.isdigit() else None
+    codigo = request.GET.get('codigo', '').strip()
+    if codigo:
+        producto_id = Producto.objects.filter(codigo_barras=codigo).values_list('id', flat=True).first()
+        if producto_id is None:
+            # Un código desconocido no debe mostrar todas las ventas: id__in=[] no consulta la base
+            filtros['id__in'] = []
+    if request.GET.get('metodo_pago') in dict(Ventas.METODOS_PAGO):
+        filtros['metodo_pago'] = request.GET['metodo_pago']
+    if request.GET.get('pagada') in ('si', 'no'):
+        filtros['esta_pagada'] = request.GET['pagada'] == 'si'
+    for parametro, campo in (('monto_min', 'monto_total__gte'), ('monto_max', 'monto_total__lte')):
+        try:
+            valor = Decimal(request.GET.get(parametro, ''))
+        except InvalidOperation:
+            continue
+        if valor.is_finite():
+            filtros[campo] = valor
+    return filtros, producto_id
+
+
+@vista_de_reporte(solo_si=_es_consulta_historica)
 def ver_ventas(request):
-    """Muestra la lista de transacciones de venta."""
-    ventas = Ventas.objects.all().order_by('-fecha_venta')
-    return render(request, 'venta/ver_ventas.html', {'ventas': ventas})
+    """
+    Lista de ventas filtrada en el servidor y paginada por llave (fecha, id); incluye el archivo si el
+    rango lo alcanza. El total de resultados se acota a LIMITE_CONTEO en lugar de contar todo.
+    """
+    desde, hasta = _rango_fechas(request)
+    filtros, producto_id = _filtros_ventas(request)
+    cursor = _cursor_historial(request.GET.get('despues', ''))
+    ventas, hay_mas, total, total_acotado = archivo.buscar_ventas(
+        desde, hasta, filtros, producto_id, despues=cursor, limite=POR_PAGINA_VENTAS,
+    )
+
+    parametros = request.GET.copy()
+    parametros.pop('despues', None)
+    siguiente = None
+    if hay_mas:
+        parametros['despues'] = f'{ventas[-1].fecha_venta.isoformat()}_{ventas[-1].id}'
+        siguiente = parametros.urlencode()
+        parametros.pop('despues')
+    return render(request, 'venta/ver_ventas.html', {
+        'ventas': ventas,
+        'total': total,
+        'total_acotado': total_acotado,
+        'siguiente': siguiente,
+        'primera_pagina': parametros.urlencode(),
+        'es_primera_pagina': cursor is None,
+        'metodos_pago': Ventas.METODOS_PAGO,
+        'desde': request.GET.get('desde', ''),
+        'hasta': request.GET.get('hasta', ''),
+        'cliente': request.GET.get('cliente', ''),
+        'empleado': request.GET.get('empleado', ''),
+        'producto': request.GET.get('producto', ''),
+        'codigo': request.GET.get('codigo', ''),
+        'metodo_pago': request.GET.get('metodo_pago', ''),
+        'pagada': request.GET.get('pagada', ''),
+        'monto_min': request.GET.get('monto_min', ''),
+        'monto_max': request.GET.get('monto_max', ''),
+    })
 
 
 # Tu archivo: views.py
@@ -157,10 +353,11 @@ def agregar_venta(request):
     metodos_pago = Ventas.METODOS_PAGO 
     venta_instance = Ventas()
     
+    # Secuencia del feed ANTES de leer el catálogo, para no perder cambios intermedios
+    cambios_seq = _ultimo_seq_cambios()
+
     # Obtenemos todos los productos para el JavaScript
-    productos = Producto.objects.all().values('id', 'precio_venta')
-    productos_list = [{'id': p['id'], 'precio_venta': str(p['precio_venta'])} for p in productos]
-    productos_json = json.dumps(productos_list)
+    productos_json = _catalogo_json()
 
     # --- NUEVO: Obtener clientes y empleados ---
     clientes = Cliente.objects.filter(activo=True).order_by('nombre_completo')
@@ -222,11 +419,19 @@ def agregar_venta(request):
             
             formset.instance = venta_obj 
             detalles_guardados = formset.save(commit=False)
-            
+
+            # Productos de la canasta en una consulta y promociones resueltas en una sola pasada
+            productos = Producto.objects.in_bulk([d.producto_id for d in detalles_guardados])
+            con_producto = [d for d in detalles_guardados if d.producto_id in productos]
+            descuentos = promociones.aplicar([
+                (productos[d.producto_id], d.cantidad_vendida, d.descuento_porcentaje) for d in con_producto
+            ])
+            for detalle, (descuento, _) in zip(con_producto, descuentos):
+                detalle.descuento_porcentaje = descuento
+
             for detalle in detalles_guardados:
-                try:
-                    producto = Producto.objects.get(id=detalle.producto_id)
-                    
+                producto = productos.get(detalle.producto_id)
+                if producto is not None:
                     if producto.stock < detalle.cantidad_vendida:
                         raise IntegrityError(f"Stock insuficiente para {producto.nombre}. Disponible: {producto.stock}")
 
@@ -241,13 +446,12 @@ def agregar_venta(request):
                         razon=f"Venta a cliente {cliente_nombre_log} (Venta #{venta_obj.id})",
                         responsable=vendedor_nombre_log
                     )
-                except Producto.DoesNotExist:
-                    pass 
                 
                 detalle.venta = venta_obj
                 detalle.save()
             
             formset.save_m2m()
+            registrar_efectos(despues=fotos_ventas([venta_obj.id]))
             
             return redirect('ver_ventas')
         
@@ -258,6 +462,7 @@ def agregar_venta(request):
         'metodos_pago': metodos_pago,
         'formset': formset,
         'productos_json': productos_json,
+        'cambios_seq': cambios_seq,
         'clientes': clientes,       # <-- NUEVO
         'empleados': empleados      # <-- NUEVO
     }
@@ -268,10 +473,11 @@ def agregar_venta(request):
 def actualizar_venta(request, venta_id):
     """Actualiza la cabecera de una venta Y sus detalles usando un Formset."""
     venta = get_object_or_404(Ventas, id=venta_id)
+    if venta.anulada:
+        # Su mercancía ya volvió al stock y ya no cuenta en los resúmenes
+        return redirect('ver_ventas')
     metodos_pago = Ventas.METODOS_PAGO 
-    productos = Producto.objects.all().values('id', 'precio_venta')
-    productos_list = [{'id': p['id'], 'precio_venta': str(p['precio_venta'])} for p in productos]
-    productos_json = json.dumps(productos_list)
+    productos_json = _catalogo_json()
     
     original_detalles = {d.id: (d.producto_id, d.cantidad_vendida) for d in venta.detalleventa.all()}
 
@@ -279,6 +485,7 @@ def actualizar_venta(request, venta_id):
         formset = DetalleVentaFormSet(request.POST, instance=venta)
         
         if formset.is_valid():
+            antes = fotos_ventas([venta.id])
             venta.nombre_cliente = request.POST.get('nombre_cliente', venta.nombre_cliente)
             venta.metodo_pago = request.POST.get('metodo_pago', venta.metodo_pago)
             venta.vendedor = request.POST.get('vendedor', venta.vendedor)
@@ -323,6 +530,7 @@ def actualizar_venta(request, venta_id):
             if not detalles_guardados:
                  venta.update_monto_total()
 
+            registrar_efectos(antes, fotos_ventas([venta.id]))
             return redirect('ver_ventas')
             
     else:
@@ -338,14 +546,720 @@ def actualizar_venta(request, venta_id):
 
 
 def borrar_venta(request, venta_id):
-    """Permite borrar una venta completa."""
+    """
+    "Borra" una venta anulándola (ver anulaciones.py): su mercancía vuelve al stock con movimientos
+    'ENT' y deja de contar en los reportes. Borrarla de verdad perdería esas piezas del inventario.
+    """
     venta = get_object_or_404(Ventas, id=venta_id)
-    
-    if request.method == 'POST':
-        venta.delete()
+    if venta.anulada:
         return redirect('ver_ventas')
-    
-    return render(request, 'venta/borrar_venta.html', {'venta': venta})
+    contexto = {'venta': venta}
+
+    if request.method == 'POST':
+        try:
+            anulaciones.anular_ventas([venta.id], request.POST.get('motivo'), responsable=request.POST.get('responsable'))
+        except ValueError as e:
+            contexto.update(error=str(e), motivo=request.POST.get('motivo', ''), responsable=request.POST.get('responsable', ''))
+        else:
+            return redirect('ver_ventas')
+
+    return render(request, 'venta/borrar_venta.html', contexto)
+
+
+def _ventas_a_anular(request):
+    """
+    Ventas activas elegidas por ids=1,2,3 (GET o POST) o por los mismos filtros de la lista de ventas
+    (ver _filtros_ventas y _rango_fechas). None si no hay ningún criterio: nunca se anula todo.
+    """
+    texto = request.POST.get('ids') or request.GET.get('ids', '')
+    ids = [valor for valor in texto.replace(' ', '').split(',') if valor]
+    if ids:
+        return Ventas.objects.filter(id__in=[int(valor) for valor in ids if valor.isdigit()])
+    desde, hasta = _rango_fechas(request)
+    filtros, producto_id = _filtros_ventas(request)
+    if not (desde or hasta or filtros or producto_id):
+        return None
+    ventas = Ventas.objects.filter(**filtros)
+    if desde:
+        ventas = ventas.filter(fecha_venta__gte=desde)
+    if hasta:
+        ventas = ventas.filter(fecha_venta__lt=hasta)
+    if producto_id:
+        ventas = ventas.filter(id__in=DetalleVenta.objects.filter(producto_id=producto_id).values('venta_id'))
+    return ventas
+
+
+def anular_ventas(request):
+    """Anula por lote las ventas elegidas (ids o filtros) devolviendo su mercancía al stock."""
+    ventas = _ventas_a_anular(request)
+    contexto = {'criterio': request.GET.urlencode(), 'ids': request.GET.get('ids', '')}
+    if ventas is None:
+        contexto['error'] = 'Indique las ventas a anular (ids o filtros de la lista de ventas).'
+        return render(request, 'venta/anular_ventas.html', contexto)
+    pendientes = ventas.filter(anulada=False)
+
+    if request.method == 'POST':
+        try:
+            resultado = anulaciones.anular_ventas(
+                pendientes, request.POST.get('motivo'), responsable=request.POST.get('responsable'),
+            )
+        except ValueError as e:
+            contexto['error'] = str(e)
+        else:
+            contexto['resultado'] = resultado
+        contexto['motivo'] = request.POST.get('motivo', '')
+        contexto['responsable'] = request.POST.get('responsable', '')
+
+    # Vista previa acotada: el conteo se detiene en el máximo por lote
+    contexto['num_ventas'] = pendientes[:anulaciones.MAX_VENTAS_POR_ANULACION + 1].count()
+    contexto['maximo'] = anulaciones.MAX_VENTAS_POR_ANULACION
+    contexto['muestra'] = pendientes.select_related('cliente', 'empleado_vendedor').order_by('-fecha_venta', '-id')[:20]
+    return render(request, 'venta/anular_ventas.html', contexto)
+
+
+# =======================================================================
+# --- API DE VENTAS POR LOTE (POS FUERA DE LÍNEA) ---
+# =======================================================================
+
+MAX_VENTAS_POR_LOTE = 500
+# Una terminal fuera de línea envía la fecha en que cobró; se aceptan ventas de hasta una semana
+# atrás y un pequeño adelanto de su reloj (se registra como "ahora")
+MAX_ANTIGUEDAD_VENTA_DIFERIDA = timedelta(days=7)
+TOLERANCIA_RELOJ_TERMINAL = timedelta(minutes=5)
+
+
+def _calcular_subtotal(cantidad, precio, descuento_pct):
+    """Misma fórmula que DetalleVenta.save(), para poder usar bulk_create."""
+    base = Decimal(cantidad) * precio
+    return (base * (Decimal(1) - descuento_pct / Decimal(100))).quantize(Decimal('0.01'))
+
+
+def _es_id(valor):
+    """Un id del JSON: entero, y no booleano (True también es int en Python)."""
+    return isinstance(valor, int) and not isinstance(valor, bool)
+
+
+def _fecha_de_venta(valor, ahora):
+    """Fecha ISO 8601 de una venta del lote (sin zona: la local); None si la terminal no la envió."""
+    if valor is None:
+        return None
+    try:
+        fecha = parse_datetime(valor)
+    except ValueError:
+        fecha = None
+    if fecha is None:
+        raise ValueError('"fecha" debe ser una fecha y hora ISO 8601.')
+    if timezone.is_naive(fecha):
+        fecha = timezone.make_aware(fecha)
+    if fecha > ahora + TOLERANCIA_RELOJ_TERMINAL:
+        raise ValueError('"fecha" no puede estar en el futuro.')
+    if fecha < ahora - MAX_ANTIGUEDAD_VENTA_DIFERIDA:
+        raise ValueError(f'"fecha" no puede tener más de {MAX_ANTIGUEDAD_VENTA_DIFERIDA.days} días.')
+    return min(fecha, ahora)
+
+
+def _error_de_forma(data):
+    """Valida los tipos de una venta del lote antes de tocar la base; devuelve el error o None."""
+    for campo in ('cliente_id', 'empleado_id'):
+        if data.get(campo) is not None and not _es_id(data[campo]):
+            return f'"{campo}" debe ser un entero.'
+    for campo in ('metodo_pago', 'nombre_cliente', 'notas', 'fecha'):
+        if data.get(campo) is not None and not isinstance(data[campo], str):
+            return f'"{campo}" debe ser texto.'
+    if not isinstance(data.get('esta_pagada', True), bool):
+        return '"esta_pagada" debe ser true o false.'
+    detalles = data.get('detalles')
+    if not isinstance(detalles, list) or not detalles:
+        return 'La venta no tiene detalles.'
+    for linea in detalles:
+        if not isinstance(linea, dict) or not _es_id(linea.get('producto_id')):
+            return 'Cada detalle necesita un "producto_id" entero.'
+    return None
+
+
+def _registrar_lote_ventas(ventas_payload):
+    """
+    Aplica un lote de ventas en una sola transacción y devuelve un resultado por venta.
+    Las claves ya registradas se omiten; el stock se descuenta con un único UPDATE. Cada venta
+    conserva su `fecha` de la terminal (si la envía), no la del momento en que se sincroniza.
+    """
+    resultados = [None] * len(ventas_payload)
+
+    # 1. Normalizar claves y descartar repetidas dentro del mismo lote
+    claves_vistas = {}
+    for i, data in enumerate(ventas_payload):
+        clave = str(data.get('clave') or '').strip() if isinstance(data, dict) else ''
+        if not clave or len(clave) > 64:
+            resultados[i] = {'clave': clave, 'estado': 'error', 'error': 'Clave de idempotencia inválida.'}
+        elif clave in claves_vistas:
+            resultados[i] = {'clave': clave, 'estado': 'duplicada', 'venta_id': None}
+        else:
+            claves_vistas[clave] = i
+
+    # 2. Claves ya aplicadas en lotes anteriores (una consulta sobre el índice único)
+    existentes = dict(
+        ClaveIdempotencia.objects.filter(clave__in=list(claves_vistas)).values_list('clave', 'venta_id')
+    )
+    for clave, venta_id in existentes.items():
+        resultados[claves_vistas.pop(clave)] = {'clave': clave, 'estado': 'duplicada', 'venta_id': venta_id}
+
+    # 3. Descartar ventas mal formadas y cargar de una vez productos, clientes y empleados referenciados
+    pendientes = []
+    for i in sorted(claves_vistas.values()):
+        error = _error_de_forma(ventas_payload[i])
+        if error:
+            resultados[i] = {'clave': str(ventas_payload[i]['clave']).strip(), 'estado': 'error', 'error': error}
+        else:
+            pendientes.append(i)
+    producto_ids, cliente_ids, empleado_ids = set(), set(), set()
+    for i in pendientes:
+        data = ventas_payload[i]
+        producto_ids.update(linea['producto_id'] for linea in data['detalles'])
+        cliente_ids.add(data.get('cliente_id'))
+        empleado_ids.add(data.get('empleado_id'))
+    cliente_ids.discard(None)
+    empleado_ids.discard(None)
+
+    productos = Producto.objects.select_for_update().in_bulk(list(producto_ids))
+    clientes = Cliente.objects.only('id', 'nombre_completo').in_bulk(list(cliente_ids))
+    empleados = Empleado.objects.only('id', 'nombre_completo').in_bulk(list(empleado_ids))
+    metodos_validos = {code for code, _ in Ventas.METODOS_PAGO}
+
+    # 4. Validar cada venta contra el stock disponible (acumulando lo ya reservado en el lote)
+    stock_disponible = {pid: p.stock for pid, p in productos.items()}
+    ahora = timezone.now()
+    fechas = {}
+    aceptadas = []
+    for i in pendientes:
+        data = ventas_payload[i]
+        clave = str(data['clave']).strip()
+        error = None
+        lineas = []
+        cantidades = {}
+
+        cliente_id = data.get('cliente_id')
+        empleado_id = data.get('empleado_id')
+        metodo_pago = data.get('metodo_pago') or 'EFE'
+
+        if metodo_pago not in metodos_validos:
+            error = f'Método de pago inválido: {metodo_pago}'
+        elif cliente_id is not None and cliente_id not in clientes:
+            error = f'Cliente ID {cliente_id} no existe.'
+        elif empleado_id is not None and empleado_id not in empleados:
+            error = f'Empleado ID {empleado_id} no existe.'
+        else:
+            try:
+                fecha = _fecha_de_venta(data.get('fecha'), ahora)
+            except ValueError as e:
+                error = str(e)
+            else:
+                if fecha is not None:
+                    fechas[i] = fecha
+
+        if not error:
+            for linea in data['detalles']:
+                producto = productos.get(linea['producto_id'])
+                if producto is None:
+                    error = 'Producto inexistente en los detalles.'
+                    break
+                try:
+                    cantidad = int(linea.get('cantidad', 1))
+                    descuento = Decimal(str(linea.get('descuento_porcentaje', '0')))
+                except (TypeError, ValueError, ArithmeticError):
+                    error = f'Cantidad o descuento inválido para {producto.nombre}.'
+                    break
+                if cantidad <= 0 or not (Decimal(0) <= descuento <= Decimal(100)):
+                    error = f'Cantidad o descuento inválido para {producto.nombre}.'
+                    break
+                if producto.id in cantidades:
+                    error = f'Producto {producto.nombre} repetido en la venta.'
+                    break
+                cantidades[producto.id] = cantidad
+                lineas.append((producto, cantidad, descuento))
+
+        if not error:
+            for producto_id, cantidad in cantidades.items():
+                if stock_disponible[producto_id] < cantidad:
+                    producto = productos[producto_id]
+                    error = f'Stock insuficiente para {producto.nombre}. Disponible: {stock_disponible[producto_id]}'
+                    break
+
+        if error:
+            resultados[i] = {'clave': clave, 'estado': 'error', 'error': error}
+            continue
+
+        for producto_id, cantidad in cantidades.items():
+            stock_disponible[producto_id] -= cantidad
+        aceptadas.append((i, clave, data, lineas))
+
+    if not aceptadas:
+        return resultados
+
+    # 5. Cabeceras con el total ya calculado (bulk_create no llama a save())
+    ventas_objs = []
+    for i, clave, data, lineas in aceptadas:
+        cliente_id = data.get('cliente_id')
+        monto_total = sum(
+            (_calcular_subtotal(cantidad, producto.precio_venta, descuento) for producto, cantidad, descuento in lineas),
+            Decimal('0.00'),
+        )
+        ventas_objs.append(Ventas(
+            cliente_id=cliente_id,
+            nombre_cliente=None if cliente_id else (data.get('nombre_cliente') or 'Anónimo'),
+            empleado_vendedor_id=data.get('empleado_id'),
+            metodo_pago=data.get('metodo_pago') or 'EFE',
+            esta_pagada=data.get('esta_pagada', True),
+            notas=data.get('notas') or None,
+            monto_total=monto_total,
+        ))
+    ventas_objs = Ventas.objects.bulk_create(ventas_objs)
+
+    # fecha_venta es auto_now_add (bulk_create la sobrescribe): las ventas diferidas se fechan con un UPDATE
+    diferidas = {v.id: fechas[i] for v, (i, *_) in zip(ventas_objs, aceptadas) if i in fechas}
+    if diferidas:
+        Ventas.objects.filter(id__in=list(diferidas)).update(fecha_venta=Case(
+            *[When(id=venta_id, then=Value(fecha)) for venta_id, fecha in diferidas.items()],
+            output_field=Ventas._meta.get_field('fecha_venta'),
+        ))
+
+    # 6. Detalles, movimientos de inventario y claves en inserciones masivas
+    detalles, movimientos, claves = [], [], []
+    for venta_obj, (i, clave, data, lineas) in zip(ventas_objs, aceptadas):
+        if venta_obj.cliente_id:
+            cliente_nombre_log = clientes[venta_obj.cliente_id].nombre_completo
+        else:
+            cliente_nombre_log = venta_obj.nombre_cliente
+        if venta_obj.empleado_vendedor_id:
+            vendedor_nombre_log = empleados[venta_obj.empleado_vendedor_id].nombre_completo
+        else:
+            vendedor_nombre_log = 'Sistema'
+
+        for producto, cantidad, descuento in lineas:
+            detalles.append(DetalleVenta(
+                venta=venta_obj,
+                producto_id=producto.id,
+                cantidad_vendida=cantidad,
+                precio_unitario=producto.precio_venta,
+                descuento_porcentaje=descuento,
+                subtotal=_calcular_subtotal(cantidad, producto.precio_venta, descuento),
+            ))
+            movimientos.append(Inventario(
+                producto_id=producto.id,
+                tipo_movimiento='SAL',
+                cantidad=cantidad,
+                razon=f"Venta a cliente {cliente_nombre_log} (Venta #{venta_obj.id})",
+                responsable=vendedor_nombre_log,
+            ))
+        claves.append(ClaveIdempotencia(clave=clave, venta=venta_obj))
+        resultados[i] = {'clave': clave, 'estado': 'aplicada', 'venta_id': venta_obj.id, 'monto_total': str(venta_obj.monto_total)}
+
+    DetalleVenta.objects.bulk_create(detalles)
+    Inventario.objects.bulk_create(movimientos)
+    ClaveIdempotencia.objects.bulk_create(claves)
+
+    # 7. Un solo UPDATE para todo el stock vendido en el lote
+    vendidos = {pid: productos[pid].stock - stock for pid, stock in stock_disponible.items() if productos[pid].stock != stock}
+    Producto.objects.filter(id__in=list(vendidos)).update(
+        stock=Case(*[When(id=pid, then=F('stock') - cantidad) for pid, cantidad in vendidos.items()])
+    )
+    CambioProducto.registrar(vendidos)
+    registrar_efectos(despues=fotos_ventas([v.id for v in ventas_objs]))
+    return resultados
+
+
+@csrf_exempt
+@require_POST
+def api_ventas_lote(request):
+    """Recibe un lote JSON de ventas encoladas por las terminales POS y las aplica de forma idempotente."""
+    try:
+        payload = json.loads(request.body)
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({'error': 'JSON inválido.'}, status=400)
+
+    ventas_payload = payload.get('ventas') if isinstance(payload, dict) else None
+    if not isinstance(ventas_payload, list):
+        return JsonResponse({'error': 'Se esperaba una lista "ventas".'}, status=400)
+    if len(ventas_payload) > MAX_VENTAS_POR_LOTE:
+        return JsonResponse({'error': f'Máximo {MAX_VENTAS_POR_LOTE} ventas por lote.'}, status=400)
+
+    try:
+        with transaction.atomic():
+            resultados = _registrar_lote_ventas(ventas_payload)
+    except IntegrityError:
+        # Otra terminal aplicó alguna de las claves al mismo tiempo: reintentar es seguro
+        return JsonResponse({'error': 'Conflicto de claves concurrentes, reintente el lote.'}, status=409)
+
+    return JsonResponse({'resultados': resultados})
+
+
+# =======================================================================
+# --- FEED DE CAMBIOS DE CATÁLOGO (SSE / SONDEO) ---
+# =======================================================================
+
+MAX_CAMBIOS_POR_RESPUESTA = 500
+# Las respuestas no se quedan abiertas esperando cambios: cada terminal ocuparía un hilo del
+# servidor WSGI. El cliente vuelve a preguntar tras este intervalo (el `retry` de SSE)
+INTERVALO_SONDEO_MS = 3000
+# Si quedaron cambios sin enviar, la siguiente consulta va casi de inmediato
+INTERVALO_PENDIENTES_MS = 100
+
+
+def _cambios_desde(seq):
+    return [c.as_dict() for c in CambioProducto.objects.filter(id__gt=seq)[:MAX_CAMBIOS_POR_RESPUESTA]]
+
+
+def _ultimo_seq_cambios():
+    return CambioProducto.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def _catalogo_json():
+    """
+    JSON de precios para el formulario de venta, cacheado por versión de precios (ver
+    models.version_precios): las ventas cambian el stock pero no invalidan el JSON.
+    """
+    alias = router.db_for_read(Producto) or 'default'
+    clave = f'catalogo_json:{alias}:{version_precios(alias)}'
+    productos_json = cache.get(clave)
+    if productos_json is None:
+        productos = Producto.objects.all().values('id', 'precio_venta')
+        productos_list = [{'id': p['id'], 'precio_venta': str(p['precio_venta'])} for p in productos]
+        productos_json = json.dumps(productos_list)
+        cache.set(clave, productos_json, 60 * 60)
+    return productos_json
+
+
+def _intervalo_sondeo(cambios):
+    return INTERVALO_PENDIENTES_MS if len(cambios) >= MAX_CAMBIOS_POR_RESPUESTA else INTERVALO_SONDEO_MS
+
+
+def _eventos_sse(cambios):
+    """Cuerpo SSE: el intervalo de reconexión y un evento por cambio (su `id` es el seq)."""
+    eventos = [f'retry: {_intervalo_sondeo(cambios)}\n\n']
+    eventos += [f"id: {c['seq']}\nevent: cambio\ndata: {json.dumps(c)}\n\n" for c in cambios]
+    return ''.join(eventos)
+
+
+def api_cambios_productos(request):
+    """
+    Devuelve los cambios de precio/stock posteriores a `desde` y responde de inmediato.
+    Con `Accept: text/event-stream` responde como SSE y cierra: EventSource se reconecta sola tras
+    `retry` con el último id recibido. Si no, como JSON con `reintentar_en` (milisegundos).
+    """
+    try:
+        # Al reconectar, EventSource envía Last-Event-ID, que tiene prioridad sobre ?desde=
+        desde = int(request.headers.get('Last-Event-ID') or request.GET.get('desde') or 0)
+    except ValueError:
+        return JsonResponse({'error': 'El parámetro "desde" debe ser un entero.'}, status=400)
+
+    cambios = _cambios_desde(desde)
+    if 'text/event-stream' in request.headers.get('Accept', ''):
+        response = HttpResponse(_eventos_sse(cambios), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+    ultimo = cambios[-1]['seq'] if cambios else desde
+    return JsonResponse({'cambios': cambios, 'ultimo_seq': ultimo, 'reintentar_en': _intervalo_sondeo(cambios)})
+
+
+# =======================================================================
+# --- RECEPCIÓN DE MERCANCÍA (DOCUMENTO MULTI-LÍNEA) ---
+# =======================================================================
+
+def _parsear_lineas_recepcion(texto):
+    """Convierte líneas 'codigo_barras, cantidad[, costo]' en diccionarios de línea ('#ID' en lugar del código)."""
+    lineas = []
+    for numero, renglon in enumerate(texto.splitlines(), start=1):
+        renglon = renglon.strip()
+        if not renglon:
+            continue
+        partes = [p.strip() for p in renglon.replace(';', ',').replace('\t', ',').split(',')]
+        try:
+            cantidad = int(partes[1])
+            costo = Decimal(partes[2]) if len(partes) > 2 and partes[2] else None
+            # '#12' es el producto con ID 12; cualquier otro texto es un código de barras
+            producto = {'producto_id': int(partes[0][1:])} if partes[0].startswith('#') else {'codigo_barras': partes[0]}
+        except (IndexError, ValueError, ArithmeticError):
+            raise ValueError(f'Línea {numero} inválida: "{renglon}"')
+        lineas.append(dict(producto, cantidad=cantidad, costo_unitario=costo))
+    return lineas
+
+
+def _aplicar_recepcion(proveedor, lineas, responsable=None, referencia=None, notas=None):
+    """
+    Crea el documento de recepción y aplica todas sus entradas de stock.
+    Debe ejecutarse dentro de una transacción: cualquier ValueError deshace el documento completo.
+    """
+    if not lineas:
+        raise ValueError('La recepción no tiene líneas.')
+
+    # 1. Resolver productos (máximo dos consultas): `producto_id` solo como ID y `codigo_barras` solo
+    #    como código de barras; un código que no está en el catálogo no se toma como ID
+    codigos = {str(l['codigo_barras']) for l in lineas if not l.get('producto_id') and l.get('codigo_barras')}
+    por_codigo = dict(
+        Producto.objects.filter(codigo_barras__in=codigos).values_list('codigo_barras', 'id')
+    )
+    ids_directos = {int(l['producto_id']) for l in lineas if l.get('producto_id')}
+    ids_validos = set(Producto.objects.filter(id__in=ids_directos).values_list('id', flat=True))
+    ids_validos.update(por_codigo.values())
+
+    # 2. Acumular cantidades por producto (un camión puede traer el mismo SKU en varias líneas)
+    cantidades, costos = {}, {}
+    for linea in lineas:
+        if linea.get('producto_id'):
+            producto_id = int(linea['producto_id'])
+        else:
+            producto_id = por_codigo.get(str(linea.get('codigo_barras') or ''))
+        if producto_id not in ids_validos:
+            raise ValueError(f"Producto no encontrado: {linea.get('producto_id') or linea.get('codigo_barras')}")
+        cantidad = int(linea['cantidad'])
+        if cantidad <= 0:
+            raise ValueError('Las cantidades recibidas deben ser positivas.')
+        cantidades[producto_id] = cantidades.get(producto_id, 0) + cantidad
+        if linea.get('costo_unitario') is not None:
+            costos[producto_id] = Decimal(str(linea['costo_unitario']))
+
+    # 3. Documento y líneas
+    recepcion = RecepcionMercancia.objects.create(
+        proveedor=proveedor,
+        referencia=referencia or None,
+        responsable=responsable or None,
+        notas=notas or None,
+    )
+    LineaRecepcion.objects.bulk_create([
+        LineaRecepcion(recepcion=recepcion, producto_id=pid, cantidad=cantidad, costo_unitario=costos.get(pid))
+        for pid, cantidad in cantidades.items()
+    ])
+
+    # 4. Un solo UPDATE protegido: si algún producto desapareció, se revierte todo
+    actualizados = Producto.objects.filter(id__in=list(cantidades)).update(
+        stock=Case(*[When(id=pid, then=F('stock') + cantidad) for pid, cantidad in cantidades.items()])
+    )
+    if actualizados != len(cantidades):
+        raise ValueError('Algunos productos fueron eliminados durante la recepción.')
+
+    razon = f"Recepción #{recepcion.id} de {proveedor.nombre_empresa}"
+    if referencia:
+        razon += f" ({referencia})"
+    Inventario.objects.bulk_create([
+        Inventario(producto_id=pid, tipo_movimiento='ENT', cantidad=cantidad, razon=razon[:255], responsable=responsable or None)
+        for pid, cantidad in cantidades.items()
+    ])
+    CambioProducto.registrar(cantidades)
+    return recepcion
+
+
+def ver_recepciones(request):
+    """Muestra los documentos de recepción con el total de líneas y piezas recibidas."""
+    recepciones = (
+        RecepcionMercancia.objects.select_related('proveedor')
+        .annotate(num_lineas=Count('lineas'), piezas=Sum('lineas__cantidad'))
+        .order_by('-fecha_recepcion')
+    )
+    return render(request, 'recepcion/ver_recepciones.html', {'recepciones': recepciones})
+
+
+def agregar_recepcion(request):
+    """Registra una recepción completa de un proveedor pegando o escaneando todas sus líneas."""
+    proveedores = Proveedor.objects.all().order_by('nombre_empresa')
+
+    if request.method == 'POST':
+        proveedor = get_object_or_404(Proveedor, id=request.POST.get('proveedor'))
+        try:
+            with transaction.atomic():
+                _aplicar_recepcion(
+                    proveedor,
+                    _parsear_lineas_recepcion(request.POST.get('lineas', '')),
+                    responsable=request.POST.get('responsable'),
+                    referencia=request.POST.get('referencia'),
+                    notas=request.POST.get('notas'),
+                )
+        except ValueError as e:
+            return render(request, 'recepcion/agregar_recepcion.html', {
+                'proveedores': proveedores,
+                'error': str(e),
+                'datos': request.POST,
+            })
+        return redirect('ver_recepciones')
+
+    return render(request, 'recepcion/agregar_recepcion.html', {'proveedores': proveedores})
+
+
+@csrf_exempt
+@require_POST
+def api_recepciones(request):
+    """Recibe en JSON un documento de recepción completo (cabecera + líneas) y lo aplica en una transacción."""
+    try:
+        payload = json.loads(request.body)
+        proveedor = Proveedor.objects.get(id=payload['proveedor_id'])
+        with transaction.atomic():
+            recepcion = _aplicar_recepcion(
+                proveedor,
+                payload.get('lineas') or [],
+                responsable=payload.get('responsable'),
+                referencia=payload.get('referencia'),
+                notas=payload.get('notas'),
+            )
+    except (ValueError, KeyError, TypeError, ArithmeticError, Proveedor.DoesNotExist) as e:
+        return JsonResponse({'error': str(e) or 'Documento inválido.'}, status=400)
+
+    return JsonResponse({'recepcion_id': recepcion.id, 'lineas': recepcion.lineas.count()}, status=201)
+
+
+# =======================================================================
+# --- CONTEOS FÍSICOS DE INVENTARIO ---
+# =======================================================================
+
+MAX_DIFERENCIAS_EN_PANTALLA = 500
+
+
+def ver_conteos(request):
+    sesiones = SesionConteo.objects.annotate(num_lineas=Count('capturas')).order_by('-fecha_creacion')[:100]
+    return render(request, 'inventario/ver_conteos.html', {'sesiones': sesiones})
+
+
+def agregar_conteo(request):
+    if request.method == 'POST':
+        nombre = (request.POST.get('nombre') or '').strip()
+        if not nombre:
+            return render(request, 'inventario/agregar_conteo.html', {'error': 'Indique un nombre.', 'datos': request.POST})
+        sesion = SesionConteo.objects.create(
+            nombre=nombre[:150],
+            completo=request.POST.get('completo') == 'on',
+            responsable=request.POST.get('responsable') or None,
+        )
+        return redirect('detalle_conteo', sesion_id=sesion.id)
+    return render(request, 'inventario/agregar_conteo.html')
+
+
+def _contexto_conteo(sesion, **extra):
+    """Diferencias de la sesión (las mayores primero, acotadas) y sus totales, calculados en SQL."""
+    filas, num_diferencias, sobrantes, faltantes = (
+        conteos.resumen(sesion, MAX_DIFERENCIAS_EN_PANTALLA) if sesion.estado == 'ABI' else ([], 0, 0, 0)
+    )
+    return {
+        'sesion': sesion,
+        'diferencias': filas,
+        'num_diferencias': num_diferencias,
+        'sobrantes': sobrantes,
+        'faltantes': faltantes,
+        'desconocidos': conteos.desconocidos(sesion),
+        'num_lotes': sesion.capturas.values('lote').distinct().count(),
+        **extra,
+    }
+
+
+def detalle_conteo(request, sesion_id):
+    """Diferencias de una sesión de conteo; el POST agrega un lote capturado a mano o pegado."""
+    sesion = get_object_or_404(SesionConteo, id=sesion_id)
+    extra = {}
+    if request.method == 'POST':
+        lote = request.POST.get('lote') or f'manual-{timezone.now():%Y%m%d%H%M%S%f}'
+        try:
+            guardadas, desconocidos = conteos.registrar_lote(sesion, lote, conteos.parsear_lineas(request.POST.get('lineas', '')))
+        except ValueError as e:
+            extra = {'error': str(e), 'datos': request.POST}
+        else:
+            extra = {'lote_guardado': lote, 'lineas_guardadas': guardadas}
+    return render(request, 'inventario/detalle_conteo.html', _contexto_conteo(sesion, **extra))
+
+
+@require_POST
+def aplicar_conteo(request, sesion_id):
+    """Aplica las diferencias aprobadas (todas menos las marcadas en `excluir`) y cierra la sesión."""
+    sesion = get_object_or_404(SesionConteo, id=sesion_id)
+    excluir = [valor for valor in request.POST.getlist('excluir') if valor.isdigit()]
+    try:
+        resultado = conteos.aplicar(sesion, excluir, responsable=request.POST.get('responsable'))
+    except ValueError as e:
+        return render(request, 'inventario/detalle_conteo.html', _contexto_conteo(sesion, error=str(e)))
+    sesion.refresh_from_db()
+    return render(request, 'inventario/detalle_conteo.html', _contexto_conteo(sesion, resultado=resultado))
+
+
+@csrf_exempt
+@require_POST
+def api_conteo_lote(request, sesion_id):
+    """
+    Recibe un lote de un escáner: {"lote": "esc1-0007", "lineas": [{"codigo_barras": "...", "cantidad": 12}]}.
+    Reenviar un lote ya recibido es seguro (responde duplicado=true sin volver a sumar).
+    """
+    sesion = get_object_or_404(SesionConteo, id=sesion_id)
+    try:
+        payload = json.loads(request.body)
+        guardadas, desconocidos = conteos.registrar_lote(sesion, payload.get('lote'), payload.get('lineas') or [])
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        return JsonResponse({'error': str(e) or 'Lote inválido.'}, status=400)
+    return JsonResponse({
+        'lote': payload['lote'], 'lineas': guardadas, 'duplicado': guardadas == 0, 'desconocidos': desconocidos,
+    }, status=201)
+
+
+# =======================================================================
+# --- COLA DE TAREAS (TAREAS FALLIDAS) ---
+# =======================================================================
+
+def ver_tareas(request):
+    """Resumen de la cola y lista de tareas fallidas (dead-letter) para reintentarlas."""
+    conteos = dict(Tarea.objects.values_list('estado').annotate(total=Count('id')).order_by())
+    estados = [(codigo, nombre, conteos.get(codigo, 0)) for codigo, nombre in Tarea.ESTADOS]
+    fallidas = Tarea.objects.filter(estado='MUE').order_by('-fecha_actualizacion')[:100]
+    return render(request, 'tareas/ver_tareas.html', {'estados': estados, 'fallidas': fallidas})
+
+
+@require_POST
+def reintentar_tarea(request, tarea_id):
+    """Devuelve una tarea fallida a la cola."""
+    tareas.reintentar(tarea_id)
+    return redirect('ver_tareas')
+
+
+# =======================================================================
+# --- VISTAS DE DIAGNÓSTICO (perfiles de vistas, solo staff) ---
+# =======================================================================
+
+@staff_member_required
+def ver_perfiles(request):
+    """Capturas recientes del perfilador (app_productos/perfilado.py)."""
+    return render(request, 'perfil/ver_perfiles.html', {
+        'capturas': perfilado.capturas(),
+        'maximo': getattr(settings, 'PERFILADO_MAX_CAPTURAS', 50),
+        'vistas_configuradas': getattr(settings, 'PERFILADO_VISTAS', ()),
+    })
+
+
+@staff_member_required
+def detalle_perfil(request, nombre):
+    """Funciones con más tiempo propio, pilas más frecuentes y línea de tiempo SQL de una captura."""
+    rutas = {tipo: perfilado.archivo_de(nombre, tipo) for tipo in ('meta', 'sql', 'folded')}
+    if None in rutas.values():
+        raise Http404('La captura no existe o ya salió del búfer.')
+    plegado = rutas['folded'].read_text()
+    consultas = json.loads(rutas['sql'].read_text())
+    meta = json.loads(rutas['meta'].read_text())
+    pilas = [linea.rpartition(' ') for linea in plegado.splitlines()[:20]]
+    # Consultas repetidas (N+1): mismo SQL, agrupado
+    repetidas = {}
+    for consulta in consultas:
+        grupo = repetidas.setdefault(consulta['sql'], {'sql': consulta['sql'], 'veces': 0, 'ms': 0})
+        grupo['veces'] += 1
+        grupo['ms'] += consulta['duracion_ms']
+    return render(request, 'perfil/detalle_perfil.html', {
+        'meta': meta,
+        'propias': perfilado.funciones_propias(plegado),
+        'pilas': [(pila.split(';'), muestras) for pila, _, muestras in pilas],
+        'consultas': consultas[:500],
+        'repetidas': sorted(repetidas.values(), key=lambda g: g['ms'], reverse=True)[:20],
+    })
+
+
+@staff_member_required
+def descargar_perfil(request, nombre, formato):
+    """Descarga las pilas colapsadas ('folded', para flamegraph.pl o speedscope) o el SQL ('sql')."""
+    ruta = perfilado.archivo_de(nombre, formato) if formato in ('folded', 'sql') else None
+    if ruta is None:
+        raise Http404('La captura no existe o ya salió del búfer.')
+    tipo = 'text/plain; charset=utf-8' if formato == 'folded' else 'application/json'
+    return FileResponse(open(ruta, 'rb'), as_attachment=True, filename=ruta.name, content_type=tipo)
 
 
 # =======================================================================
@@ -440,6 +1354,51 @@ def ver_clientes(request):
     return render(request, 'cliente/ver_clientes.html', {'clientes': clientes})
 
 
+POR_PAGINA_HISTORIAL = 25
+
+
+def _cursor_historial(valor):
+    """'<fecha ISO>_<id>' -> (fecha, id) de la última venta mostrada; None si no es válido."""
+    try:
+        fecha, venta_id = valor.rsplit('_', 1)
+        return datetime.fromisoformat(fecha), int(venta_id)
+    except ValueError:
+        return None
+
+
+def _pagina_historial(modelo, cliente_id, cursor, limite):
+    ventas = modelo.objects.filter(cliente_id=cliente_id).select_related('empleado_vendedor')
+    if cursor:
+        fecha, venta_id = cursor
+        ventas = ventas.filter(Q(fecha_venta__lt=fecha) | Q(fecha_venta=fecha, id__lt=venta_id))
+    return list(ventas.order_by('-fecha_venta', '-id')[:limite])
+
+
+def detalle_cliente(request, cliente_id):
+    """Ficha del cliente: estadísticas precalculadas, productos favoritos e historial paginado por llave."""
+    cliente = get_object_or_404(Cliente.objects.select_related('estadisticas'), id=cliente_id)
+    estadisticas = getattr(cliente, 'estadisticas', None) or EstadisticaCliente(cliente=cliente)
+
+    cursor = _cursor_historial(request.GET.get('despues', ''))
+    # Las ventas activas siempre son más recientes que las archivadas: primero se agota la tabla activa
+    ventas = _pagina_historial(Ventas, cliente.id, cursor, POR_PAGINA_HISTORIAL + 1)
+    if len(ventas) <= POR_PAGINA_HISTORIAL:
+        ventas += _pagina_historial(VentaArchivada, cliente.id, cursor, POR_PAGINA_HISTORIAL + 1 - len(ventas))
+    siguiente = None
+    if len(ventas) > POR_PAGINA_HISTORIAL:
+        ventas = ventas[:POR_PAGINA_HISTORIAL]
+        siguiente = f'{ventas[-1].fecha_venta.isoformat()}_{ventas[-1].id}'
+
+    return render(request, 'cliente/detalle_cliente.html', {
+        'cliente': cliente,
+        'estadisticas': estadisticas,
+        'favoritos': estadisticas_clientes.favoritos(cliente.id) if estadisticas.num_compras else [],
+        'ventas': ventas,
+        'siguiente': siguiente,
+        'es_primera_pagina': cursor is None,
+    })
+
+
 def agregar_cliente(request):
     """Permite registrar un nuevo cliente."""
     if request.method == 'POST':
@@ -502,6 +1461,45 @@ def ver_empleados(request):
     return render(request, 'empleado/ver_empleados.html', {'empleados': empleados})
 
 
+DIAS_REPORTE_POR_DEFECTO = 30
+
+
+def _rango_reporte(request):
+    """`_rango_fechas` con valores por defecto: los últimos 30 días, incluido hoy."""
+    desde, hasta = _rango_fechas(request)
+    if hasta is None:
+        hasta = kpis._inicio_dia(timezone.localdate() + timedelta(days=1))
+    if desde is None:
+        desde = hasta - timedelta(days=DIAS_REPORTE_POR_DEFECTO)
+    return desde, hasta
+
+
+@vista_de_reporte()
+def ver_reporte_empleados(request):
+    """Desempeño por empleado en un rango de fechas (por defecto, los últimos 30 días); ?formato=csv exporta."""
+    desde, hasta = _rango_reporte(request)
+    filas = reporte_empleados.reporte(desde, hasta)
+
+    if request.GET.get('formato') == 'csv':
+        response = HttpResponse(content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = (
+            f'attachment; filename="desempeno_empleados_{desde:%Y%m%d}_{hasta - timedelta(days=1):%Y%m%d}.csv"'
+        )
+        writer = csv.writer(response)
+        writer.writerow(['Rango', 'Empleado', 'Puesto', 'Rango en puesto', 'Tickets', 'Ingresos',
+                         'Ticket promedio', 'Unidades', '% del puesto'])
+        for f in filas:
+            writer.writerow([f['rango'], f['nombre'], f['puesto_nombre'], f['rango_puesto'], f['tickets'],
+                             f['ingresos'], f['ticket_promedio'], f['unidades'], f['participacion_puesto']])
+        return response
+
+    return render(request, 'empleado/reporte_empleados.html', {
+        'filas': filas,
+        'desde': timezone.localdate(desde).isoformat(),
+        'hasta': (timezone.localdate(hasta) - timedelta(days=1)).isoformat(),
+    })
+
+
 def agregar_empleado(request):
     """Permite registrar un nuevo empleado."""
     puestos = Empleado.PUESTOS
@@ -563,13 +1561,69 @@ def borrar_empleado(request, empleado_id):
     return render(request, 'empleado/borrar_empleado.html', {'empleado': empleado})
 
 
+# =======================================================================
+# --- REPORTE ENTRE SUCURSALES ---
+# =======================================================================
+
+@vista_de_reporte()
+def ver_reporte_tiendas(request):
+    """Ventas por sucursal y productos más vendidos de todas las tiendas (consulta cada base en paralelo)."""
+    desde, hasta = _rango_reporte(request)
+    reporte = tiendas.reporte_consolidado(desde, hasta)
+    return render(request, 'tienda/reporte_tiendas.html', {
+        **reporte,
+        'desde': timezone.localdate(desde).isoformat(),
+        'hasta': (timezone.localdate(hasta) - timedelta(days=1)).isoformat(),
+    })
+
+
 # =======================================================================
 # --- VISTAS DE INVENTARIO (CRUD) ---
 # =======================================================================
 
+POR_PAGINA_MOVIMIENTOS = 100
+
+
+def _cursor_movimientos(valor):
+    """'<fuente>_<fecha ISO>_<id>' -> (fuente, fecha, id) del último movimiento mostrado; None si no es válido."""
+    try:
+        fuente, fecha, movimiento_id = valor.split('_')
+        if fuente not in archivo.ORDEN_FUENTES:
+            return None
+        # Los resúmenes diarios se ordenan por día; los movimientos, por fecha y hora
+        fecha = date.fromisoformat(fecha) if fuente == archivo.FUENTE_RESUMEN else datetime.fromisoformat(fecha)
+        return fuente, fecha, int(movimiento_id)
+    except ValueError:
+        return None
+
+
+@vista_de_reporte(solo_si=_es_consulta_historica)
 def ver_movimientos_inventario(request):
-    movimientos = Inventario.objects.all().order_by('-fecha_movimiento')
-    return render(request, 'inventario/ver_inventario.html', {'movimientos': movimientos})
+    """Movimientos del rango más recientes primero, paginados por llave (incluye el archivo si el rango lo alcanza)."""
+    desde, hasta = _rango_fechas(request)
+    cursor = _cursor_movimientos(request.GET.get('despues', ''))
+    movimientos, hay_mas = archivo.movimientos_en_rango(
+        Inventario.objects.select_related('producto'), desde, hasta, despues=cursor, limite=POR_PAGINA_MOVIMIENTOS,
+    )
+
+    parametros = request.GET.copy()
+    parametros.pop('despues', None)
+    siguiente = None
+    if hay_mas:
+        ultimo = movimientos[-1]
+        fuente = archivo.fuente_de(ultimo)
+        fecha = ultimo.fecha if fuente == archivo.FUENTE_RESUMEN else ultimo.fecha_movimiento
+        parametros['despues'] = f'{fuente}_{fecha.isoformat()}_{ultimo.id}'
+        siguiente = parametros.urlencode()
+        parametros.pop('despues')
+    return render(request, 'inventario/ver_inventario.html', {
+        'movimientos': movimientos,
+        'siguiente': siguiente,
+        'primera_pagina': parametros.urlencode(),
+        'es_primera_pagina': cursor is None,
+        'desde': request.GET.get('desde', ''),
+        'hasta': request.GET.get('hasta', ''),
+    })
 
 @transaction.atomic
 def agregar_movimiento_inventario(request):
@@ -0,0 +1,15 @@
+import os
+
+# Perfil de settings según la variable de entorno ENTORNO (desarrollo por omisión)
+PERFILES = {
+    'desarrollo': 'backend_abarrotes.settings',
+    'produccion': 'backend_abarrotes.settings_produccion',
+}
+
+
+def configurar_settings():
+    """Fija DJANGO_SETTINGS_MODULE según ENTORNO; un DJANGO_SETTINGS_MODULE explícito tiene prioridad."""
+    entorno = os.environ.get('ENTORNO') or 'desarrollo'
+    if entorno not in PERFILES:
+        raise RuntimeError(f'ENTORNO={entorno!r} no es válido; usar uno de: {", ".join(PERFILES)}.')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', PERFILES[entorno])
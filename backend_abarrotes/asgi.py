@@ -7,10 +7,10 @@ For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
 
-import os
-
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_abarrotes.settings')
+from backend_abarrotes import configurar_settings
+
+configurar_settings()
 
 application = get_asgi_application()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -18,6 +19,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
+# Perfil de desarrollo. En producción: ENTORNO=produccion (settings_produccion.py)
 
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = 'django-insecure-%4xfiq9^)n3nhpa97l6ce^sycs0+e^nmr&8)_z#@9j9z^li3qi'
@@ -46,6 +48,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'app_productos.perfilado.PerfiladoMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -77,9 +80,31 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    # Snapshot de solo lectura para reportes (python manage.py refrescar_reportes)
+    'reporting': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_reporting.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    },
 }
 
+# Sucursales (app_productos/tiendas.py). Cada sucursal tiene su propia base SQLite con el esquema
+# completo, así que sus ventas, movimientos y stock nunca compiten con los de otra sucursal.
+#   TIENDA=centro              sucursal que atiende este proceso (sus datos están en `default`)
+#   TIENDAS=centro,norte,sur   sucursales visibles desde este proceso (p. ej. oficina central)
+# Cada sucursal de TIENDAS distinta de TIENDA se abre como el alias `tienda_<codigo>`.
+TIENDA = os.environ.get('TIENDA') or None
+TIENDAS = [codigo.strip() for codigo in os.environ.get('TIENDAS', '').split(',') if codigo.strip()]
+for _codigo in TIENDAS:
+    if _codigo != TIENDA:
+        DATABASES[f'tienda_{_codigo}'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / f'db_tienda_{_codigo}.sqlite3',
+        }
+
+DATABASE_ROUTERS = ['app_productos.tiendas.TiendasRouter', 'app_productos.reportes_db.ReportesRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -121,3 +146,21 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Cola de tareas en segundo plano (app_productos/tareas.py)
+# 'hilo': se ejecutan en un hilo del propio proceso al hacer commit (desarrollo).
+# En producción usar 'worker' y correr `python manage.py procesar_tareas`.
+TAREAS_MODO = 'hilo'
+
+
+# Perfilado de vistas bajo demanda (app_productos/perfilado.py). Un usuario staff perfila una
+# petición con la cabecera `X-Perfilar: 1` o `?perfilar=1`; PERFILADO_VISTAS perfila siempre las
+# vistas listadas (nombres de URL o rutas tipo '/ventas/*'), en la fracción PERFILADO_TASA de las
+# peticiones. Las capturas se ven en /perfiles/.
+#   PERFILADO_VISTAS=ver_ventas,/inventario/*
+PERFILADO_VISTAS = [v.strip() for v in os.environ.get('PERFILADO_VISTAS', '').split(',') if v.strip()]
+PERFILADO_TASA = float(os.environ.get('PERFILADO_TASA', 1.0))
+PERFILADO_INTERVALO_MS = 5
+PERFILADO_MAX_CAPTURAS = 50
+PERFILADO_DIR = Path(os.environ.get('PERFILADO_DIR') or BASE_DIR / 'perfiles')
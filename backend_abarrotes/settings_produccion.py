@@ -0,0 +1,88 @@
+"""
+Settings de producción. Se eligen con ENTORNO=produccion (ver backend_abarrotes/__init__.py).
+
+Parten de settings.py y quitan el costo que solo sirve para desarrollar: sin DEBUG no se guarda
+cada consulta SQL en memoria, las conexiones se reutilizan entre peticiones, las plantillas se
+compilan una sola vez por proceso y la caché vive en disco, compartida por todos los workers.
+
+Variables de entorno:
+    SECRET_KEY        obligatoria
+    ALLOWED_HOSTS     p. ej. caja.mitienda.mx,10.0.0.5
+    CONN_MAX_AGE      segundos que vive una conexión (600 por omisión; el snapshot de reportes no se reutiliza)
+    CACHE_DIR         directorio de la caché (BASE_DIR/cache por omisión)
+    TAREAS_MODO       'worker' por omisión: correr `python manage.py procesar_tareas`
+"""
+import copy
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES, TEMPLATES
+
+DEBUG = False
+
+SECRET_KEY = os.environ.get('SECRET_KEY', '')
+if not SECRET_KEY:
+    raise ImproperlyConfigured('Definir SECRET_KEY en el entorno para ENTORNO=produccion.')
+
+ALLOWED_HOSTS = [host.strip() for host in os.environ.get('ALLOWED_HOSTS', '').split(',') if host.strip()]
+
+
+# Conexiones persistentes: una por hilo, reutilizada hasta CONN_MAX_AGE segundos. Con
+# CONN_HEALTH_CHECKS, una conexión que se cayó se reabre al inicio de la petición en lugar de fallar.
+# El snapshot de reportes no: `refrescar_reportes` lo reemplaza con os.replace y una conexión viva
+# seguiría leyendo el archivo anterior mientras las cabeceras X-Snapshot-* anuncian el nuevo.
+DATABASES = copy.deepcopy(DATABASES)
+for _alias, _config in DATABASES.items():
+    _config['CONN_MAX_AGE'] = 0
+    _config['CONN_HEALTH_CHECKS'] = True
+    if _alias != 'reporting':
+        _config['CONN_MAX_AGE'] = int(os.environ.get('CONN_MAX_AGE', 600))
+        # Bases de las sucursales: WAL deja leer mientras la caja escribe y, con synchronous=NORMAL,
+        # el commit no espera un fsync. El snapshot de reportes no se toca: es una copia de solo lectura.
+        # BEGIN IMMEDIATE: una transacción que lee y luego escribe (cobro, tareas, aplicar un conteo)
+        # toma el candado de escritura al empezar y espera `timeout` si está ocupado. Con BEGIN
+        # diferido, subir de lectura a escritura falla al instante con 'database is locked' si otro
+        # escritor confirmó mientras tanto, sin importar el timeout.
+        _config['OPTIONS'] = {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+        }
+
+
+# Plantillas compiladas una vez por proceso (el cargador con caché no vuelve a leer el disco)
+TEMPLATES = copy.deepcopy(TEMPLATES)
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+
+
+# Caché en disco: la comparten los workers y sobrevive a un reinicio, así que el catálogo de precios
+# y los reportes cerrados no se recalculan en cada proceso nuevo. Las sesiones se leen de la caché.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_DIR') or str(BASE_DIR / 'cache'),
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+TAREAS_MODO = os.environ.get('TAREAS_MODO', 'worker')
+
+# Sin DEBUG, Django solo envía los errores por correo a ADMINS: dejarlos también en la consola
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {'consola': {'class': 'logging.StreamHandler'}},
+    'root': {'handlers': ['consola'], 'level': 'WARNING'},
+}
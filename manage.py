@@ -1,12 +1,14 @@
 #!/usr/bin/env python
 """Django's command-line utility for administrative tasks."""
-import os
 import sys
 
 
 def main():
     """Run administrative tasks."""
-    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_abarrotes.settings')
+    from backend_abarrotes import configurar_settings
+
+    # ENTORNO=produccion elige backend_abarrotes/settings_produccion.py
+    configurar_settings()
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc: